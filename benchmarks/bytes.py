@@ -0,0 +1,74 @@
+#!/bin/python
+
+"""
+	bytes.py
+	~~~~~~~~
+
+	Benchmark of the render of a big markdown document encoded in UTF-8: decode + :func:`mpiece.markdown` + encode,
+	against :func:`mpiece.markdown_bytes` and :func:`mpiece.iter_markdown_bytes`. It shows the render time and the
+	memory peak measured with tracemalloc.
+	The document is the markdown files of the tests/data directory, copied several times.
+
+	Command options:
+		- $ bytes.py [number of copies of the corpus]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown, markdown_bytes, iter_markdown_bytes
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown, markdown_bytes, iter_markdown_bytes
+
+from corpus import get_corpus
+
+
+def decode_render_encode(data):
+	return markdown(data.decode('utf-8')).encode('utf-8')
+
+
+def stream(data):
+	for chunk in iter_markdown_bytes(data):
+		pass
+
+
+def get_peak(func, data):
+	tracemalloc.start()
+	try:
+		func(data)
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def main(copies):
+	data = '\n\n'.join([get_corpus()] * copies).encode('utf-8')
+	print('%d copies, %d bytes' % (copies, len(data)))
+
+	if markdown_bytes(data) != decode_render_encode(data):
+		print('markdown_bytes: the output is different')
+
+	for name, func in [
+		('decode+render+encode', decode_render_encode), ('markdown_bytes', markdown_bytes),
+		('iter_markdown_bytes', stream)
+	]:
+		t = min(timeit.repeat(lambda: func(data), number=1, repeat=5))
+		print('%-22s %10.3f ms %10.1f MB peak' % (name, t * 1000, get_peak(func, data) / 1e6))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
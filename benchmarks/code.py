@@ -0,0 +1,64 @@
+#!/bin/python
+
+"""
+	code.py
+	~~~~~~~
+
+	Benchmark of the render time of a document which is mostly fenced code blocks, and of the search of the fenced
+	code blocks with :class:`mpiece.lexer.LiteralRegex` against the regular expression alone.
+
+	Command options:
+		- $ code.py [number of code blocks]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+	from mpiece.lexer import Lexer
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+	from mpiece.lexer import Lexer
+
+
+def get_document(blocks):
+	""" Text with short paragraphs and fenced code blocks of 200 lines.
+	"""
+	code = 'def add(a, b):\n    return a + b  # `a` and `b`\n' * 100
+	block = 'The function `add` returns the sum:\n\n```python "add.py"\n%s```\n\n' % code
+	return block * blocks
+
+
+def main(blocks):
+	text = get_document(blocks)
+	lexer = Lexer()
+	pre_processed = lexer.pre_process_text(text)
+	regex = lexer.regex_fenced_code
+
+	if [mo.span() for mo in regex.finditer(pre_processed)] != [mo.span() for mo in regex.regex.finditer(pre_processed)]:
+		print('the fenced code blocks found are different')
+
+	t = min(timeit.repeat(lambda: markdown(text), number=1, repeat=7))
+	t_regex = min(timeit.repeat(lambda: regex.regex.sub(lambda mo: '', pre_processed), number=1, repeat=7))
+	t_literal = min(timeit.repeat(lambda: regex.sub(lambda mo: '', pre_processed), number=1, repeat=7))
+	print('%d code blocks, %d chars' % (blocks, len(text)))
+	print('%-18s %10.3f ms' % ('render time', t * 1000))
+	print('%-18s %10.3f ms' % ('fenced code regex', t_regex * 1000))
+	print('%-18s %10.3f ms' % ('fenced code find', t_literal * 1000))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,56 @@
+#!/bin/python
+
+"""
+	compiled.py
+	~~~~~~~~~~~
+
+	Benchmark of the render time of the markdown files of the tests/data directory with :func:`mpiece.markdown` and
+	with :class:`mpiece.compiler.CompiledMarkdown`. The output of both is compared first.
+
+	Command options:
+		- $ compiled.py [number of copies of the corpus]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+	from mpiece.compiler import CompiledMarkdown
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+	from mpiece.compiler import CompiledMarkdown
+
+from corpus import get_corpus
+
+
+def main(copies):
+	text = get_corpus() * copies
+	compiled_markdown = CompiledMarkdown()
+
+	if compiled_markdown(text) != markdown(text):
+		print('the output of the compiled lexer is different')
+
+	t = min(timeit.repeat(lambda: markdown(text), number=1, repeat=7))
+	t_compiled = min(timeit.repeat(lambda: compiled_markdown(text), number=1, repeat=7))
+	t_compile = min(timeit.repeat(CompiledMarkdown, number=1, repeat=7))
+	print('%d copies, %d chars' % (copies, len(text)))
+	print('%-14s %10.3f ms' % ('generic', t * 1000))
+	print('%-14s %10.3f ms %6.2fx' % ('compiled', t_compiled * 1000, t / t_compiled))
+	print('%-14s %10.3f ms' % ('compile time', t_compile * 1000))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
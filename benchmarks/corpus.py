@@ -0,0 +1,32 @@
+"""
+	corpus.py
+	~~~~~~~~~
+
+	Markdown files of the tests/data directory, used as corpus by the benchmarks.
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import io
+import os
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../tests/data')
+
+
+def get_texts():
+	""" Text of each markdown file of the tests/data directory, in the order of their names.
+	"""
+	texts = []
+	for filename in sorted(os.listdir(data_dir)):
+		if filename.endswith('.md'):
+			with io.open(os.path.join(data_dir, filename), encoding='utf-8') as f:
+				texts.append(f.read())
+
+	return texts
+
+
+def get_corpus():
+	""" Text of all markdown files of the tests/data directory.
+	"""
+	return '\n\n'.join(get_texts())
@@ -0,0 +1,98 @@
+#!/bin/python
+
+"""
+	cost.py
+	~~~~~~~
+
+	Calibration of :class:`mpiece.cost.CostModel`. Synthetic texts (paragraphs with styles, nested lists,
+	blockquotes, tables, links and footnotes) of several sizes, deeply nested lists and blockquotes of several depths
+	and the markdown files of the tests/data directory are rendered, the weights of the model are fitted to the costs
+	measured, and the error of the predictions is shown for other texts. The weights printed can be used as the
+	default weights of the model.
+
+	Command options:
+		- $ cost.py [scale]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+from timeit import default_timer
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece.cost import CostModel, estimate_cost
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece.cost import CostModel, estimate_cost
+
+from corpus import get_corpus
+
+
+BLOCKS = {
+	'paragraphs': 'Text with **bold**, *italic*, _underline_, `code` and ~strike~ in a long line of words.\n\n',
+	'lists': ''.join('  ' * i + '* Item %d of the list\n' % i for i in range(8)) + '\n',
+	'olists': '1. First\n2. Second\n   1. Sub\n   2. Sub\n3. Third\n\n',
+	'blockquotes': '> quote line\n> > nested quote\n> > > deeper\n\n',
+	'tables': '| a | b | c | d |\n|---|---|---|---|\n' + '| 1 | 2 | 3 | 4 |\n' * 6 + '\n',
+	'links': 'See [the docs](http://example.com/a) and ![img](/i.png "t") and [more](http://b.com).\n\n',
+	'footnotes': 'A note[^1] and other[^2].\n\n[^1]: First note.\n[^2]: Second note.\n\n',
+	'plain': 'Plain text without grammar, only words and more words in the line.\n\n',
+}
+
+
+def get_nested(depth):
+	""" Nested list and nested blockquote with ``depth`` levels.
+	"""
+	return [''.join('  ' * i + '* Item %d\n' % i for i in range(depth)), '> ' * depth + 'quote\n']
+
+
+def get_texts(scale, mixed, depths=(10, 40, 80, 160)):
+	""" Texts of each kind of block with several sizes, texts which mix the blocks and nested texts.
+	"""
+	texts = []
+	for depth in depths:
+		texts.extend(get_nested(depth))
+
+	for size in (1, 4, 16, 64):
+		for name in sorted(BLOCKS):
+			texts.append(BLOCKS[name] * size * scale)
+
+		if mixed:
+			texts.append(''.join(BLOCKS[name] * size for name in sorted(BLOCKS)) * scale)
+			texts.append(get_corpus() * size)
+
+	return texts
+
+
+def main(scale):
+	model = CostModel()
+	samples = model.calibrate(get_texts(scale, True))
+	print('%d samples' % len(samples))
+	print('time_weights = {%s}' % ', '.join('%r: %.2g' % (n, model.time_weights[n]) for n in model.feature_names))
+	print('memory_weights = {%s}' % ', '.join('%r: %.4g' % (n, model.memory_weights[n]) for n in model.feature_names))
+
+	print('\n%-10s %10s %10s %8s %10s %10s %8s %10s' % (
+		'chars', 'time', 'predicted', 'error', 'memory', 'predicted', 'error', 'estimate'
+	))
+	for text in get_texts(scale * 3, True, (30, 120, 240))[::3]:
+		seconds, memory = model.measure(text)
+		start = default_timer()
+		cost = estimate_cost(text, model=model)
+		elapsed = default_timer() - start
+		print('%-10d %8.2f ms %7.2f ms %7.0f%% %8d KB %7d KB %7.0f%% %7.3f ms' % (
+			len(text), seconds * 1000, cost.seconds * 1000, 100 * (cost.seconds - seconds) / seconds,
+			memory // 1024, cost.memory // 1024, 100 * (cost.memory - memory) / max(memory, 1), elapsed * 1000
+		))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
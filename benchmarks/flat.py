@@ -0,0 +1,46 @@
+#!/bin/python
+
+"""
+	flat.py
+	~~~~~~~
+
+	Benchmark of the render time of ordinary markdown documents, without deep nesting, using the markdown files of
+	the tests/data directory.
+
+	Command options:
+		- $ flat.py [number of copies of the corpus]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+
+from corpus import get_corpus
+
+
+def main(copies):
+	text = get_corpus() * copies
+	t = min(timeit.repeat(lambda: markdown(text), number=1, repeat=7))
+	print('%d copies, %d chars' % (copies, len(text)))
+	print('%-14s %10.3f ms' % ('render time', t * 1000))
+	print('%-14s %10.3f us' % ('per 1k chars', t * 1e9 / len(text)))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
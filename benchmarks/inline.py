@@ -0,0 +1,78 @@
+#!/bin/python
+
+"""
+	inline.py
+	~~~~~~~~~
+
+	Benchmark of the short texts of one line, like titles, labels or commit subjects, from 10 to 200 characters.
+	Each text is rendered with :meth:`mpiece.Markdown.inline`, with :class:`mpiece.Markdown` (which uses the fast
+	path of the texts of one paragraph) and with the whole block grammar. The lexer and the renderer are made once.
+
+	Command options:
+		- $ inline.py [number of renders of each text]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import Markdown, Lexer
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import Markdown, Lexer
+
+
+class BlockLexer(Lexer):
+	""" Lexer which always parses the block grammar.
+	"""
+
+	def is_inline_text(self, text):
+		return False
+
+
+def get_text(size):
+	""" Text of one line with inline grammar.
+	"""
+	words = ['Fix', '**the**', 'parser', 'of', '`code`', 'with', '*nested*', '[links](http://example.com)', 'and']
+	text = ''
+	i = 0
+	while len(text) < size:
+		text += words[i % len(words)] + ' '
+		i += 1
+
+	return text[:size].strip()
+
+
+def main(number):
+	markdown = Markdown()
+	markdown.lexer = Lexer()
+	block_markdown = Markdown()
+	block_markdown.lexer = BlockLexer()
+	print('%-6s %12s %12s %12s' % ('chars', 'inline', 'markdown', 'block'))
+
+	for size in (10, 25, 50, 100, 200):
+		text = get_text(size)
+		times = []
+		for func in [
+			lambda: markdown.inline(text),
+			lambda: markdown(text),
+			lambda: block_markdown(text),
+		]:
+			times.append(min(timeit.repeat(func, number=number, repeat=5)) / number)
+
+		print('%-6d %9.2f us %9.2f us %9.2f us' % ((size,) + tuple(t * 1000000 for t in times)))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,63 @@
+#!/bin/python
+
+"""
+	many.py
+	~~~~~~~
+
+	Benchmark of the render of many short texts, like the comments of a page. The texts are rendered with the
+	:func:`mpiece.markdown` function in a loop, with a :class:`mpiece.Markdown` object in a loop, and with the
+	:func:`mpiece.markdown_many` function without and with the batch of the texts of one line.
+
+	Command options:
+		- $ many.py [number of texts]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown, markdown_many, Markdown
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown, markdown_many, Markdown
+
+
+def get_texts(number):
+	""" Short texts. One of each ten texts has block grammar.
+	"""
+	texts = [
+		'Nice **post**', 'Thanks!', 'See [the docs](http://example.com/docs)', 'It fails with `None`', 'lgtm',
+		'I *think* that ~~it~~ is fixed', 'Same here', 'Version 0.3 works', '+1 for the _new_ api',
+		'* first\n* second',
+	]
+	return [texts[i % len(texts)] + (' %d' % i if i % 3 else '') for i in range(number)]
+
+
+def main(number):
+	texts = get_texts(number)
+	print('%d texts' % number)
+	md = Markdown()
+
+	for name, func in [
+		('markdown loop', lambda: [markdown(text) for text in texts]),
+		('Markdown loop', lambda: [md(text) for text in texts]),
+		('many, no batch', lambda: markdown_many(texts, batch=False)),
+		('many', lambda: markdown_many(texts)),
+	]:
+		t = min(timeit.repeat(func, number=1, repeat=3))
+		print('%-16s %10.1f ms %10.0f texts/s' % (name, t * 1000, number / t))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
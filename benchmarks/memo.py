@@ -0,0 +1,69 @@
+#!/bin/python
+
+"""
+	memo.py
+	~~~~~~~
+
+	Benchmark of the render time of a generated report, a big table with repeated cells, with and without
+	:class:`mpiece.cache.FragmentMemo`.
+
+	Command options:
+		- $ memo.py [number of rows]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+	from mpiece.cache import FragmentMemo
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+	from mpiece.cache import FragmentMemo
+
+
+def get_report(rows):
+	""" Table with a name column and columns with repeated values.
+	"""
+	lines = ['| Name | Linux | Windows | Status | Docs |', '|---|:-:|:-:|---|---|']
+	values = [u'✔', u'✘', 'N/A']
+	for i in range(rows):
+		lines.append('| test_%d | %s | %s | **%s** | [docs](http://example.com/docs "Docs") |' % (
+			i, values[i % 3], values[i % 2], 'passed' if i % 5 else 'failed'
+		))
+
+	return '\n'.join(lines) + '\n'
+
+
+def main(rows):
+	text = get_report(rows)
+	memo = FragmentMemo()
+
+	if markdown(text, memo=memo) != markdown(text):
+		print('the output with the memo is different')
+
+	memo.reset()
+	markdown(text, memo=memo)
+
+	t = min(timeit.repeat(lambda: markdown(text), number=1, repeat=5))
+	t_memo = min(timeit.repeat(lambda: markdown(text, memo=FragmentMemo()), number=1, repeat=5))
+	print('%d rows, %d chars' % (rows, len(text)))
+	print('%-14s %10.3f ms' % ('without memo', t * 1000))
+	print('%-14s %10.3f ms %6.2fx' % ('with memo', t_memo * 1000, t / t_memo))
+	print('memo: %s' % memo.info())
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,236 @@
+#!/bin/python
+
+"""
+	memory.py
+	~~~~~~~~~
+
+	Memory benchmark of synthetic markdown texts: deep lists, wide tables, long paragraphs and many footnotes.
+
+	For each text it shows:
+		- peak: memory peak of :func:`mpiece.markdown`, measured with tracemalloc, in the normal and the low memory
+		  modes.
+		- allocated: bytes allocated while the text is rendered. The traced memory is sampled in each call and return
+		  of python and C functions, and the increases are added, so it is a lower bound.
+		- token_list and placeholder: size of :attr:`mpiece.core.MPiece.token_list` (the tokens, their dictionaries
+		  and their texts, measured with :func:`sys.getsizeof`) and of the text of the main token with the token
+		  strings, when all tokens are rendered, and their share of the peak.
+		- objects: live Token objects, dictionaries and strings of the token list. The attribute dictionaries of the
+		  tokens aren't included.
+		- grammar: number of tokens and bytes of the token list of each render function.
+
+	The JSON output only has numbers and names, so the output of two versions can be compared.
+
+	Command options:
+		- $ memory.py [--json] [scale]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import json
+import os
+import platform
+import sys
+import tracemalloc
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	import mpiece
+	from mpiece import markdown, Lexer, HtmlRenderer
+	from mpiece.core import MPiece
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	import mpiece
+	from mpiece import markdown, Lexer, HtmlRenderer
+	from mpiece.core import MPiece
+
+
+def make_deep_lists(scale):
+	""" Lists with 20 nested levels.
+	"""
+	item = ''.join('  ' * i + '* Item *%d* of the list.\n' % i for i in range(20))
+	return '\n'.join([item] * (20 * scale))
+
+
+def make_wide_tables(scale):
+	""" Tables with 50 columns.
+	"""
+	columns = 50
+	header = '|' + '|'.join(' col %d ' % i for i in range(columns)) + '|\n'
+	align = '|' + '|'.join('---' for i in range(columns)) + '|\n'
+	row = '|' + '|'.join(' **%d** ' % i for i in range(columns)) + '|\n'
+	return '\n'.join([header + align + row * 20] * (2 * scale))
+
+
+def make_long_paragraphs(scale):
+	""" Paragraphs of 2000 words with inline styles.
+	"""
+	line = 'Some **bold** words, *italic* words, `code` and a [link](http://example.com "title").\n'
+	return '\n'.join([line * 160] * scale)
+
+
+def make_many_footnotes(scale):
+	""" Paragraphs with footnotes and their definitions.
+	"""
+	count = 200 * scale
+	text = ''.join('Paragraph %d with a note[^n%d].\n\n' % (i, i) for i in range(count))
+	return text + ''.join('[^n%d]: Note **%d**.\n' % (i, i) for i in range(count))
+
+
+WORKLOADS = [
+	('deep_lists', make_deep_lists),
+	('wide_tables', make_wide_tables),
+	('long_paragraphs', make_long_paragraphs),
+	('many_footnotes', make_many_footnotes),
+]
+
+
+class MeasuredMPiece(MPiece):
+	""" MPiece which measures the token list and the text of the main token when all tokens are rendered.
+	"""
+
+	def parse_token_str(self, text):
+		if self.measure is None:
+			self.measure = measure_tokens(self.token_list, text)
+
+		return super(MeasuredMPiece, self).parse_token_str(text)
+
+
+def measure_tokens(token_list, text):
+	""" Size of the token list and the text with the token strings.
+	"""
+	seen = set()
+
+	def size(obj):
+		if id(obj) in seen:
+			return 0
+
+		seen.add(id(obj))
+		return sys.getsizeof(obj)
+
+	total = size(token_list)
+	objects = {'Token': 0, 'dict': 0, 'str': 0}
+	grammar = {}
+
+	for token in token_list:
+		# The attribute dictionary isn't measured: since python 3.11 reading it creates it.
+		token_size = size(token)
+		objects['Token'] += 1
+
+		for value in (token.extras, token.extras_to_children):
+			if id(value) not in seen:
+				objects['dict'] += 1
+				token_size += size(value)
+				for item in value.values():
+					if isinstance(item, str) and id(item) not in seen:
+						objects['str'] += 1
+						token_size += size(item)
+
+		for value in (token.text, token.render_text):
+			if id(value) not in seen:
+				objects['str'] += 1
+				token_size += size(value)
+
+		total += token_size
+		item = grammar.setdefault(token.render_func, {'tokens': 0, 'bytes': 0})
+		item['tokens'] += 1
+		item['bytes'] += token_size
+
+	return {'token_list': total, 'placeholder': sys.getsizeof(text), 'objects': objects, 'grammar': grammar}
+
+
+def get_peak(text, low_memory=False):
+	tracemalloc.start()
+	try:
+		markdown(text, low_memory=low_memory)
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def get_allocated(text):
+	""" Sum of the increases of the traced memory between the calls and returns of functions.
+	"""
+	state = {'last': 0, 'allocated': 0}
+
+	def sample(frame, event, arg):
+		current = tracemalloc.get_traced_memory()[0]
+		if current > state['last']:
+			state['allocated'] += current - state['last']
+
+		state['last'] = current
+
+	tracemalloc.start()
+	sys.setprofile(sample)
+	try:
+		markdown(text)
+	finally:
+		sys.setprofile(None)
+		tracemalloc.stop()
+
+	return state['allocated']
+
+
+def run(name, text):
+	mpiece = MeasuredMPiece()
+	mpiece.measure = None
+	mpiece.parse(text, Lexer(), HtmlRenderer())
+	measure = mpiece.measure
+
+	peak = get_peak(text)
+	result = {
+		'chars': len(text),
+		'peak': peak,
+		'peak_low_memory': get_peak(text, True),
+		'allocated': get_allocated(text),
+		'token_list': measure['token_list'],
+		'token_list_share': round(float(measure['token_list']) / peak, 3),
+		'placeholder': measure['placeholder'],
+		'placeholder_share': round(float(measure['placeholder']) / peak, 3),
+		'objects': measure['objects'],
+		'grammar': measure['grammar'],
+	}
+	return result
+
+
+def main(scale, as_json):
+	report = {
+		'version': mpiece.__version__,
+		'python': platform.python_version(),
+		'scale': scale,
+		'workloads': {},
+	}
+
+	for name, make in WORKLOADS:
+		report['workloads'][name] = run(name, make(scale))
+
+	if as_json:
+		print(json.dumps(report, indent=2, sort_keys=True))
+		return
+
+	print('mpiece %s, python %s, scale %d' % (report['version'], report['python'], scale))
+	print('%-16s %9s %10s %10s %10s %10s %6s %10s %6s %8s' % (
+		'workload', 'chars', 'peak', 'low mem', 'allocated', 'tokens', 'share', 'text', 'share', 'Token'
+	))
+
+	for name, make in WORKLOADS:
+		r = report['workloads'][name]
+		print('%-16s %9d %9.1fK %9.1fK %9.1fK %9.1fK %6.2f %9.1fK %6.2f %8d' % (
+			name, r['chars'], r['peak'] / 1e3, r['peak_low_memory'] / 1e3, r['allocated'] / 1e3,
+			r['token_list'] / 1e3, r['token_list_share'], r['placeholder'] / 1e3, r['placeholder_share'],
+			r['objects']['Token']
+		))
+
+		for render_func, item in sorted(r['grammar'].items(), key=lambda item: -item[1]['bytes'])[:3]:
+			print('    %-20s %8d tokens %9.1fK' % (render_func, item['tokens'], item['bytes'] / 1e3))
+
+
+if __name__ == "__main__":
+	if '--help' in sys.argv:
+		print(__doc__)
+		exit()
+
+	args = [arg for arg in sys.argv[1:] if arg != '--json']
+	main(int(args[0]) if args else 1, '--json' in sys.argv)
@@ -0,0 +1,70 @@
+#!/bin/python
+
+"""
+	multi.py
+	~~~~~~~~
+
+	Benchmark of the render of a markdown text with several renderers: html, html for AMP pages and plain text. The
+	text is rendered once with each renderer, and once with the list of renderers. The text is the markdown files of
+	the tests/data directory, copied several times.
+
+	Command options:
+		- $ multi.py [number of copies of the corpus]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown, HtmlRenderer
+	from mpiece.renderer import PlainTextRenderer
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown, HtmlRenderer
+	from mpiece.renderer import PlainTextRenderer
+
+from corpus import get_corpus
+
+
+class AmpRenderer(HtmlRenderer):
+	""" Html for AMP pages: the images are ``<amp-img>`` tags.
+	"""
+
+	def render_image(self, src, alt, title=''):
+		return '<amp-img src="%s" alt="%s" layout="responsive"></amp-img>' % (self.escape_link(src), self.escape(alt))
+
+
+def main(copies):
+	text = '\n\n'.join([get_corpus()] * copies)
+	print('%d copies, %d chars' % (copies, len(text)))
+
+	renderers = {'html': HtmlRenderer(), 'amp': AmpRenderer(), 'text': PlainTextRenderer()}
+	times = {}
+
+	for name, func in [
+		('html', lambda: markdown(text, renderer=renderers['html'])),
+		('amp', lambda: markdown(text, renderer=renderers['amp'])),
+		('text', lambda: markdown(text, renderer=renderers['text'])),
+		('all renderers', lambda: markdown(text, renderer=renderers)),
+	]:
+		times[name] = min(timeit.repeat(func, number=3, repeat=5)) / 3
+		print('%-14s %10.3f ms' % (name, times[name] * 1000))
+
+	separate = times['html'] + times['amp'] + times['text']
+	print('%-14s %10.3f ms' % ('sum', separate * 1000))
+	print('%-14s %10.2f' % ('ratio', times['all renderers'] / separate))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
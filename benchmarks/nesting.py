@@ -0,0 +1,80 @@
+#!/bin/python
+
+"""
+	nesting.py
+	~~~~~~~~~~
+
+	Benchmark of the render time of markdown texts with nested blockquotes and lists.
+
+	The parser cost per nesting level is constant, but the grammar copies the text of each nested blockquote or list
+	again in every level (the ``> `` prefixes and the indentation are removed level by level), so the total time
+	grows faster than the size of the text. See flat.py for documents without deep nesting.
+
+	Command options:
+		- Run the benchmark with the default levels (1 to 500):
+			- $ nesting.py
+
+		- Run the benchmark with custom levels:
+			- $ nesting.py 1 10 100 1000
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+
+
+LEVELS = (1, 10, 50, 100, 200, 300, 400, 500)
+
+
+def make_blockquote(level):
+	""" Markdown text with `level` nested blockquotes.
+	"""
+	return '\n'.join('> ' * level + 'Line **%d** of the blockquote.' % i for i in range(3))
+
+
+def make_ulist(level):
+	""" Markdown text with `level` nested unordered lists.
+	"""
+	return '\n'.join(' ' * (2 * i) + '* Item *%d* of the list.' % i for i in range(level))
+
+
+def make_olist(level):
+	""" Markdown text with `level` nested ordered lists.
+	"""
+	return '\n'.join(' ' * (3 * i) + '1. Item _%d_ of the list.' % i for i in range(level))
+
+
+def bench(text, number=3):
+	""" Best render time of the text.
+	"""
+	return min(timeit.repeat(lambda: markdown(text), number=1, repeat=number))
+
+
+def main(levels):
+	print('%-12s %8s %10s %14s %16s' % ('workload', 'level', 'chars', 'time (ms)', 'us / 1k chars'))
+
+	for name, make in (('blockquote', make_blockquote), ('ulist', make_ulist), ('olist', make_olist)):
+		for level in levels:
+			text = make(level)
+			t = bench(text)
+			print('%-12s %8d %10d %14.3f %16.3f' % (name, level, len(text), t * 1000, t * 1e9 / len(text)))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main([int(level) for level in sys.argv[1:]] or LEVELS)
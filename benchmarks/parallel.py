@@ -0,0 +1,64 @@
+#!/bin/python
+
+"""
+	parallel.py
+	~~~~~~~~~~~
+
+	Benchmark of the render time of one big markdown document, in serial mode and with
+	:class:`mpiece.parallel.ParallelMarkdown` using 1, 2, 4... worker processes, until the number of CPUs.
+	The document is the markdown files of the tests/data directory, copied several times.
+
+	Command options:
+		- $ parallel.py [number of copies of the corpus]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import multiprocessing
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+	from mpiece.parallel import ParallelMarkdown
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+	from mpiece.parallel import ParallelMarkdown
+
+from corpus import get_corpus
+
+
+def main(copies):
+	text = '\n\n'.join([get_corpus()] * copies)
+	output = markdown(text)
+	serial = min(timeit.repeat(lambda: markdown(text), number=1, repeat=5))
+	print('%d copies, %d chars' % (copies, len(text)))
+	print('%-14s %10.3f ms' % ('serial', serial * 1000))
+
+	processes = 1
+	while True:
+		with ParallelMarkdown(processes=processes) as parallel_markdown:
+			if parallel_markdown(text) != output:
+				print('%d processes: the output is different' % processes)
+
+			t = min(timeit.repeat(lambda: parallel_markdown(text), number=1, repeat=5))
+			print('%-14s %10.3f ms %6.2fx' % ('%d processes' % processes, t * 1000, serial / t))
+
+		if processes >= multiprocessing.cpu_count():
+			break
+
+		processes = min(processes * 2, multiprocessing.cpu_count())
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,74 @@
+#!/bin/python
+
+"""
+	plain_text.py
+	~~~~~~~~~~~~~
+
+	Benchmark of the PlainTextRenderer class against rendering html code and removing the html tags later,
+	using the markdown files of the tests/data directory.
+
+	Command options:
+		- $ plain_text.py [number of repetitions]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import re
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+	from mpiece.renderer import HtmlRenderer, PlainTextRenderer
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+	from mpiece.renderer import HtmlRenderer, PlainTextRenderer
+
+from corpus import get_texts
+
+try:
+	from html import unescape
+except ImportError:
+	from HTMLParser import HTMLParser
+	unescape = HTMLParser().unescape
+
+
+regex_tag = re.compile(r'<[^>]+>')
+
+
+def html_then_strip(texts, renderer):
+	for text in texts:
+		unescape(regex_tag.sub(' ', markdown(text, renderer=renderer)))
+
+
+def plain_text(texts, renderer):
+	for text in texts:
+		markdown(text, renderer=renderer)
+
+
+def main(number):
+	texts = get_texts()
+	html_renderer = HtmlRenderer()
+	text_renderer = PlainTextRenderer()
+
+	html_time = min(timeit.repeat(lambda: html_then_strip(texts, html_renderer), number=number, repeat=5))
+	text_time = min(timeit.repeat(lambda: plain_text(texts, text_renderer), number=number, repeat=5))
+
+	print('%d files, %d repetitions' % (len(texts), number))
+	print('%-22s %10.3f ms' % ('html + strip tags', html_time * 1000))
+	print('%-22s %10.3f ms' % ('PlainTextRenderer', text_time * 1000))
+	print('%-22s %10.2fx' % ('speedup', html_time / text_time))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,55 @@
+#!/bin/python
+
+"""
+	preview.py
+	~~~~~~~~~~
+
+	Benchmark of :func:`mpiece.markdown_preview` with a short text and with a long text, against the render of the
+	whole long text. The long text is the markdown files of the tests/data directory, copied several times.
+
+	Command options:
+		- $ preview.py [number of copies of the corpus]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown, markdown_preview
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown, markdown_preview
+
+from corpus import get_corpus
+
+
+def main(copies):
+	corpus = get_corpus()
+	text = '\n\n'.join([corpus] * copies)
+	short_text = corpus[:1000]
+	print('%d copies, %d chars' % (copies, len(text)))
+
+	for name, func in [
+		('whole text', lambda: markdown(text)),
+		('2 blocks, short', lambda: markdown_preview(short_text, max_blocks=2)),
+		('2 blocks, long', lambda: markdown_preview(text, max_blocks=2)),
+		('300 chars, short', lambda: markdown_preview(short_text, max_chars=300)),
+		('300 chars, long', lambda: markdown_preview(text, max_chars=300)),
+	]:
+		t = min(timeit.repeat(func, number=10, repeat=5)) / 10
+		print('%-18s %10.3f ms' % (name, t * 1000))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 150)
@@ -0,0 +1,64 @@
+#!/bin/python
+
+"""
+	references.py
+	~~~~~~~~~~~~~
+
+	Benchmark of the reference-style links. The same document is written with inline links and with references to
+	definitions at the end, and both versions are rendered.
+
+	Command options:
+		- $ references.py [number of paragraphs]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+
+
+URLS = [
+	'https://docs.example.com/api/v2/reference/%s/methods/list?version=latest&lang=en' % name
+	for name in ('users', 'groups', 'projects', 'tokens', 'events')
+]
+
+
+def get_texts(paragraphs):
+	""" Text with inline links and the same text with reference-style links.
+	"""
+	inline = []
+	references = []
+	for i in range(paragraphs):
+		inline.append('See [the %d api](%s "Api") and **[the list](%s)**.' % (i, URLS[i % 5], URLS[(i + 1) % 5]))
+		references.append('See [the %d api][api%d] and **[the list][api%d]**.' % (i, i % 5, (i + 1) % 5))
+
+	definitions = ['[api%d]: %s "Api"' % (i, url) for i, url in enumerate(URLS)]
+	return '\n\n'.join(inline), '\n\n'.join(references) + '\n\n' + '\n'.join(definitions)
+
+
+def main(paragraphs):
+	inline, references = get_texts(paragraphs)
+	print('%d paragraphs' % paragraphs)
+
+	for name, text in [('inline', inline), ('references', references)]:
+		t = min(timeit.repeat(lambda: markdown(text), number=3, repeat=5)) / 3
+		print('%-12s %8d chars %10.3f ms' % (name, len(text), t * 1000))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,70 @@
+#!/bin/python
+
+"""
+	sanitizer.py
+	~~~~~~~~~~~~
+
+	Benchmark of :class:`mpiece.sanitizer.HtmlSanitizer`. The markdown files of the tests/data directory, with raw
+	html tags, are rendered without escape the html, with the sanitizer in the renderer, and with the sanitizer
+	applied to the rendered text in a second pass.
+
+	Command options:
+		- $ sanitizer.py [number of copies of the corpus]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown, HtmlRenderer
+	from mpiece.sanitizer import HtmlSanitizer
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown, HtmlRenderer
+	from mpiece.sanitizer import HtmlSanitizer
+
+from corpus import get_texts
+
+
+HTML = (
+	'Text with <b>raw</b> <a href="http://example.com" onclick="x()">html</a> and '
+	'<img src="javascript:alert(1)" alt="img"> <span title="a &amp; b">tags</span>.\n\n'
+)
+
+
+def get_corpus():
+	""" Text of all markdown files of the tests/data directory, with raw html paragraphs.
+	"""
+	return '\n\n'.join(text + '\n\n' + HTML * 5 for text in get_texts())
+
+
+def main(copies):
+	text = '\n\n'.join([get_corpus()] * copies)
+	print('%d copies, %d chars' % (copies, len(text)))
+
+	sanitizer = HtmlSanitizer()
+	raw = HtmlRenderer(escape_html=False)
+	sanitized = HtmlRenderer(escape_html=False, sanitizer=sanitizer)
+
+	for name, func in [
+		('raw html', lambda: markdown(text, renderer=raw)),
+		('sanitizer', lambda: markdown(text, renderer=sanitized)),
+		('two passes', lambda: sanitizer(markdown(text, renderer=raw), raw.escape_link)),
+	]:
+		t = min(timeit.repeat(func, number=3, repeat=5)) / 3
+		print('%-12s %10.3f ms' % (name, t * 1000))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
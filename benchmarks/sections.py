@@ -0,0 +1,69 @@
+#!/bin/python
+
+"""
+	sections.py
+	~~~~~~~~~~~
+
+	Benchmark of the render of one section of a long page. The page is the text of the tests repeated, with a level
+	1 header before each copy. The full page is rendered with :func:`mpiece.markdown`, and one section is rendered
+	with a :class:`mpiece.sections.SectionIndex` made once.
+
+	Command options:
+		- $ sections.py [number of copies of the text]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+	from mpiece.sections import SectionIndex
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+	from mpiece.sections import SectionIndex
+
+from corpus import get_corpus
+
+
+def get_text(number):
+	""" Text of the tests repeated, with a header before each copy.
+	"""
+	text = get_corpus()
+	return '\n\n'.join('Part %d\n======\n\n%s' % (i, text) for i in range(number))
+
+
+def main(number):
+	text = get_text(number)
+	print('%d characters' % len(text))
+
+	t = min(timeit.repeat(lambda: markdown(text), number=1, repeat=3))
+	print('%-16s %10.2f ms' % ('full page', t * 1000))
+
+	t = min(timeit.repeat(lambda: SectionIndex(text), number=1, repeat=3))
+	print('%-16s %10.2f ms' % ('index', t * 1000))
+
+	index = SectionIndex(text)
+	section = index.find('part-%d' % (number // 2))
+	print('%d sections, section of %d characters' % (len(index.sections), section['end'] - section['start']))
+
+	t = min(timeit.repeat(lambda: index.render(section['index']), number=10, repeat=3)) / 10
+	print('%-16s %10.2f ms' % ('section', t * 1000))
+
+	t = min(timeit.repeat(lambda: index.render(section['index'] + 1), number=10, repeat=3)) / 10
+	print('%-16s %10.2f ms' % ('subsection', t * 1000))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,87 @@
+#!/bin/python
+
+"""
+	service.py
+	~~~~~~~~~~
+
+	Benchmark of the render service with many callers which render the same popular texts at once. Each caller
+	thread renders its texts with a :class:`mpiece.Markdown` object, or sends them to a
+	:class:`mpiece.service.RenderService`, which renders the identical texts in flight once.
+
+	Command options:
+		- $ service.py [number of callers] [number of popular texts]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import threading
+import timeit
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import Markdown
+	from mpiece.service import RenderService
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import Markdown
+	from mpiece.service import RenderService
+
+from corpus import get_corpus
+
+
+def get_texts(number):
+	""" Texts of the tests, with a number so they are different.
+	"""
+	text = get_corpus()
+	return ['%s\n\n%d' % (text, i) for i in range(number)]
+
+
+def run_callers(callers, texts, render):
+	""" Start the caller threads. Each caller renders all texts, and waits for the other callers before each text.
+	"""
+	barrier = threading.Barrier(callers)
+
+	def call():
+		for text in texts:
+			barrier.wait()
+			render(text)
+
+	threads = [threading.Thread(target=call) for i in range(callers)]
+	for thread in threads:
+		thread.start()
+
+	for thread in threads:
+		thread.join()
+
+
+def main(callers, number):
+	texts = get_texts(number)
+	print('%d callers, %d texts of %d characters' % (callers, number, len(texts[0])))
+	md = Markdown()
+	md('')
+
+	t = min(timeit.repeat(lambda: run_callers(callers, texts, md), number=1, repeat=3))
+	print('%-16s %10.1f ms' % ('Markdown', t * 1000))
+
+	with RenderService(md, workers=4, maxsize=callers) as service:
+		t = min(timeit.repeat(lambda: run_callers(callers, texts, service.render), number=1, repeat=3))
+		metrics = service.metrics()
+
+	print('%-16s %10.1f ms' % ('RenderService', t * 1000))
+	print('%d submitted, %d rendered, latency p50 %.1f ms, p95 %.1f ms' % (
+		metrics['submitted'], metrics['completed'], metrics['latency']['p50'] * 1000,
+		metrics['latency']['p95'] * 1000,
+	))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 16, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,108 @@
+#!/bin/python
+
+"""
+	urls.py
+	~~~~~~~
+
+	Benchmark of the rewrite of the urls of the links and the images. The relative urls are made absolute with
+	:func:`urljoin`. The urls are rewritten by post-processing the html with :class:`HTMLParser`, and with the
+	``url_rewriter`` param of :class:`mpiece.renderer.HtmlRenderer`, without and with the cache of urls.
+
+	Command options:
+		- $ urls.py [number of links]
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import os
+import sys
+import timeit
+
+try:
+	from html.parser import HTMLParser
+	from urllib.parse import urljoin
+except ImportError:
+	from HTMLParser import HTMLParser
+	from urlparse import urljoin
+
+dir_base = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+	from mpiece import markdown
+	from mpiece.renderer import HtmlRenderer
+
+except ImportError:
+	sys.path.insert(0, os.path.join(dir_base, '../'))
+	from mpiece import markdown
+	from mpiece.renderer import HtmlRenderer
+
+BASE_URL = 'https://example.com/docs/'
+
+
+def rewrite(url, kind):
+	return urljoin(BASE_URL, url)
+
+
+class UrlParser(HTMLParser):
+	""" Copy the html changing the ``href`` and ``src`` attributes.
+	"""
+
+	def __init__(self):
+		HTMLParser.__init__(self, convert_charrefs=False) if sys.version_info[0] > 2 else HTMLParser.__init__(self)
+		self.pieces = []
+
+	def handle_starttag(self, tag, attrs):
+		attrs = ''.join(
+			' %s="%s"' % (name, rewrite(value, tag) if name in ('href', 'src') else value) for name, value in attrs
+		)
+		self.pieces.append('<%s%s>' % (tag, attrs))
+
+	def handle_endtag(self, tag):
+		self.pieces.append('</%s>' % tag)
+
+	def handle_data(self, data):
+		self.pieces.append(data)
+
+	def handle_entityref(self, name):
+		self.pieces.append('&%s;' % name)
+
+	def handle_charref(self, name):
+		self.pieces.append('&#%s;' % name)
+
+
+def post_process(html):
+	parser = UrlParser()
+	parser.feed(html)
+	parser.close()
+	return ''.join(parser.pieces)
+
+
+def main(number):
+	text = '\n\n'.join(
+		'See [page %d](page%d.html) and ![logo](../img/logo.png) in **the** [index](index.html).' % (i, i % 50)
+		for i in range(number)
+	)
+	print('%d characters, %d urls' % (len(text), number * 3))
+
+	renderer = HtmlRenderer(url_rewriter=rewrite)
+	no_cache_renderer = HtmlRenderer(url_rewriter=rewrite, url_cache_size=0)
+
+	for name, func in [
+		('no rewrite', lambda: markdown(text)),
+		('post-process', lambda: post_process(markdown(text))),
+		('rewriter', lambda: markdown(text, renderer=no_cache_renderer)),
+		('rewriter, cache', lambda: markdown(text, renderer=renderer)),
+	]:
+		t = min(timeit.repeat(func, number=1, repeat=5))
+		print('%-16s %10.1f ms' % (name, t * 1000))
+
+	print('cache: %r' % renderer.url_cache.info())
+
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == '--help':
+		print(__doc__)
+		exit()
+
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
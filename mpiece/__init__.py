@@ -26,15 +26,21 @@ from mpiece.core import MPiece
 from mpiece.lexer import Lexer
 from mpiece.renderer import HtmlRenderer
 
-__version__ = '0.2.3'
+__version__ = '0.3.0'
 __author__ = 'David Casado Martinez <dcasadomartinez@gmail.com>'
-__all__ = ['__version__', '__author__', 'Markdown', 'markdown']
+__all__ = [
+	'__version__', '__author__', 'Markdown', 'markdown', 'markdown_inline', 'markdown_many', 'markdown_bytes',
+	'iter_markdown_bytes', 'markdown_preview'
+]
 
 
 class Markdown(object):
 	"""
 		Class to transform the markdown text easily.
 
+		:param bool low_memory: Remove the rendered tokens as soon as they are joined. See :class:`mpiece.core.MPiece`.
+		:param mpiece.cache.FragmentMemo memo: Reuse the rendered tokens repeated in the same text.
+
 		:Example:
 			.. code:: python
 
@@ -49,18 +55,22 @@ class Markdown(object):
 				result = markdown(text_markdown)
 	"""
 
-	def __init__(self):
+	def __init__(self, low_memory=False, memo=None):
 		self.lexer = None
 		self.renderer = None
+		self.low_memory = low_memory
+		self.memo = memo
 
-	def __call__(self, text, lexer=None, renderer=None):
+	def __call__(self, text, lexer=None, renderer=None, collector=None):
 		"""
 			Transform markdown text.
 
 			:param str text: Markdown text.
 			:param mpiece.lexer.Lexer lexer: Lexer subclass.
-			:param mpiece.renderer.Renderer renderer: Renderer subclass.
-			:return: It depends of the renderer class.
+			:param mpiece.renderer.Renderer renderer: Renderer subclass, or a list or dictionary of renderers.
+			:param mpiece.metadata.MetadataCollector collector: Object which stores the metadata of the text.
+			:return: It depends of the renderer class. With a list or a dictionary of renderers, a list or a
+				dictionary with the result of each renderer.
 			:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
 			:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
 			:exception: :class:`mpiece.core.RegexNotFoundException`
@@ -69,20 +79,166 @@ class Markdown(object):
 		"""
 		self.lexer = lexer or self.lexer or Lexer()
 		self.renderer = renderer or self.renderer or HtmlRenderer()
-		return MPiece().parse(text, self.lexer, self.renderer)
+		return MPiece(self.low_memory, self.memo).parse(text, self.lexer, self.renderer, collector)
+
+	def inline(self, text, lexer=None, renderer=None, collector=None):
+		"""
+			Transform markdown text with only the inline grammar. See :func:`markdown_inline`.
+
+			:param str text: Markdown text.
+			:param mpiece.lexer.Lexer lexer: Lexer subclass.
+			:param mpiece.renderer.Renderer renderer: Renderer subclass.
+			:param mpiece.metadata.MetadataCollector collector: Object which stores the metadata of the text.
+			:return: It depends of the renderer class.
+		"""
+		self.lexer = lexer or self.lexer or Lexer()
+		self.renderer = renderer or self.renderer or HtmlRenderer()
+		return MPiece(self.low_memory, self.memo).parse_inline(text, self.lexer, self.renderer, collector)
+
+	def many(self, texts, lexer=None, renderer=None, batch=True):
+		"""
+			Transform many short markdown texts. See :func:`markdown_many`.
+
+			:param [str] texts: Markdown texts.
+			:param mpiece.lexer.Lexer lexer: Lexer subclass.
+			:param mpiece.renderer.Renderer renderer: Renderer subclass.
+			:param bool batch: Parse the texts of one line together.
+			:return: List with the result of each text.
+		"""
+		self.lexer = lexer or self.lexer or Lexer()
+		self.renderer = renderer or self.renderer or HtmlRenderer()
+		return MPiece(self.low_memory, self.memo).parse_many(texts, self.lexer, self.renderer, batch)
 
 
-def markdown(text, lexer=None, renderer=None):
+def markdown(text, lexer=None, renderer=None, collector=None, low_memory=False, memo=None):
 	"""
 		Transform the markdown text easily.
 
+		:param str text: Markdown text.
+		:param mpiece.lexer.Lexer lexer: Lexer subclass.
+		:param mpiece.renderer.Renderer renderer: Renderer subclass, or a list or dictionary of renderers. The text is
+			parsed once and the result is a list or a dictionary with the result of each renderer.
+		:param mpiece.metadata.MetadataCollector collector: Object which stores the metadata of the text.
+		:param bool low_memory: Remove the rendered tokens as soon as they are joined. See :class:`mpiece.core.MPiece`.
+		:param mpiece.cache.FragmentMemo memo: Reuse the rendered tokens repeated in the same text, and count the hits.
+		:return: It depends of the renderer class.
+		:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
+		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+		:exception: :class:`mpiece.core.RegexNotFoundException`
+		:exception: :class:`mpiece.core.InvalidDataException`
+	"""
+	return Markdown(low_memory, memo)(text, lexer, renderer, collector)
+
+
+def markdown_inline(text, lexer=None, renderer=None, collector=None):
+	"""
+		Transform the markdown text with only the inline grammar, for short texts like titles, labels or commit
+		subjects. The block grammar and the footnotes aren't searched, and the text isn't in a paragraph.
+		The :func:`markdown` function uses the same fast path, with the paragraph, when the text is one line without
+		block grammar. See :meth:`mpiece.core.MPiece.parse_inline`.
+
+		The lexer is the slowest object to make: reuse a :class:`Markdown` object to render many texts.
+
 		:param str text: Markdown text.
 		:param mpiece.lexer.Lexer lexer: Lexer subclass.
 		:param mpiece.renderer.Renderer renderer: Renderer subclass.
+		:param mpiece.metadata.MetadataCollector collector: Object which stores the metadata of the text.
 		:return: It depends of the renderer class.
 		:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
 		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
 		:exception: :class:`mpiece.core.RegexNotFoundException`
 		:exception: :class:`mpiece.core.InvalidDataException`
 	"""
-	return Markdown()(text, lexer, renderer)
+	return Markdown().inline(text, lexer, renderer, collector)
+
+
+def markdown_many(texts, lexer=None, renderer=None, batch=True, memo=None):
+	"""
+		Transform many short markdown texts, like the comments of a page or the cells of a list, with the same lexer,
+		renderer and parser. The texts of one line without block grammar are parsed together, and the result of each
+		text is the same as with the :func:`markdown` function. See :meth:`mpiece.core.MPiece.parse_many`.
+
+		:param [str] texts: Markdown texts.
+		:param mpiece.lexer.Lexer lexer: Lexer subclass.
+		:param mpiece.renderer.Renderer renderer: Renderer subclass.
+		:param bool batch: Parse the texts of one line together. If it is ``False``, only the objects are shared.
+		:param mpiece.cache.FragmentMemo memo: Reuse the rendered tokens repeated in the texts parsed together.
+		:return: List with the result of each text.
+		:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
+		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+		:exception: :class:`mpiece.core.RegexNotFoundException`
+		:exception: :class:`mpiece.core.InvalidDataException`
+	"""
+	return Markdown(memo=memo).many(texts, lexer, renderer, batch)
+
+
+def markdown_preview(text, lexer=None, renderer=None, max_blocks=None, max_chars=None):
+	"""
+		Transform the first top level blocks of the markdown text, for the previews of the texts. Only the first lines
+		of the text are read, so the time doesn't depend of the length of the text. The rendered text has whole
+		elements. When the first block is longer than ``max_chars``, it is cut after the last space before the limit.
+		See :meth:`mpiece.core.MPiece.preview`.
+
+		:param str text: Markdown text.
+		:param mpiece.lexer.Lexer lexer: Lexer subclass.
+		:param mpiece.renderer.Renderer renderer: Renderer subclass.
+		:param int max_blocks: Maximum number of blocks.
+		:param int max_chars: Maximum number of characters of the markdown text of the blocks.
+		:return: Tuple with the rendered text and ``True`` if the text was truncated.
+		:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
+		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+		:exception: :class:`mpiece.core.RegexNotFoundException`
+		:exception: :class:`mpiece.core.InvalidDataException`
+	"""
+	return MPiece().preview(text, lexer or Lexer(), renderer or HtmlRenderer(), max_blocks, max_chars)
+
+
+def iter_markdown_bytes(data, lexer=None, renderer=None, encoding='utf-8', errors='strict', chunk_size=65536):
+	"""
+		Transform the encoded markdown text, returning the rendered text encoded by chunks.
+		Each chunk is a group of top level blocks, rendered and encoded when it is read, so the rendered text is never
+		in memory at once. The byte order mark at the start of the text is removed.
+
+		:param bytes data: Markdown text encoded.
+		:param mpiece.lexer.Lexer lexer: Lexer subclass.
+		:param mpiece.renderer.Renderer renderer: Renderer subclass.
+		:param str encoding: Encoding of the markdown text and the rendered text.
+		:param str errors: Error handler of the decoding and the encoding. See :meth:`bytes.decode`.
+		:param int chunk_size: Minimum number of characters of the markdown text of each chunk.
+		:return: Iterator of bytes.
+		:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
+		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+		:exception: :class:`mpiece.core.RegexNotFoundException`
+		:exception: :class:`mpiece.core.InvalidDataException`
+	"""
+	lexer = lexer or Lexer()
+	renderer = renderer or HtmlRenderer()
+	text = data.decode(encoding, errors)
+	del data
+
+	if text.startswith(u'\ufeff'):
+		text = text[1:]
+
+	groups = MPiece().iter_parse(text, lexer, renderer, chunk_size)
+	del text
+
+	for group in groups:
+		yield group.encode(encoding, errors)
+
+
+def markdown_bytes(data, lexer=None, renderer=None, encoding='utf-8', errors='strict'):
+	"""
+		Transform the encoded markdown text and encode the result. See :func:`iter_markdown_bytes`.
+
+		:param bytes data: Markdown text encoded.
+		:param mpiece.lexer.Lexer lexer: Lexer subclass.
+		:param mpiece.renderer.Renderer renderer: Renderer subclass.
+		:param str encoding: Encoding of the markdown text and the rendered text.
+		:param str errors: Error handler of the decoding and the encoding. See :meth:`bytes.decode`.
+		:return bytes: Rendered text encoded.
+		:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
+		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+		:exception: :class:`mpiece.core.RegexNotFoundException`
+		:exception: :class:`mpiece.core.InvalidDataException`
+	"""
+	return b''.join(iter_markdown_bytes(data, lexer, renderer, encoding, errors))
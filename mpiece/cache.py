@@ -0,0 +1,214 @@
+"""
+	mpiece.cache
+	~~~~~~~~~~~~
+
+	Bounded cache used to store results which are repeated between the markdown texts.
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+	"""
+		Dictionary with a maximum number of items. When the cache is full, the least recently used item is removed.
+
+		The methods hold a lock, so the cache can be shared by several threads, like the renderers shared by the
+		workers of :class:`mpiece.service.RenderService`. The values are computed out of the lock: two threads can
+		compute the same value, and the last one is stored.
+
+		:param int maxsize: Maximum number of items in the cache.
+
+		:Example:
+			.. code:: python
+
+				from mpiece.cache import LRUCache
+
+				cache = LRUCache(maxsize=2)
+				cache.set('a', 1)
+				cache.get('a')
+				# output: 1
+				cache.info()
+				# output: {'hits': 1, 'misses': 0, 'size': 1, 'maxsize': 2}
+	"""
+
+	def __init__(self, maxsize=256):
+		self.maxsize = maxsize
+		self.data = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.lock = threading.Lock()
+
+	def __getstate__(self):
+		""" The lock isn't pickled. A new lock is made when the cache is unpickled.
+		"""
+		state = self.__dict__.copy()
+		del state['lock']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.lock = threading.Lock()
+
+	def __len__(self):
+		return len(self.data)
+
+	def __contains__(self, key):
+		return key in self.data
+
+	def get(self, key, default=None):
+		""" Get an item of the cache.
+
+			:param key: Item key.
+			:param default: Value returned if the key isn't in the cache.
+			:return: Item value or default.
+		"""
+		with self.lock:
+			try:
+				value = self.data.pop(key)
+			except KeyError:
+				self.misses += 1
+				return default
+
+			# Move the item to the end. It is the most recently used.
+			self.data[key] = value
+			self.hits += 1
+			return value
+
+	def set(self, key, value):
+		""" Add an item to the cache.
+
+			:param key: Item key.
+			:param value: Item value.
+		"""
+		if self.maxsize <= 0:
+			return
+
+		with self.lock:
+			if key in self.data:
+				del self.data[key]
+
+			elif len(self.data) >= self.maxsize:
+				self.data.popitem(last=False)
+
+			self.data[key] = value
+
+	def clear(self):
+		""" Remove all items and reset the statistics.
+		"""
+		with self.lock:
+			self.data.clear()
+			self.hits = 0
+			self.misses = 0
+
+	def info(self):
+		""" Statistics of the cache.
+
+			:return dict: Dictionary with the ``hits``, ``misses``, ``size`` and ``maxsize`` keys.
+		"""
+		with self.lock:
+			return {'hits': self.hits, 'misses': self.misses, 'size': len(self.data), 'maxsize': self.maxsize}
+
+
+class FragmentMemo(object):
+	"""
+		Rendered tokens of a markdown text, reused when the same grammar element is repeated with the same text and
+		extras. It is useful in texts which repeat the same table cells, lines or links.
+
+		The tokens are only reused inside of the same text, because their rendered text can have the token strings
+		of their children. The statistics are kept until :meth:`FragmentMemo.reset` is called.
+
+		:param elements: Grammar elements which are reused. By default :attr:`FragmentMemo.elements`.
+
+		:Example:
+			.. code:: python
+
+				from mpiece import markdown
+				from mpiece.cache import FragmentMemo
+
+				memo = FragmentMemo()
+				result = markdown(markdown_text, memo=memo)
+				print(memo.info())
+				# output: {'hits': 120, 'misses': 14, 'size': 14, 'elements': {'table_body_cell': 118, 'link': 2}}
+	"""
+
+	#: Grammar elements reused by default.
+	elements = frozenset((
+		'table_header_cell', 'table_body_cell', 'new_line', 'simple_new_line', 'link', 'image', 'code_inline', 'bold',
+		'italic', 'underline', 'strike'
+	))
+
+	def __init__(self, elements=None):
+		if elements is not None:
+			self.elements = frozenset(elements)
+
+		self.data = {}
+		self.reset()
+
+	def __len__(self):
+		return len(self.data)
+
+	def start(self):
+		""" Called before parse a text. The tokens of the previous text are removed.
+		"""
+		self.data.clear()
+
+	def reset(self):
+		""" Remove the tokens and the statistics.
+		"""
+		self.data.clear()
+		self.hits = 0
+		self.misses = 0
+		self.element_hits = {}
+
+	def get_key(self, element, token):
+		""" Make the key of a token.
+
+			:param str element: Grammar element which made the token.
+			:param mpiece.lexer.Token token: Token.
+			:return: Key or ``None`` if the token can't be reused.
+		"""
+		if element not in self.elements or token.extras_to_children:
+			return None
+
+		key = (element, token.render_func, token.text, tuple(sorted(token.extras.items())))
+		try:
+			hash(key)
+		except TypeError:
+			return None
+
+		return key
+
+	def get(self, key):
+		""" Get a token stored.
+
+			:param key: Token key. See :meth:`FragmentMemo.get_key`.
+			:return: Token, rendered text of the token or ``None``.
+		"""
+		value = self.data.get(key)
+		if value is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+			self.element_hits[key[0]] = self.element_hits.get(key[0], 0) + 1
+
+		return value
+
+	def set(self, key, value):
+		""" Store a token.
+
+			:param key: Token key. See :meth:`FragmentMemo.get_key`.
+			:param value: Token or rendered text of the token.
+		"""
+		self.data[key] = value
+
+	def info(self):
+		""" Statistics of the memo.
+
+			:return dict: Dictionary with the ``hits``, ``misses``, ``size`` and ``elements`` keys. ``elements`` has the
+				hits of each grammar element.
+		"""
+		return {'hits': self.hits, 'misses': self.misses, 'size': len(self.data), 'elements': dict(self.element_hits)}
@@ -0,0 +1,255 @@
+"""
+	mpiece.compiler
+	~~~~~~~~~~~~~~~
+
+	Parse the markdown text with python code generated for one lexer configuration.
+
+	Example:
+		.. code:: python
+
+			from mpiece.compiler import CompiledMarkdown
+
+			markdown = CompiledMarkdown()
+			result = markdown(markdown_text)
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+from mpiece.core import InvalidDataException, MPiece, ParseFunctionNotFoundException, RegexNotFoundException
+from mpiece.lexer import Lexer, Token
+from mpiece.renderer import HtmlRenderer
+from mpiece.utils import string_types
+
+# Source of the function which makes the re.sub replacement function of a grammar element. It is the same as
+# mpiece.core.MPiece.replace_str_token, without the memo.
+REPLACE_SOURCE = """
+def replace_%(element)s(self, extras, depth):
+	if self.memo is not None:
+		return self.replace_str_token(%(element)r, extras, depth)
+
+	parse_str_token = self.parse_str_token
+	add_token = self.add_token
+
+	def _replace_regex(mo):
+%(call)s
+
+		if result.__class__ is Token:
+			return add_token(parse_str_token(result, depth))
+
+		if not isinstance(result, (list, tuple)):
+			result = [result]
+
+		str_r = ''
+		for r in result:
+			if isinstance(r, string_types):
+				str_r += r
+				continue
+
+			if not isinstance(r, Token):
+				raise InvalidDataException(parse_%(element)s.__name__, lexer_name)
+
+			str_r += add_token(parse_str_token(r, depth))
+
+		return str_r
+	return _replace_regex
+"""
+
+# Call to the parse function in the replacement function, with the extras of the father token or with the reference
+# definitions of the text. See mpiece.core.MPiece.parse_match.
+EXTRAS_CALL = """\
+		if extras:
+			result = parse_%(element)s(mo, **extras)
+		else:
+			result = parse_%(element)s(mo)"""
+
+REFERENCES_CALL = """\
+		result = parse_%(element)s(mo, self.references)"""
+
+
+def get_literals(lexer, element):
+	""" Get the strings required by the regular expression of the grammar element.
+		The strings of :attr:`mpiece.lexer.Lexer.required_literals` aren't used when a subclass changes the regular
+		expression of the element without change its strings.
+
+		:param mpiece.lexer.Lexer lexer: Lexer object.
+		:param str element: Grammar element name.
+		:return: Tuple of strings or ``None``.
+	"""
+	literals = lexer.required_literals.get(element)
+	if literals is None:
+		return None
+
+	default = Lexer.required_literals.get(element)
+	if literals is default and lexer.all_regex[element] is not getattr(Lexer, 'regex_' + element, None):
+		return None
+
+	return literals
+
+
+def generate_source(lexer):
+	""" Generate the python source of the parse functions of the lexer. There is one function for each order
+		attribute of the lexer (the attributes which start with ``order_``).
+		The excluded elements are removed, the regular expressions and the parse functions are global names and the
+		regular expressions are only applied when the text has the strings required by them.
+
+		:param mpiece.lexer.Lexer lexer: Lexer object.
+		:return: Tuple with the source, the dictionary of global names used by the source and the dictionary with the
+			order attribute name of each function.
+		:exception: :class:`mpiece.core.RegexNotFoundException`
+		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+	"""
+	namespace = {
+		'Token': Token, 'InvalidDataException': InvalidDataException, 'string_types': string_types,
+		'lexer_name': lexer.__class__.__name__,
+	}
+	orders = {}
+	lines = []
+	elements = set()
+
+	for name in sorted(dir(lexer)):
+		order = getattr(lexer, name)
+		if not name.startswith('order_') or not isinstance(order, list):
+			continue
+
+		func_name = 'parse_' + name
+		orders[func_name] = name
+		lines.append('def %s(self, token, depth):' % func_name)
+		lines.append('\ttext = token.text')
+		lines.append('\textras = token.extras_to_children')
+		lines.append('\tdepth += 1')
+
+		for element in order:
+			if element in lexer.exclude:
+				continue
+
+			try:
+				namespace['regex_' + element] = lexer.all_regex[element]
+			except KeyError:
+				raise RegexNotFoundException(element, lexer.__class__.__name__)
+
+			try:
+				namespace['parse_' + element] = lexer.all_parse_func[element]
+			except KeyError:
+				raise ParseFunctionNotFoundException(element, lexer.__class__.__name__)
+
+			elements.add(element)
+			sub = 'text = regex_%s.sub(replace_%s(self, extras, depth), text)' % (element, element)
+			literals = get_literals(lexer, element)
+			if literals:
+				lines.append('\tif %s:' % ' or '.join('%r in text' % literal for literal in literals))
+				lines.append('\t\t' + sub)
+			else:
+				lines.append('\t' + sub)
+
+		lines.append('\ttoken.text = text')
+		lines.append('\treturn token')
+		lines.append('')
+
+	for element in sorted(elements):
+		if element in lexer.reference_elements:
+			call = REFERENCES_CALL % {'element': element}
+		else:
+			call = EXTRAS_CALL % {'element': element}
+
+		lines.append(REPLACE_SOURCE % {'element': element, 'call': call})
+
+	return '\n'.join(lines), namespace, orders
+
+
+class CompiledMPiece(MPiece):
+	"""
+		:class:`mpiece.core.MPiece` which parses the tokens with python code generated for one lexer. The dispatch
+		of the grammar elements is made once: the code doesn't check the excluded elements, doesn't search the
+		regular expressions in dictionaries, and it only applies each regular expression when the text has the
+		strings which the regular expression needs. See :attr:`mpiece.lexer.Lexer.required_literals`.
+
+		The result is the same as :class:`mpiece.core.MPiece`. The changes of the lexer after it is compiled aren't
+		seen, and other lexers, the token orders which aren't attributes of the lexer and the tokens deeper than
+		:attr:`mpiece.core.MPiece.MAX_RECURSION_DEPTH` are parsed with the generic code.
+
+		:param mpiece.lexer.Lexer lexer: Lexer compiled.
+		:param bool low_memory: See :class:`mpiece.core.MPiece`.
+		:param mpiece.cache.FragmentMemo memo: See :class:`mpiece.core.MPiece`.
+
+		:ivar str source: Python source generated.
+	"""
+
+	def __init__(self, lexer, low_memory=False, memo=None):
+		super(CompiledMPiece, self).__init__(low_memory, memo)
+		self.compiled_lexer = lexer
+		self.source, namespace, orders = generate_source(lexer)
+		exec(compile(self.source, '<mpiece.compiler %s>' % lexer.__class__.__name__, 'exec'), namespace)
+
+		#: Parse function of each order list, by the id of the list.
+		self.parse_funcs = {}
+		for func_name, name in orders.items():
+			order = getattr(lexer, name)
+			self.parse_funcs[id(order)] = (order, namespace[func_name])
+
+		self.compiled = {}
+
+	def copy(self):
+		""" Make a new object with the same generated functions, without generate them again. The state of the
+			parse (the token list, the renderer...) isn't shared, so each copy can parse a text at the same time.
+
+			:return: :class:`CompiledMPiece` object.
+		"""
+		mpiece = self.__class__.__new__(self.__class__)
+		MPiece.__init__(mpiece, self.low_memory, self.memo)
+		mpiece.compiled_lexer = self.compiled_lexer
+		mpiece.source = self.source
+		mpiece.parse_funcs = self.parse_funcs
+		mpiece.compiled = {}
+		return mpiece
+
+	def init_parse(self, lexer, renderer, collector=None):
+		super(CompiledMPiece, self).init_parse(lexer, renderer, collector)
+		self.compiled = self.parse_funcs if lexer is self.compiled_lexer else {}
+
+	def parse_str_token(self, token, depth=0):
+		""" Parse the text of the token and the text of all its children, with the generated function of the
+			token order.
+
+			:param mpiece.lexer.Token token: Token parsed.
+			:param int depth: Nesting level of the token.
+			:return: The same token with its text parsed.
+		"""
+		if not token.has_text:
+			return token
+
+		item = self.compiled.get(id(token.order))
+		if item is None or item[0] is not token.order or depth >= self.MAX_RECURSION_DEPTH:
+			return super(CompiledMPiece, self).parse_str_token(token, depth)
+
+		return item[1](self, token, depth)
+
+
+class CompiledMarkdown(object):
+	"""
+		Transform markdown texts with a :class:`CompiledMPiece`. The lexer is compiled once, when the object is made,
+		and each text is parsed by a copy of the compiled object (see :meth:`CompiledMPiece.copy`), so the object can
+		be used by several threads at once.
+
+		:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+		:param mpiece.renderer.Renderer renderer: Renderer object. By default :class:`mpiece.renderer.HtmlRenderer`.
+		:param bool low_memory: See :class:`mpiece.core.MPiece`.
+		:param mpiece.cache.FragmentMemo memo: See :class:`mpiece.core.MPiece`.
+	"""
+
+	def __init__(self, lexer=None, renderer=None, low_memory=False, memo=None):
+		self.lexer = lexer or Lexer()
+		self.renderer = renderer or HtmlRenderer()
+		self.mpiece = CompiledMPiece(self.lexer, low_memory, memo)
+
+	def __call__(self, text, collector=None):
+		""" Transform markdown text.
+
+			:param str text: Markdown text.
+			:param mpiece.metadata.MetadataCollector collector: Object which stores the metadata of the text.
+			:return: It depends of the renderer class.
+			:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
+			:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+			:exception: :class:`mpiece.core.InvalidDataException`
+		"""
+		return self.mpiece.copy().parse(text, self.lexer, self.renderer, collector)
@@ -8,7 +8,8 @@
 	:author: David Casado Martinez <dcasadomartinez@gmail.com>
 """
 
-from mpiece.lexer import Token
+from mpiece.lexer import Lexer, Token
+from mpiece.utils import string_types
 
 
 class MPieceException(Exception):
@@ -24,6 +25,7 @@ class RenderFunctionNotFoundException(MPieceException):
 	"""
 
 	def __init__(self, function_name, class_name):
+		super(RenderFunctionNotFoundException, self).__init__(function_name, class_name)
 		self.message = 'Function "render_%s" not found in the %s class' % (function_name, class_name)
 
 
@@ -32,6 +34,7 @@ class ParseFunctionNotFoundException(MPieceException):
 	"""
 
 	def __init__(self, function_name, class_name):
+		super(ParseFunctionNotFoundException, self).__init__(function_name, class_name)
 		self.message = 'Function "parse_%s" not found in the "%s" lexer.' % (function_name, class_name)
 
 
@@ -40,6 +43,7 @@ class RegexNotFoundException(MPieceException):
 	"""
 
 	def __init__(self, regex_name, class_name):
+		super(RegexNotFoundException, self).__init__(regex_name, class_name)
 		self.message = 'Regular expression "regex_%s" not found in the "%s" lexer class. ' % (regex_name, class_name)
 
 
@@ -48,51 +52,466 @@ class InvalidDataException(MPieceException):
 	"""
 
 	def __init__(self, function_name, class_name):
+		super(InvalidDataException, self).__init__(function_name, class_name)
 		self.message = (
 			'Function "%s.%s" returns an invalid data. The function should return a Token object, string or list\'s '
 			'of Token objects/string.' % (class_name, function_name)
 		)
 
 
+class InvalidDocumentException(MPieceException):
+	""" The serialized document is invalid or it was made with other lexer.
+	"""
+
+	def __init__(self, reason):
+		super(InvalidDocumentException, self).__init__(reason)
+		self.message = 'Invalid serialized document: %s' % reason
+
+
+class ServiceFullException(MPieceException):
+	""" The queue of the render service is full, and the text can't wait for a free place.
+	"""
+
+	def __init__(self, maxsize):
+		super(ServiceFullException, self).__init__(maxsize)
+		self.message = 'The queue of the render service is full (%d texts).' % maxsize
+
+
+class ServiceClosedException(MPieceException):
+	""" The render service is closed, so it doesn't accept new texts.
+	"""
+
+	def __init__(self):
+		super(ServiceClosedException, self).__init__()
+		self.message = 'The render service is closed.'
+
+
+class _Frame(object):
+	""" State of a token while its text is parsed.
+
+		The frames replace the python call stack used by the recursive parser. A frame stores the grammar element
+		which is being applied to the token text and the position of the regular expression inside of the text.
+	"""
+
+	__slots__ = (
+		'token', 'extras', 'order', 'text', 'element', 'matches', 'pieces', 'pos', 'results', 'index', 'child', 'key'
+	)
+
+	def __init__(self, token):
+		self.token = token
+		self.extras = token.extras_to_children
+		self.order = iter(token.order)
+		self.text = token.text
+		# The token text is replaced when the frame ends.
+		token.text = ''
+		self.element = None
+		self.matches = None
+		self.pieces = None
+		self.pos = 0
+		self.results = None
+		self.index = 0
+		self.child = None
+		self.key = None
+
+
 class MPiece(object):
 	""" Tranform the markdown text.
 	"""
 
 	TOKEN_STR = '////TOKENMDA//%d////'
 
-	def parse(self, text, lexer, renderer):
+	#: Start of the token strings, and the same string escaped when it is written in the markdown text.
+	TOKEN_STR_PREFIX = '////TOKENMDA'
+	TOKEN_STR_ESCAPED = '////TOKEN\x00MDA'
+
+	#: Nesting levels parsed with recursion. The deeper tokens are parsed with a list of frames.
+	MAX_RECURSION_DEPTH = 40
+
+	#: Number of characters of the markdown text read first by :meth:`MPiece.preview`. It is doubled until the
+	#: blocks of the preview are read.
+	PREVIEW_SIZE = 4096
+
+	def __init__(self, low_memory=False, memo=None):
+		"""
+			:param bool low_memory:
+				- ``True``: The rendered text of the children is joined in the rendered text of the token when the
+				  token is rendered, and the children are removed. The memory used is lower, but the rendered text
+				  is copied once for each nesting level.
+				- ``False``: The rendered texts are joined at the end.
+
+				The low memory mode isn't used when there is a collector, because the collector needs all tokens
+				until the end.
+
+			:param mpiece.cache.FragmentMemo memo: Reuse the rendered tokens repeated in the same text.
+		"""
+		self.low_memory = low_memory
+		self.memo = memo
+		self.collector = None
+		self.splice = False
+		#: Reference definitions of the text. See :meth:`mpiece.lexer.Lexer.get_references`.
+		self.references = {}
+
+	def parse(self, text, lexer, renderer, collector=None):
 		""" Transform markdown text.
+			:param str text: Markdown text.
+			:param lexer.LexerBase lexer: lexer.LexerBase subclass.
+			:param renderer.Renderer renderer: renderer.Renderer subclass, or a list or dictionary of renderers to
+				render the text with all of them. See :meth:`MPiece.parse_multi`.
+			:param collector: Object which stores the metadata of the tokens.
+				See :class:`mpiece.metadata.MetadataCollector`.
+			:return: Depend of renderer subclass.
+		"""
+		if isinstance(renderer, (list, tuple, dict)):
+			return self.parse_multi(text, lexer, renderer, collector)
+
+		self.init_parse(lexer, renderer, collector)
+		if lexer.is_inline_text(text):
+			text = self.parse_paragraph(text)
+		else:
+			text = self.parse_text(self.pre_process_text(text))
+
+		return self.renderer.post_process_text(self.unescape_token_str(text))
+
+	def parse_multi(self, text, lexer, renderers, collector=None):
+		""" Transform markdown text with several renderers. The text is parsed once and each token is rendered with
+			all renderers. See :meth:`MPiece.render_multi`.
+
+			:param str text: Markdown text.
+			:param lexer.LexerBase lexer: lexer.LexerBase subclass.
+			:param renderers: List or dictionary of renderer.Renderer subclasses.
+			:param collector: Object which stores the metadata of the tokens.
+				See :class:`mpiece.metadata.MetadataCollector`.
+			:return: List with the result of each renderer, or dictionary with the same keys as ``renderers``.
+		"""
+		self.init_parse(lexer, None, collector)
+		main_token = self.parse_str_token(self.lexer.get_main_token(self.pre_process_text(text)))
+
+		if self.collector is not None:
+			self.collector.finish(main_token, self.token_list)
+
+		return self.render_multi(main_token.text, self.token_list, renderers, lexer)
+
+	def parse_inline(self, text, lexer, renderer, collector=None):
+		""" Transform markdown text with only the inline grammar (see :attr:`mpiece.lexer.Lexer.order_inline`).
+			The block grammar and the footnotes aren't searched, and the text isn't in a paragraph. It is used with
+			short texts like titles or labels.
+
 			:param str text: Markdown text.
 			:param lexer.LexerBase lexer: lexer.LexerBase subclass.
 			:param renderer.Renderer renderer: renderer.Renderer subclass.
+			:param collector: Object which stores the metadata of the tokens.
+				See :class:`mpiece.metadata.MetadataCollector`.
 			:return: Depend of renderer subclass.
 		"""
+		self.init_parse(lexer, renderer, collector)
+		text = self.escape_token_str(self.lexer.pre_process_text(text)).strip()
+
+		if self.collector is not None:
+			self.collector.start(text, self.lexer)
+
+		token = self.parse_str_token(self.lexer.get_inline_token(text), 1)
+		text = self.render_main_token(Token('_only_text', self.add_token(token)))
+		return self.renderer.post_process_text(self.unescape_token_str(text))
+
+	def parse_many(self, texts, lexer, renderer, batch=True):
+		""" Transform many short markdown texts with the same lexer and renderer.
+
+			The texts of one paragraph (see :meth:`mpiece.lexer.Lexer.is_inline_text`) are joined with blank lines
+			and parsed together, so the paragraph regular expression reads the batch once. They have one line, so
+			the blank lines always separate them. Each paragraph token is joined and post processed alone, and the
+			result is the same as :meth:`MPiece.parse` with each text. The other texts are parsed one by one.
+
+			:param [str] texts: Markdown texts.
+			:param lexer.LexerBase lexer: lexer.LexerBase subclass.
+			:param renderer.Renderer renderer: renderer.Renderer subclass.
+			:param bool batch: Join the texts of one paragraph. If it is ``False``, the texts are parsed one by one.
+			:return: List with the result of each text.
+		"""
+		results = [None] * len(texts)
+		indexes = [i for i, text in enumerate(texts) if lexer.is_inline_text(text)] if batch else []
+
+		if len(indexes) > 1:
+			self.init_parse(lexer, renderer)
+			self.splice = False
+			text = self.escape_token_str(lexer.pre_process_text('\n\n'.join([texts[i] for i in indexes])))
+			main_token = self.parse_str_token(lexer.get_paragraph_token(text))
+			del text
+			token_strs = [mo.group(0) for mo in lexer.regex_token.finditer(main_token.text)]
+
+			if len(token_strs) == len(indexes):
+				for i, token_str in zip(indexes, token_strs):
+					text = self.parse_token_str('\n%s\n\n' % token_str)
+					results[i] = renderer.post_process_text(self.unescape_token_str(text))
+
+		for i, text in enumerate(texts):
+			if results[i] is None:
+				results[i] = self.parse(text, lexer, renderer)
+
+		return results
+
+	def iter_parse(self, text, lexer, renderer, size):
+		""" Transform markdown text by groups of top level blocks. The groups are made with
+			:meth:`mpiece.lexer.Lexer.split_blocks` and each group is freed when it is rendered. The text is one group
+			when the renderer can't post-process the groups separately (see
+			:meth:`mpiece.renderer.Renderer.post_process_by_blocks`).
+
+			:param str text: Markdown text.
+			:param lexer.LexerBase lexer: lexer.LexerBase subclass.
+			:param renderer.Renderer renderer: renderer.Renderer subclass.
+			:param int size: Minimum number of characters of each group.
+			:return: Iterator of the rendered groups. Joined, they are the same as the :meth:`MPiece.parse` result.
+		"""
+		self.init_parse(lexer, renderer)
+		text = self.pre_process_text(text)
+
+		if renderer.post_process_by_blocks():
+			groups = lexer.split_blocks(text, size)
+		else:
+			groups = [text]
+
+		del text
+		groups.reverse()
+		references = self.references
+
+		while groups:
+			self.init_parse(lexer, renderer)
+			self.references = references
+			text = self.parse_text(groups.pop())
+			yield renderer.post_process_text(self.unescape_token_str(text))
+
+	def preview(self, text, lexer, renderer, max_blocks=None, max_chars=None):
+		""" Transform the first top level blocks of the markdown text. The text is read by lines until the limits are
+			reached, so the rest of the text isn't parsed. See :meth:`mpiece.lexer.Lexer.cut_blocks`.
+
+			The footnotes defined after the blocks read aren't applied.
+
+			:param str text: Markdown text.
+			:param lexer.LexerBase lexer: lexer.LexerBase subclass.
+			:param renderer.Renderer renderer: renderer.Renderer subclass.
+			:param int max_blocks: Maximum number of blocks.
+			:param int max_chars: Maximum number of characters of the markdown text of the blocks.
+			:return: Tuple with the rendered text and ``True`` if the text was truncated.
+		"""
+		self.init_parse(lexer, renderer)
+		size = max(self.PREVIEW_SIZE, 2 * (max_chars or 0))
+
+		while True:
+			complete = size >= len(text)
+			if complete:
+				part = text
+			else:
+				# Only whole lines, so the last footnote isn't cut.
+				part = text[:text.rfind('\n', 0, size) + 1] or text[:size]
+
+			blocks, truncated = lexer.cut_blocks(self.pre_process_text(part), max_blocks, max_chars, complete)
+			if blocks is not None:
+				break
+
+			size *= 2
+
+		text = self.parse_text(blocks)
+		return self.renderer.post_process_text(self.unescape_token_str(text)), truncated
+
+	def lex(self, text, lexer):
+		""" Parse the markdown text without render it.
+			The tokens are stored in :attr:`MPiece.token_list` without the rendered text.
+
+			:param str text: Markdown text.
+			:param lexer.LexerBase lexer: lexer.LexerBase subclass.
+			:return: Main token. Its text has the token strings of the tokens.
+		"""
+		self.init_parse(lexer, None)
+		main_token = self.lexer.get_main_token(self.pre_process_text(text))
+		return self.parse_str_token(main_token)
+
+	def init_parse(self, lexer, renderer, collector=None):
+		""" Prepare the object to parse a new text.
+
+			:param lexer.LexerBase lexer: lexer.LexerBase subclass.
+			:param renderer.Renderer renderer: renderer.Renderer subclass or ``None`` to parse without render.
+			:param collector: Object which stores the metadata of the tokens.
+		"""
 		self.lexer = lexer
 		self.renderer = renderer
+		self.collector = collector
+		self.splice = self.low_memory and collector is None and renderer is not None
 		self.token_list = []
 		self.token_list_length = 0
+		self.references = {}
+
+		if self.memo is not None:
+			self.memo.start()
+
+	def pre_process_text(self, text):
+		""" Prepare the markdown text to be parsed: the lexer preprocesses it, the token strings written in the text
+			are escaped, the footnotes are applied and the definitions of the reference links are collected in
+			:attr:`MPiece.references`.
+
+			:param str text: Markdown text.
+			:return str: Text ready to :meth:`MPiece.parse_text`.
+		"""
+		text = self.escape_token_str(self.lexer.pre_process_text(text))
 
-		# preprocess text
-		text = self.lexer.pre_process_text(text)
+		if self.collector is not None:
+			self.collector.start(text, self.lexer)
 
-		# Parse footnotes
 		if 'footnotes' not in self.lexer.exclude:
 			text = self.lexer.parse_footnotes(text)
 
+		if 'references' not in self.lexer.exclude:
+			text, self.references = self.lexer.get_references(text)
+
+		return text
+
+	def parse_text(self, text):
+		""" Parse and render the text prepared with :meth:`MPiece.pre_process_text`.
+
+			:param str text: Text.
+			:return str: Rendered text, before :meth:`mpiece.renderer.Renderer.post_process_text` and with the token
+				strings of the markdown text escaped.
+		"""
 		main_token = self.lexer.get_main_token(text)
-		main_token = self.parse_str_token(main_token)
-		text = self.parse_token_str(main_token.text)
-		output = self.renderer.post_process_text(text)
+		del text
+		return self.render_main_token(self.parse_str_token(main_token))
 
-		return output
+	def parse_paragraph(self, text):
+		""" Parse and render a markdown text of one paragraph, checked with
+			:meth:`mpiece.lexer.Lexer.is_inline_text`. The footnotes and the block grammar aren't searched: the main
+			token only has the paragraph. The result is the same as with :meth:`MPiece.pre_process_text` and
+			:meth:`MPiece.parse_text`.
 
-	def parse_str_token(self, token):
-		text = token.text
+			:param str text: Markdown text.
+			:return str: Rendered text, like :meth:`MPiece.parse_text`.
+		"""
+		text = self.escape_token_str(self.lexer.pre_process_text(text))
+
+		if self.collector is not None:
+			self.collector.start(text, self.lexer)
+
+		main_token = self.lexer.get_paragraph_token(text)
+		del text
+		return self.render_main_token(self.parse_str_token(main_token))
+
+	def render_main_token(self, main_token):
+		""" Render the main token, already parsed, and the tokens of :attr:`MPiece.token_list`.
+
+			:param mpiece.lexer.Token main_token: Main token. Its text has the token strings of its children.
+			:return str: Rendered text, like :meth:`MPiece.parse_text`.
+		"""
+		if self.collector is not None:
+			self.collector.finish(main_token, self.token_list)
+
+		if self.splice:
+			text = self.splice_tokens(main_token.text, self.token_list_length)
+			main_token.text = ''
+			self.token_list = []
+			return text
+
+		return self.parse_token_str(main_token.text)
+
+	def render(self, text, token_list, renderer, lexer=None):
+		""" Render the tokens obtained with :meth:`MPiece.lex`.
+
+			:param str text: Text of the main token.
+			:param [mpiece.lexer.Token] token_list: Tokens. The children always are before their father.
+			:param renderer.Renderer renderer: renderer.Renderer subclass, or a list or dictionary of renderers.
+				See :meth:`MPiece.render_multi`.
+			:param lexer.LexerBase lexer: Lexer used to find the token strings. By default the :class:`Lexer` class.
+			:return: Depend of renderer subclass.
+		"""
+		if isinstance(renderer, (list, tuple, dict)):
+			return self.render_multi(text, token_list, renderer, lexer)
+
+		self.init_parse(lexer, renderer)
+		self.splice = False
+		self.token_list = token_list
+		self.token_list_length = len(token_list)
+
+		for token in token_list:
+			self.render_token(token)
+
+		text = self.parse_token_str(text)
+		return self.renderer.post_process_text(self.unescape_token_str(text))
+
+	def render_multi(self, text, token_list, renderers, lexer=None):
+		""" Render the tokens obtained with :meth:`MPiece.lex` with several renderers. The token list is read once:
+			each token is rendered with all renderers, and the rendered texts of each renderer are joined at the end.
+
+			:param str text: Text of the main token.
+			:param [mpiece.lexer.Token] token_list: Tokens. The children always are before their father.
+			:param renderers: List or dictionary of renderer.Renderer subclasses.
+			:param lexer.LexerBase lexer: Lexer used to find the token strings. By default the :class:`Lexer` class.
+			:return: List with the result of each renderer, or dictionary with the same keys as ``renderers``.
+		"""
+		keys = list(renderers) if isinstance(renderers, dict) else list(range(len(renderers)))
+		all_renderers = [renderers[key] for key in keys]
+
+		self.init_parse(lexer, None)
+		self.token_list = token_list
+		self.token_list_length = len(token_list)
+		all_render_texts = [[] for renderer in all_renderers]
+
+		for token in token_list:
+			for renderer, render_texts in zip(all_renderers, all_render_texts):
+				self.renderer = renderer
+				self.render_token(token)
+				render_texts.append(token.render_text)
+
+		results = []
+		for renderer, render_texts in zip(all_renderers, all_render_texts):
+			for token, render_text in zip(token_list, render_texts):
+				token.render_text = render_text
+
+			self.renderer = renderer
+			results.append(renderer.post_process_text(self.unescape_token_str(self.parse_token_str(text))))
+
+		if isinstance(renderers, dict):
+			return dict(zip(keys, results))
+
+		return results
+
+	def escape_token_str(self, text):
+		""" Change the token strings written in the markdown text, so they aren't replaced with tokens.
+			The ``\x00`` character is used because :meth:`mpiece.lexer.Lexer.pre_process_text` removes it.
+
+			:param str text: Markdown text.
+			:return str: Text with the token strings escaped.
+		"""
+		if self.TOKEN_STR_PREFIX in text:
+			text = text.replace(self.TOKEN_STR_PREFIX, self.TOKEN_STR_ESCAPED)
+
+		return text
+
+	def unescape_token_str(self, text):
+		""" Restore the token strings escaped with :meth:`MPiece.escape_token_str`.
 
+			:param str text: Rendered text.
+			:return str: Text with the original token strings.
+		"""
+		if self.TOKEN_STR_ESCAPED in text:
+			text = text.replace(self.TOKEN_STR_ESCAPED, self.TOKEN_STR_PREFIX)
+
+		return text
+
+	def parse_str_token(self, token, depth=0):
+		""" Parse the text of the token and the text of all its children.
+
+			The tokens are parsed with ``re.sub`` and recursion until :attr:`MPiece.MAX_RECURSION_DEPTH` nesting
+			levels. The deeper tokens are parsed with :meth:`MPiece.parse_str_token_stack`.
+
+			:param mpiece.lexer.Token token: Token parsed.
+			:param int depth: Nesting level of the token.
+			:return: The same token with its text parsed.
+		"""
 		# Token hasn't text
 		if not token.has_text:
 			return token
 
+		if depth >= self.MAX_RECURSION_DEPTH:
+			return self.parse_str_token_stack(token)
+
+		text = token.text
+
 		# Get the extras to the children.
 		father_extras = token.extras_to_children
 
@@ -106,73 +525,340 @@ class MPiece(object):
 			except KeyError:
 				raise RegexNotFoundException(element, self.lexer.__class__.__name__)
 
-			text = regex.sub(self.replace_str_token(element, father_extras), text)
+			text = regex.sub(self.replace_str_token(element, father_extras, depth + 1), text)
 
 		token.text = text
 		return token
 
-	def replace_str_token(self, element, extras_to_children):
+	def parse_str_token_stack(self, token):
+		""" Parse the text of the token and the text of all its children without recursion.
 
-		def _replace_regex(mo):
-			try:
-				parse_func = self.lexer.all_parse_func[element]
-			except KeyError:
-				raise ParseFunctionNotFoundException(element, self.lexer.__class__.__name__)
+			The children are parsed and rendered in the same order that :meth:`MPiece.parse_str_token` does it, but
+			the pending work is stored in a list of frames instead of in the python call stack. So the nesting level
+			of the markdown text only costs memory and it never reaches the recursion limit.
 
-			if not extras_to_children:
-				# parse function without extra for childrens.
-				result = parse_func(mo)
-			else:
-				# parse function with extras for children.
-				result = parse_func(mo, **extras_to_children)
+			:param mpiece.lexer.Token token: Token parsed.
+			:return: The same token with its text parsed.
+		"""
+		# Token hasn't text
+		if not token.has_text:
+			return token
 
-			if not isinstance(result, (list, tuple)):
-				result = [result]
+		stack = [_Frame(token)]
 
-			str_r = ''
-			for r in result:
+		while stack:
+			frame = stack[-1]
 
-				if isinstance(r, str):
-					# r is str add to main str and continue.
-					str_r += r
+			if frame.results is not None:
+				# Continue with the result of the parse function.
+				if frame.child is not None:
+					# The child token was parsed. It is rendered.
+					frame.pieces.append(self.store_token(frame.child, frame.key))
+					frame.child = frame.key = None
+
+				results = frame.results
+				while frame.index < len(results):
+					r = results[frame.index]
+					frame.index += 1
+
+					if isinstance(r, string_types):
+						# r is str add to main str and continue.
+						frame.pieces.append(r)
+						continue
+
+					token_str, key = self.find_memo_token(frame.element, r)
+					if token_str is None and r.has_text:
+						# r is token with text. It is parsed before continue.
+						frame.child = r
+						frame.key = key
+						stack.append(_Frame(r))
+						break
+
+					frame.pieces.append(token_str if token_str is not None else self.store_token(r, key))
+
+				if frame.child is not None:
 					continue
 
-				if isinstance(r, Token):
-					# r is token. It is parsed.
-					r = self.parse_str_token(r)
-				else:
-					# r isn't a str or a Token
-					raise InvalidDataException(parse_func.__name__, self.lexer.__class__.__name__)
+				frame.results = None
+
+			if frame.matches is not None:
+				mo = next(frame.matches, None)
+
+				if mo is not None:
+					# Parse the next match of the grammar element.
+					frame.pieces.append(frame.text[frame.pos:mo.start()])
+					frame.pos = mo.end()
+					frame.results = self.parse_match(frame.element, frame.extras, mo)
+					frame.index = 0
+					continue
+
+				# All matches of the grammar element were parsed.
+				frame.pieces.append(frame.text[frame.pos:])
+				frame.text = ''.join(frame.pieces)
+				frame.matches = frame.pieces = None
+
+			# Search the next grammar element.
+			for element in frame.order:
+				if element in self.lexer.exclude:
+					continue
 
-				# Render token
 				try:
-					render_func = self.renderer.all_render_funcs[r.render_func]
+					regex = self.lexer.all_regex[element]
 				except KeyError:
-					raise RenderFunctionNotFoundException(r.render_func, self.renderer.__class__.__name__)
+					raise RegexNotFoundException(element, self.lexer.__class__.__name__)
 
-				if r.has_text:
-					# render with text.
-					r.render_text = render_func(text=r.text, **r.extras)
-				else:
-					# render without text
-					r.render_text = render_func(**r.extras)
+				frame.element = element
+				frame.matches = regex.finditer(frame.text)
+				frame.pieces = []
+				frame.pos = 0
+				break
 
-				# add token to token list
-				str_r += self.TOKEN_STR % self.token_list_length
-				self.token_list_length += 1
-				self.token_list.append(r)
+			else:
+				# All grammar elements were applied.
+				frame.token.text = frame.text
+				stack.pop()
+
+		return token
+
+	def parse_match(self, element, extras_to_children, mo):
+		""" Call to the parse function of the grammar element. The parse functions of the elements of
+			:attr:`mpiece.lexer.Lexer.reference_elements` get :attr:`MPiece.references` instead of the extras.
+
+			:param str element: Grammar element name.
+			:param dict extras_to_children: Extra data used in the parse function.
+			:param mo: Match object of the grammar element regular expression.
+			:return: List of strings and/or Token objects.
+		"""
+		try:
+			parse_func = self.lexer.all_parse_func[element]
+		except KeyError:
+			raise ParseFunctionNotFoundException(element, self.lexer.__class__.__name__)
+
+		if element in self.lexer.reference_elements:
+			result = parse_func(mo, self.references)
+		elif not extras_to_children:
+			# parse function without extra for childrens.
+			result = parse_func(mo)
+		else:
+			# parse function with extras for children.
+			result = parse_func(mo, **extras_to_children)
+
+		if not isinstance(result, (list, tuple)):
+			result = [result]
+
+		return result
+
+	def find_memo_token(self, element, token):
+		""" Check a result of a parse function and find it in the memo. It is used by the recursive and by the stack
+			parsers.
+
+			:param str element: Grammar element name.
+			:param token: Result of the parse function which isn't a string.
+			:return: Tuple with the token string of the token reused from the memo, or ``None``, and the memo key, or
+				``None`` when the token can't be reused.
+			:exception: :class:`InvalidDataException` if the result isn't a token.
+		"""
+		if not isinstance(token, Token):
+			# r isn't a str or a Token
+			parse_func = self.lexer.all_parse_func[element]
+			raise InvalidDataException(parse_func.__name__, self.lexer.__class__.__name__)
+
+		if self.memo is None:
+			return None, None
+
+		key = self.memo.get_key(element, token)
+		if key is not None:
+			value = self.memo.get(key)
+			if value is not None:
+				return self.add_memo_token(value), key
+
+		return None, key
+
+	def store_token(self, token, key):
+		""" Add a token, with its text already parsed, to the token list and to the memo.
+
+			:param mpiece.lexer.Token token: Token parsed.
+			:param key: Memo key of the token, or ``None``.
+			:return str: Token string which replaces the token in the text.
+		"""
+		token_str = self.add_token(token)
+		if key is not None:
+			self.memo.set(key, self.token_list[-1])
+
+		return token_str
+
+	def add_token(self, token):
+		""" Add a parsed token to the token list. The token is rendered if there is a renderer.
+
+			:param mpiece.lexer.Token token: Token parsed.
+			:return str: Token string which replaces the token in the text.
+		"""
+		if self.renderer is not None:
+			self.render_token(token)
+
+		token_str = self.TOKEN_STR % self.token_list_length
+		self.token_list_length += 1
+		self.token_list.append(token)
+
+		if self.splice and self.renderer is not None:
+			token.render_text = self.splice_tokens(token.render_text, self.token_list_length - 1)
+			token.text = ''
+
+			# Only the rendered text is necessary.
+			self.token_list[-1] = token.render_text
+
+		return token_str
+
+	def add_memo_token(self, value):
+		""" Add a token reused from the memo to the token list.
+
+			:param value: Token or, in the low memory mode, its rendered text.
+			:return str: Token string which replaces the token in the text.
+		"""
+		token_str = self.TOKEN_STR % self.token_list_length
+		self.token_list_length += 1
+		self.token_list.append(value)
+		return token_str
+
+	def render_token(self, token):
+		""" Render a parsed token. The result is stored in the ``render_text`` attribute of the token.
+
+			:param mpiece.lexer.Token token: Token parsed.
+		"""
+		if token.has_text and token.render_func in self.renderer.text_render_funcs:
+			# The render function returns the text without changes.
+			token.render_text = token.text
+			return
+
+		try:
+			render_func = self.renderer.all_render_funcs[token.render_func]
+		except KeyError:
+			raise RenderFunctionNotFoundException(token.render_func, self.renderer.__class__.__name__)
+
+		if token.has_text:
+			# render with text.
+			token.render_text = render_func(text=token.text, **token.extras)
+		else:
+			# render without text
+			token.render_text = render_func(**token.extras)
+
+	def splice_tokens(self, text, limit):
+		""" Replace the token strings with the rendered text of the tokens, and remove the tokens of the token list.
+			It is used in the low memory mode. The rendered text of the tokens already has the
+			rendered text of their children, and the token list can have the rendered text instead of the token.
+
+			:param str text: Text with token strings.
+			:param int limit: Only the tokens before this position are replaced.
+			:return str: Text with the tokens rendered.
+		"""
+		token_list = self.token_list
+		pieces = []
+		pos = 0
+
+		for mo in self.lexer.regex_token.finditer(text):
+			number = int(mo.group('number'))
+			token = token_list[number] if number < limit else None
+			if token is None:
+				# It isn't a child of the token.
+				continue
+
+			pieces.append(text[pos:mo.start()])
+			pieces.append(token if isinstance(token, string_types) else token.render_text)
+			token_list[number] = None
+			pos = mo.end()
+
+		if not pieces:
+			return text
+
+		pieces.append(text[pos:])
+		return ''.join(pieces)
+
+	def replace_str_token(self, element, extras_to_children, depth=0):
+		""" Make the function used in the ``re.sub`` function to replace the grammar element with tokens.
+
+			:param str element: Grammar element name.
+			:param dict extras_to_children: Extra data used in the parse function.
+			:param int depth: Nesting level of the tokens made by the parse function.
+			:return: function.
+		"""
+		def _replace_regex(mo):
+			str_r = ''
+			for r in self.parse_match(element, extras_to_children, mo):
+				if isinstance(r, string_types):
+					# r is str add to main str and continue.
+					str_r += r
+					continue
+
+				token_str, key = self.find_memo_token(element, r)
+				if token_str is None:
+					token_str = self.store_token(self.parse_str_token(r, depth), key)
+
+				str_r += token_str
 
 			return str_r
 		return _replace_regex
 
-	def replace_token_str(self, mo):
-		return self.token_list[int(mo.group('number'))].render_text
-
 	def parse_token_str(self, text):
-		replace_func = self.replace_token_str
-		regex = self.lexer.regex_token
-		text, changes = regex.subn(replace_func, text)
-		while changes > 0:
-			text, changes = self.lexer.regex_token.subn(replace_func, text)
+		""" Replace the token strings with the rendered text of the tokens.
 
-		return text
+			The rendered text of a token only can have token strings of its children, which always are before in the
+			token list. The token strings are replaced with ``re.sub`` and recursion until
+			:attr:`MPiece.MAX_RECURSION_DEPTH` nesting levels, and with :meth:`MPiece.parse_token_str_stack` after.
+
+			:param str text: Text with token strings.
+			:return str: Text with the tokens rendered.
+		"""
+		regex = (self.lexer or Lexer).regex_token
+		token_list = self.token_list
+		max_depth = self.MAX_RECURSION_DEPTH
+
+		def replace_text(text, limit, depth):
+			if depth >= max_depth:
+				return self.parse_token_str_stack(text, limit)
+
+			def _replace_token(mo):
+				number = int(mo.group('number'))
+				if number >= limit:
+					# It isn't a child of the token.
+					return mo.group(0)
+
+				return replace_text(token_list[number].render_text, number, depth + 1)
+
+			return regex.sub(_replace_token, text)
+
+		return replace_text(text, len(token_list), 0)
+
+	def parse_token_str_stack(self, text, limit):
+		""" Replace the token strings with the rendered text of the tokens without recursion.
+			The rendered texts are joined in one pass, using a list of frames.
+
+			:param str text: Text with token strings.
+			:param int limit: Only the tokens before this position are replaced.
+			:return str: Text with the tokens rendered.
+		"""
+		regex = (self.lexer or Lexer).regex_token
+		token_list = self.token_list
+		output = []
+		# Each frame is: [text, matches, limit of the token numbers, position in the text].
+		stack = [[text, regex.finditer(text), limit, 0]]
+
+		while stack:
+			frame = stack[-1]
+
+			for mo in frame[1]:
+				number = int(mo.group('number'))
+				if number >= frame[2]:
+					# It isn't a child of the token.
+					continue
+
+				output.append(frame[0][frame[3]:mo.start()])
+				frame[3] = mo.end()
+				render_text = token_list[number].render_text
+				stack.append([render_text, regex.finditer(render_text), number, 0])
+				break
+
+			else:
+				output.append(frame[0][frame[3]:])
+				stack.pop()
+
+		return ''.join(output)
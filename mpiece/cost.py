@@ -0,0 +1,325 @@
+"""
+	mpiece.cost
+	~~~~~~~~~~~
+
+	Estimation of the render time and the memory of a markdown text, before it is rendered.
+
+	Example:
+		.. code:: python
+
+			from mpiece.cost import estimate_cost
+
+			cost = estimate_cost(markdown_text)
+			if cost.exceeds(max_seconds=0.5, max_memory=50 * 1024 * 1024):
+				# Reject the text, or render it in other pool of workers.
+				...
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+from __future__ import division
+
+import re
+from timeit import default_timer
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+from mpiece.core import MPiece
+from mpiece.lexer import Lexer
+from mpiece.renderer import HtmlRenderer
+
+
+class CostEstimate(object):
+	"""
+		Render cost predicted by a :class:`CostModel`.
+
+		:ivar dict features: Counts of the text used by the model. See :meth:`CostModel.get_features`.
+		:ivar float seconds: Render time, in seconds.
+		:ivar int memory: Memory peak while the text is rendered, in bytes.
+	"""
+
+	def __init__(self, features, seconds, memory):
+		self.features = features
+		self.seconds = seconds
+		self.memory = memory
+
+	def __repr__(self):
+		return '<CostEstimate seconds=%.6f memory=%d>' % (self.seconds, self.memory)
+
+	def exceeds(self, max_seconds=None, max_memory=None):
+		""" Check the estimate against a budget.
+
+			:param float max_seconds: Maximum render time, or ``None``.
+			:param int max_memory: Maximum memory peak in bytes, or ``None``.
+			:return bool: ``True`` if the time or the memory is over the budget.
+		"""
+		return (
+			(max_seconds is not None and self.seconds > max_seconds) or
+			(max_memory is not None and self.memory > max_memory)
+		)
+
+
+class CostModel(object):
+	"""
+		Linear model of the render time and the memory peak of a markdown text, from counts of the text: characters,
+		lines, list and blockquote markers with their nesting level, table pipes, emphasis delimiters, links and
+		footnote references. The counts are made without parse the text, in a few passes of :meth:`str.count` and one
+		regular expression, so they take a few percent of the render time.
+
+		The nested lists and blockquotes are parsed again in each nesting level, so their cost isn't linear: the
+		``nested_chars`` feature is the length of each line with a marker multiplied by its nesting level.
+
+		The default weights were calibrated with ``benchmarks/cost.py`` and :class:`mpiece.renderer.HtmlRenderer` on
+		CPython 3.11. They depend on the machine: use :meth:`CostModel.calibrate` to fit the weights to the machine,
+		the lexer and the renderer used.
+
+		:param dict time_weights: Seconds of each unit of the features. By default :attr:`CostModel.time_weights`.
+		:param dict memory_weights: Bytes of each unit of the features. By default :attr:`CostModel.memory_weights`.
+	"""
+
+	#: Features of the model. ``constant`` is always 1.
+	feature_names = (
+		'constant', 'chars', 'lines', 'list_markers', 'blockquote_markers', 'nesting', 'nested_chars', 'table_pipes',
+		'emphasis', 'links', 'footnotes',
+	)
+
+	#: Seconds of each unit of the features.
+	time_weights = {
+		'constant': 2.7e-05, 'chars': 2.8e-07, 'lines': 0.0, 'list_markers': 2e-05, 'blockquote_markers': 1e-05,
+		'nesting': 6.6e-07, 'nested_chars': 1.6e-08, 'table_pipes': 6.6e-06, 'emphasis': 2.2e-06, 'links': 7.9e-06,
+		'footnotes': 8.7e-07,
+	}
+
+	#: Bytes of each unit of the features.
+	memory_weights = {
+		'constant': 4175.0, 'chars': 7.158, 'lines': 0.0, 'list_markers': 658.6, 'blockquote_markers': 316.2,
+		'nesting': 0.0, 'nested_chars': 5.71, 'table_pipes': 363.3, 'emphasis': 139.0, 'links': 479.2,
+		'footnotes': 0.0,
+	}
+
+	regex_markers = re.compile(r'^(?P<indent>[ \t]*)(?:(?P<quote>>[ >]*)|(?:[*-]|[0-9]+\.)[ ])', re.M)
+
+	def __init__(self, time_weights=None, memory_weights=None):
+		if time_weights is not None:
+			self.time_weights = time_weights
+
+		if memory_weights is not None:
+			self.memory_weights = memory_weights
+
+	def get_features(self, text, lexer=None):
+		""" Count the features of the text. The characters are counted with :meth:`str.count`, one pass for each
+			string, and the markers of the lists and the blockquotes, at the start of the lines, with one regular
+			expression. The features of the grammar excluded in the lexer are 0.
+
+			:param str text: Markdown text.
+			:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+			:return dict: Value of each feature of :attr:`CostModel.feature_names`.
+		"""
+		exclude = lexer.exclude if lexer is not None else ()
+		tab_size = lexer.tab_size if lexer is not None else 4
+		count = text.count
+		features = dict.fromkeys(self.feature_names, 0)
+		features['constant'] = 1
+		features['chars'] = len(text)
+		features['lines'] = count('\n') + 1
+		features['emphasis'] = count('*') + count('_') + count('~') + count('`')
+		features['links'] = count('](') + count('][')
+
+		if 'table' not in exclude:
+			features['table_pipes'] = count('|')
+
+		if 'footnotes' not in exclude:
+			features['footnotes'] = count('[^')
+
+		list_markers = blockquote_markers = nesting = nested_chars = 0
+		for mo in self.regex_markers.finditer(text):
+			quote = mo.group('quote')
+			if quote is not None:
+				# Each level of the blockquote is a token.
+				level = quote.count('>')
+				blockquote_markers += level
+			else:
+				list_markers += 1
+				level = 1 + len(mo.group('indent').expandtabs(tab_size)) // 2
+
+			nesting += level
+			end = text.find('\n', mo.start())
+			nested_chars += level * ((len(text) if end == -1 else end) - mo.start())
+
+		if 'ulist' not in exclude or 'olist' not in exclude:
+			features['list_markers'] = list_markers
+
+		if 'blockquote' not in exclude:
+			features['blockquote_markers'] = blockquote_markers
+
+		features['nesting'] = nesting
+		features['nested_chars'] = nested_chars
+		return features
+
+	def predict(self, features):
+		""" Apply the weights of the model to the features.
+
+			:param dict features: Features of a text.
+			:return: :class:`CostEstimate` object.
+		"""
+		seconds = sum(self.time_weights.get(name, 0) * value for name, value in features.items())
+		memory = sum(self.memory_weights.get(name, 0) * value for name, value in features.items())
+		return CostEstimate(features, max(seconds, 0.0), int(max(memory, 0)))
+
+	def estimate(self, text, lexer=None):
+		""" Estimate the render cost of a markdown text.
+
+			:param str text: Markdown text.
+			:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+			:return: :class:`CostEstimate` object.
+		"""
+		return self.predict(self.get_features(text, lexer))
+
+	def measure(self, text, lexer=None, renderer=None, repeat=3):
+		""" Render a text and measure its cost. The time is the best of ``repeat`` renders, and the memory peak is
+			measured with tracemalloc in other render.
+
+			:param str text: Markdown text.
+			:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+			:param mpiece.renderer.Renderer renderer: Renderer object. By default :class:`mpiece.renderer.HtmlRenderer`.
+			:param int repeat: Number of renders timed.
+			:return: Tuple with the seconds and the bytes of the memory peak (``0`` without tracemalloc).
+		"""
+		lexer = lexer or Lexer()
+		renderer = renderer or HtmlRenderer()
+		seconds = None
+
+		for i in range(repeat):
+			start = default_timer()
+			MPiece().parse(text, lexer, renderer)
+			elapsed = default_timer() - start
+			seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+		memory = 0
+		if tracemalloc is not None and not tracemalloc.is_tracing():
+			tracemalloc.start()
+			try:
+				MPiece().parse(text, lexer, renderer)
+				memory = tracemalloc.get_traced_memory()[1]
+			finally:
+				tracemalloc.stop()
+
+		return seconds, memory
+
+	def calibrate(self, texts, lexer=None, renderer=None, repeat=3):
+		""" Render the texts and fit the weights of the model to the costs measured, with non negative least squares.
+			The texts should have several sizes and grammar elements.
+
+			:param [str] texts: Markdown texts.
+			:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+			:param mpiece.renderer.Renderer renderer: Renderer object. By default :class:`mpiece.renderer.HtmlRenderer`.
+			:param int repeat: Number of renders timed of each text.
+			:return: List of tuples with the features, the seconds and the memory peak of each text.
+		"""
+		samples = []
+		for text in texts:
+			seconds, memory = self.measure(text, lexer, renderer, repeat)
+			samples.append((self.get_features(text, lexer), seconds, memory))
+
+		rows = [[features[name] for name in self.feature_names] for features, seconds, memory in samples]
+		self.time_weights = dict(zip(self.feature_names, fit_relative(rows, [sample[1] for sample in samples])))
+		if tracemalloc is not None:
+			self.memory_weights = dict(zip(self.feature_names, fit_relative(rows, [sample[2] for sample in samples])))
+
+		return samples
+
+
+def fit(rows, values):
+	""" Non negative least squares, with the normal equations. The features with negative weights are removed and the
+		weights are fitted again, until all weights are positive or zero.
+
+		:param [[float]] rows: Features of each sample.
+		:param [float] values: Measured value of each sample.
+		:return [float]: Weight of each feature.
+	"""
+	size = len(rows[0]) if rows else 0
+	# The columns are scaled, because the features have very different sizes.
+	scales = [max(abs(row[i]) for row in rows) or 1.0 for i in range(size)]
+	active = [i for i in range(size) if any(row[i] for row in rows)]
+	weights = [0.0] * size
+
+	while active:
+		matrix = [[sum(row[i] * row[j] / (scales[i] * scales[j]) for row in rows) for j in active] for i in active]
+		vector = [sum(row[i] * value / scales[i] for row, value in zip(rows, values)) for i in active]
+		for k in range(len(active)):
+			# Small ridge, so the system always has solution.
+			matrix[k][k] += 1e-9
+
+		solution = solve(matrix, vector)
+		negative = [i for i, weight in zip(active, solution) if weight < 0]
+		if not negative:
+			for i, weight in zip(active, solution):
+				weights[i] = weight / scales[i]
+
+			break
+
+		active = [i for i in active if i not in negative]
+
+	return weights
+
+
+def fit_relative(rows, values):
+	""" Fit the weights to the relative errors: each sample is divided by its measured value, so the small texts
+		count as much as the big texts. See :func:`fit`.
+
+		:param [[float]] rows: Features of each sample.
+		:param [float] values: Measured value of each sample.
+		:return [float]: Weight of each feature.
+	"""
+	scaled_rows = []
+	for row, value in zip(rows, values):
+		value = max(value, 1e-12)
+		scaled_rows.append([item / value for item in row])
+
+	return fit(scaled_rows, [1.0 if value > 0 else 0.0 for value in values])
+
+
+def solve(matrix, vector):
+	""" Solve a linear system with gaussian elimination and partial pivoting.
+
+		:param [[float]] matrix: Square matrix. It is changed.
+		:param [float] vector: Right side. It is changed.
+		:return [float]: Solution.
+	"""
+	size = len(vector)
+	for k in range(size):
+		pivot = max(range(k, size), key=lambda i: abs(matrix[i][k]))
+		matrix[k], matrix[pivot] = matrix[pivot], matrix[k]
+		vector[k], vector[pivot] = vector[pivot], vector[k]
+
+		for i in range(k + 1, size):
+			factor = matrix[i][k] / matrix[k][k]
+			for j in range(k, size):
+				matrix[i][j] -= factor * matrix[k][j]
+
+			vector[i] -= factor * vector[k]
+
+	solution = [0.0] * size
+	for k in reversed(range(size)):
+		solution[k] = (vector[k] - sum(matrix[k][j] * solution[j] for j in range(k + 1, size))) / matrix[k][k]
+
+	return solution
+
+
+#: Model used by :func:`estimate_cost`.
+default_model = CostModel()
+
+
+def estimate_cost(text, lexer=None, model=None):
+	""" Estimate the render time and the memory peak of a markdown text, without render it.
+
+		:param str text: Markdown text.
+		:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+		:param CostModel model: Model used. By default the model with the default weights.
+		:return: :class:`CostEstimate` object.
+	"""
+	return (model or default_model).estimate(text, lexer)
@@ -0,0 +1,171 @@
+"""
+	mpiece.document
+	~~~~~~~~~~~~~~~
+
+	Markdown text parsed by the lexer, ready to be stored and rendered later with any renderer.
+
+	Example:
+		.. code:: python
+
+			from mpiece.document import lex, loads
+			from mpiece.renderer import HtmlRenderer
+
+			data = lex(markdown_text).dumps()
+			# Store data in a database...
+			result = loads(data).render(HtmlRenderer())
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import hashlib
+import json
+import struct
+import zlib
+
+from mpiece.core import MPiece, InvalidDocumentException
+from mpiece.events import walk_tokens
+from mpiece.lexer import Lexer, Token
+from mpiece.utils import string_types
+
+#: Initial bytes of the serialized documents.
+MAGIC = b'MPD'
+
+#: Version of the serialization format.
+FORMAT_VERSION = 1
+
+
+def lexer_fingerprint(lexer):
+	""" Make a string which identifies the grammar of a lexer.
+		Two lexers with the same fingerprint make the same tokens.
+
+		:param mpiece.lexer.Lexer lexer: Lexer object.
+		:return str: Fingerprint.
+	"""
+	config = [
+		'%s.%s' % (lexer.__class__.__module__, lexer.__class__.__name__),
+		sorted(lexer.exclude),
+		lexer.tab_size,
+		lexer.escape_chars,
+		sorted((name, regex.pattern, regex.flags) for name, regex in lexer.all_regex.items()),
+		sorted(lexer.all_parse_func),
+		sorted((name, getattr(lexer, name)) for name in dir(lexer) if name.startswith('order_')),
+	]
+	return hashlib.sha1(repr(config).encode('utf-8')).hexdigest()
+
+
+class Document(object):
+	"""
+		Markdown text parsed. It is made with the :func:`lex` function.
+
+		:param str text: Text of the main token, with the token strings.
+		:param [mpiece.lexer.Token] tokens: Tokens of the text. The children always are before their father.
+		:param str fingerprint: Fingerprint of the lexer used. See :func:`lexer_fingerprint`.
+	"""
+
+	def __init__(self, text, tokens, fingerprint):
+		self.text = text
+		self.tokens = tokens
+		self.fingerprint = fingerprint
+
+	def render(self, renderer):
+		""" Render the document.
+
+			:param mpiece.renderer.Renderer renderer: Renderer object, or a list or dictionary of renderers.
+			:return: It depends of the renderer class. See :meth:`mpiece.core.MPiece.render_multi`.
+			:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
+		"""
+		return MPiece().render(self.text, self.tokens, renderer)
+
+	def walk(self, handler):
+		""" Send the structure of the document to a handler, without render it.
+
+			:param mpiece.events.Handler handler: Handler object. See :func:`mpiece.events.walk`.
+		"""
+		walk_tokens(Token('_only_text', self.text), self.tokens, handler)
+
+	def dumps(self):
+		""" Serialize the document. The token extras only can have ``None``, booleans, numbers, strings, lists and
+			dictionaries.
+
+			:return bytes: Serialized document.
+			:exception: :class:`mpiece.core.InvalidDocumentException`
+		"""
+		tokens = [[t.render_func, t.text if t.has_text else None, t.extras] for t in self.tokens]
+
+		def invalid_value(value):
+			raise InvalidDocumentException('the token extras have a %s object' % type(value).__name__)
+
+		data = json.dumps(
+			[self.fingerprint, self.text, tokens], separators=(',', ':'), ensure_ascii=False, default=invalid_value
+		)
+		return MAGIC + struct.pack('B', FORMAT_VERSION) + zlib.compress(data.encode('utf-8'))
+
+
+def lex(text, lexer=None):
+	""" Parse the markdown text without render it.
+
+		:param str text: Markdown text.
+		:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+		:return: :class:`Document` object.
+		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+		:exception: :class:`mpiece.core.RegexNotFoundException`
+		:exception: :class:`mpiece.core.InvalidDataException`
+	"""
+	lexer = lexer or Lexer()
+	mpiece = MPiece()
+	main_token = mpiece.lex(text, lexer)
+	return Document(main_token.text, mpiece.token_list, lexer_fingerprint(lexer))
+
+
+def load_token(render_func, text, extras):
+	""" Make a token with the serialized data, checking the data types.
+
+		:param str render_func: Render function name.
+		:param str text: Token text or ``None``.
+		:param dict extras: Extra data to render function.
+		:return: :class:`mpiece.lexer.Token` object.
+		:exception: :class:`mpiece.core.InvalidDocumentException`
+	"""
+	if not isinstance(render_func, string_types):
+		raise InvalidDocumentException('the render function name isn\'t a string')
+
+	if text is not None and not isinstance(text, string_types):
+		raise InvalidDocumentException('the text of the "%s" token isn\'t a string' % render_func)
+
+	if not isinstance(extras, dict):
+		raise InvalidDocumentException('the extras of the "%s" token aren\'t a dictionary' % render_func)
+
+	return Token(render_func, text, extras)
+
+
+def loads(data, lexer=None):
+	""" Load a serialized document.
+
+		:param bytes data: Document serialized with :meth:`Document.dumps`.
+		:param mpiece.lexer.Lexer lexer: If it is defined, check the document was made with the same grammar.
+		:return: :class:`Document` object.
+		:exception: :class:`mpiece.core.InvalidDocumentException`
+	"""
+	header_size = len(MAGIC) + 1
+	if data[:len(MAGIC)] != MAGIC or len(data) < header_size:
+		raise InvalidDocumentException('it isn\'t a mpiece document')
+
+	version = struct.unpack('B', data[len(MAGIC):header_size])[0]
+	if version != FORMAT_VERSION:
+		raise InvalidDocumentException('format version %d, expected version %d' % (version, FORMAT_VERSION))
+
+	try:
+		fingerprint, text, tokens = json.loads(zlib.decompress(data[header_size:]).decode('utf-8'))
+		tokens = [load_token(*token) for token in tokens]
+
+	except (ValueError, TypeError, zlib.error):
+		raise InvalidDocumentException('the data is corrupted')
+
+	if not isinstance(text, string_types):
+		raise InvalidDocumentException('the text isn\'t a string')
+
+	if lexer is not None and fingerprint != lexer_fingerprint(lexer):
+		raise InvalidDocumentException('the document was made with other lexer')
+
+	return Document(text, tokens, fingerprint)
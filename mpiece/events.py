@@ -0,0 +1,112 @@
+"""
+	mpiece.events
+	~~~~~~~~~~~~~
+
+	Walk the structure of the markdown text calling the methods of a handler, without render it.
+
+	Example:
+		.. code:: python
+
+			from mpiece.events import Handler, walk
+
+			class LinkHandler(Handler):
+				def __init__(self):
+					self.links = []
+
+				def start(self, element, extras):
+					if element == 'link':
+						self.links.append(extras['href'])
+
+			handler = LinkHandler()
+			walk(markdown_text, handler)
+			print(handler.links)
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+from mpiece.core import MPiece
+from mpiece.lexer import Lexer
+from mpiece.utils import string_types
+
+
+class Handler(object):
+	"""
+		Base class of the event handlers. Its methods do nothing.
+
+		The elements are the render function names of the tokens, without the ``render_`` prefix.
+		The elements without text, like ``fenced_code`` or ``image``, have their data in the extras.
+	"""
+
+	def start(self, element, extras):
+		""" Called at the start of a grammar element.
+
+			:param str element: Element name.
+			:param dict extras: Extra data of the element.
+		"""
+
+	def text(self, chunk):
+		""" Called with the text inside of the elements.
+
+			:param str chunk: Text.
+		"""
+
+	def end(self, element):
+		""" Called at the end of a grammar element.
+
+			:param str element: Element name.
+		"""
+
+
+def walk_tokens(token, token_list, handler, regex_token=Lexer.regex_token):
+	""" Call the handler methods with the children of the token, in the same order that they are in the text.
+
+		:param mpiece.lexer.Token token: Main token. Its events aren't sent.
+		:param [mpiece.lexer.Token] token_list: All tokens parsed.
+		:param Handler handler: Handler object.
+		:param regex_token: Regular expression of the token strings.
+	"""
+	unescape = MPiece().unescape_token_str
+	stack = [token]
+
+	while stack:
+		item = stack.pop()
+
+		if isinstance(item, string_types):
+			handler.text(unescape(item))
+			continue
+
+		if isinstance(item, tuple):
+			handler.end(item[0])
+			continue
+
+		if item is not token:
+			handler.start(item.render_func, item.extras)
+			stack.append((item.render_func,))
+
+		if item.has_text:
+			# The text is split in: text, token number, text, token number...
+			parts = regex_token.split(item.text)
+			for i in range(len(parts) - 1, -1, -1):
+				if i % 2:
+					stack.append(token_list[int(parts[i])])
+				elif parts[i]:
+					stack.append(parts[i])
+
+
+def walk(text, handler, lexer=None):
+	""" Parse the markdown text and send its structure to the handler. The text isn't rendered, but it is lexed
+		like in a render, so the cost is close to the cost of a render. Use :meth:`mpiece.document.Document.walk`
+		to walk a text several times.
+
+		:param str text: Markdown text.
+		:param Handler handler: Handler object.
+		:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+		:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+		:exception: :class:`mpiece.core.RegexNotFoundException`
+		:exception: :class:`mpiece.core.InvalidDataException`
+	"""
+	lexer = lexer or Lexer()
+	mpiece = MPiece()
+	main_token = mpiece.lex(text, lexer)
+	walk_tokens(main_token, mpiece.token_list, handler, lexer.regex_token)
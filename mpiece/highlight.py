@@ -0,0 +1,229 @@
+"""
+	mpiece.highlight
+	~~~~~~~~~~~~~~~~
+
+	Syntax highlighter for the fenced code blocks.
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import hashlib
+import re
+
+from mpiece.cache import LRUCache
+from mpiece.utils import escape_html, text_type
+
+
+def _words(words):
+	return r'\b(?:%s)\b' % '|'.join(words.split())
+
+
+_NUMBER = r'\b(?:0[xX][0-9a-fA-F]+|[0-9]+(?:\.[0-9]*)?(?:[eE][+\-]?[0-9]+)?)\b'
+_DQ_STRING = r'"(?:[^"\\\n]|\\.)*"'
+_SQ_STRING = r"'(?:[^'\\\n]|\\.)*'"
+
+
+class Highlighter(object):
+	"""
+		Transform the code of a fenced code block in html code with ``<span>`` tags around keywords, strings, comments,
+		numbers and builtins.
+
+		The results are stored in a bounded cache keyed by the language and the hash of the code, so the code blocks
+		repeated in the markdown texts are only highlighted once.
+
+		This class is used in the ``highlighter`` param of the :class:`mpiece.renderer.HtmlRenderer` class.
+
+		:param int cache_size: Maximum number of code blocks stored in the cache.
+		:param str css_prefix: Prefix of the css classes of the ``<span>`` tags.
+
+		:Example:
+			.. code:: python
+
+				from mpiece import markdown
+				from mpiece.highlight import Highlighter
+				from mpiece.renderer import HtmlRenderer
+
+				renderer = HtmlRenderer(highlighter=Highlighter())
+				result = markdown('```python\\nreturn None\\n```', renderer=renderer)
+				print(result)
+				# output: <pre class="lang-python"><span class="hl-keyword">return</span> <span ...
+	"""
+
+	#: Grammar of the languages. List of tuples with the css class and the regular expression.
+	languages = {
+		'python': [
+			('comment', r'\#[^\n]*'),
+			('string', r'(?:[rRbBuUfF]{0,2})(?:"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|%s|%s)' % (_DQ_STRING, _SQ_STRING)),
+			('keyword', _words(
+				'and as assert async await break class continue def del elif else except finally for from global if '
+				'import in is lambda nonlocal not or pass raise return try while with yield None True False'
+			)),
+			('builtin', _words(
+				'abs all any bool bytes dict enumerate filter float getattr hasattr int isinstance iter len list map '
+				'max min next object open print range repr set setattr sorted str sum super tuple type zip self'
+			)),
+			('number', _NUMBER),
+		],
+		'javascript': [
+			('comment', r'//[^\n]*|/\*[\s\S]*?\*/'),
+			('string', r'%s|%s|`(?:[^`\\]|\\.)*`' % (_DQ_STRING, _SQ_STRING)),
+			('keyword', _words(
+				'async await break case catch class const continue default delete do else export extends finally for '
+				'function if import in instanceof let new of return static super switch this throw try typeof var '
+				'void while yield null undefined true false'
+			)),
+			('builtin', _words('Array Boolean console document JSON Math Number Object Promise String window')),
+			('number', _NUMBER),
+		],
+		'json': [
+			('string', _DQ_STRING),
+			('keyword', _words('true false null')),
+			('number', r'-?' + _NUMBER),
+		],
+		'bash': [
+			('comment', r'(?<![^\s;])\#[^\n]*'),
+			('string', r'%s|\'[^\']*\'' % _DQ_STRING),
+			('keyword', _words(
+				'if then else elif fi for while until do done case esac in function return local export'
+			)),
+			('builtin', _words('cd echo exit pwd read set shift source test unset')),
+			('variable', r'\$(?:\{[^}\n]*\}|[A-Za-z_][A-Za-z0-9_]*|[0-9@#?$!*\-])'),
+		],
+		'c': [
+			('comment', r'//[^\n]*|/\*[\s\S]*?\*/'),
+			('preproc', r'^[ \t]*\#[^\n]*'),
+			('string', r'%s|%s' % (_DQ_STRING, _SQ_STRING)),
+			('keyword', _words(
+				'auto break case catch class const continue default delete do else enum extern for goto if inline '
+				'namespace new private protected public register return sizeof static struct switch template this '
+				'throw try typedef union using virtual volatile while'
+			)),
+			('builtin', _words(
+				'bool char double float int long short signed unsigned void size_t NULL nullptr true false'
+			)),
+			('number', _NUMBER + r'[uUlLfF]*'),
+		],
+		'sql': [
+			('comment', r'--[^\n]*|/\*[\s\S]*?\*/'),
+			('string', r"'(?:[^']|'')*'"),
+			('keyword', _words(
+				'select from where and or not insert into values update set delete create table drop alter index '
+				'join left right inner outer on group by order having limit offset as distinct union all null is '
+				'in like between primary key foreign references'
+			)),
+			('number', _NUMBER),
+		],
+	}
+
+	#: Flags of the regular expressions of the languages, besides :data:`re.M`. The SQL keywords are case insensitive.
+	flags = {'sql': re.I}
+
+	#: Alternative names of the languages.
+	aliases = {
+		'py': 'python', 'python3': 'python', 'js': 'javascript', 'sh': 'bash', 'shell': 'bash', 'zsh': 'bash',
+		'cpp': 'c', 'c++': 'c', 'h': 'c', 'hpp': 'c', 'java': 'c',
+	}
+
+	css_prefix = 'hl-'
+
+	def __init__(self, cache_size=256, css_prefix=None):
+		self.cache = LRUCache(cache_size)
+		self.all_regex = {}
+
+		if css_prefix is not None:
+			self.css_prefix = css_prefix
+
+	def __getstate__(self):
+		""" The cache and the compiled regular expressions aren't pickled.
+		"""
+		state = self.__dict__.copy()
+		state['cache'] = LRUCache(self.cache.maxsize)
+		state['all_regex'] = {}
+		return state
+
+	def __call__(self, code, lang):
+		""" Highlight the code.
+
+			:param str code: Code of the fenced code block.
+			:param str lang: Language of the code.
+			:return: Html code escaped or ``None`` if the language isn't supported.
+		"""
+		lang = self.get_language(lang)
+		if lang is None:
+			return None
+
+		data = code.encode('utf-8', 'surrogatepass') if isinstance(code, text_type) else code
+		key = (lang, hashlib.sha1(data).digest())
+		html = self.cache.get(key)
+		if html is None:
+			html = self.highlight(code, lang)
+			self.cache.set(key, html)
+
+		return html
+
+	def get_language(self, lang):
+		""" Get the language name used in :attr:`Highlighter.languages`.
+
+			:param str lang: Language name or alias.
+			:return: Language name or ``None`` if the language isn't supported.
+		"""
+		if not lang:
+			return None
+
+		lang = lang.strip().lower()
+		lang = self.aliases.get(lang, lang)
+		return lang if lang in self.languages else None
+
+	def get_regex(self, lang):
+		""" Get the regular expression which finds all grammar elements of the language.
+
+			:param str lang: Language name.
+			:return: Compiled regular expression.
+		"""
+		try:
+			return self.all_regex[lang]
+		except KeyError:
+			pass
+
+		groups = ['(?P<%s>%s)' % (name, regex) for name, regex in self.languages[lang]]
+		regex = self.all_regex[lang] = re.compile('|'.join(groups), re.M | self.flags.get(lang, 0))
+		return regex
+
+	def tokenize(self, code, lang):
+		""" Split the code in the grammar elements of the language.
+
+			:param str code: Code.
+			:param str lang: Language name.
+			:return: List of tuples with the css class (``None`` in plain text) and the text.
+		"""
+		tokens = []
+		pos = 0
+
+		for mo in self.get_regex(lang).finditer(code):
+			if mo.start() > pos:
+				tokens.append((None, code[pos:mo.start()]))
+
+			tokens.append((mo.lastgroup, mo.group(0)))
+			pos = mo.end()
+
+		if pos < len(code):
+			tokens.append((None, code[pos:]))
+
+		return tokens
+
+	def highlight(self, code, lang):
+		""" Highlight the code without use the cache.
+
+			:param str code: Code.
+			:param str lang: Language name.
+			:return str: Html code.
+		"""
+		html = []
+		for name, text in self.tokenize(code, lang):
+			if name is None:
+				html.append(escape_html(text))
+			else:
+				html.append('<span class="%s%s">%s</span>' % (self.css_prefix, name, escape_html(text)))
+
+		return ''.join(html)
@@ -9,6 +9,9 @@
 """
 
 import re
+from bisect import bisect_right
+
+from mpiece.utils import text_type
 
 
 class Token:
@@ -46,6 +49,105 @@ class Token:
 		self.extras_to_children = extras_to_children
 
 
+class LiteralRegex(object):
+	""" Regular expression whose matches are found with :meth:`str.find` instead of trying the regular expression in
+		each position of the text.
+
+		It is used with the grammar elements which start with a literal string after optional lead characters, like
+		the fenced code blocks. The text between the candidates isn't scanned by the regular expression, so the
+		documents with few grammar elements of this kind are parsed faster. The matches are the same as the matches
+		of the regular expression.
+
+		:param regex: Compiled regular expression.
+		:param str literal: String which all matches have, after the lead characters.
+		:param str lead: Character which can be repeated at the start of the matches, before the literal.
+		:param end: Compiled regular expression which all matches have after the literal. When it isn't found after
+			a candidate, the text hasn't more matches.
+	"""
+
+	def __init__(self, regex, literal, lead='', end=None):
+		self.regex = regex
+		self.literal = literal
+		self.lead = lead
+		self.end = end
+
+	def __getattr__(self, name):
+		# pattern, flags, groupindex, match, search...
+		if name == 'regex':
+			raise AttributeError(name)
+
+		return getattr(self.regex, name)
+
+	def finditer(self, string, pos=0, endpos=None):
+		""" Find all matches in the text, like :meth:`re.Pattern.finditer`.
+
+			:param str string: Text.
+			:param int pos: Position where the search starts.
+			:param int endpos: Position where the search ends. By default the end of the text.
+			:return: Iterator of match objects.
+		"""
+		regex = self.regex
+		literal = self.literal
+		lead = self.lead
+		if endpos is None or endpos > len(string):
+			endpos = len(string)
+
+		end_pos = -1
+		candidate = string.find(literal, pos, endpos)
+
+		while candidate != -1:
+			# The match starts before the lead characters of the literal.
+			start = candidate
+			while lead and start > pos and string[start - 1] == lead:
+				start -= 1
+
+			mo = regex.match(string, start, endpos)
+			if mo is None:
+				if self.end is not None and end_pos < candidate + len(literal):
+					# Without the end after this candidate, the next candidates can't match. The end is searched again
+					# only when the candidate is after the last end found.
+					mo = self.end.search(string, candidate + len(literal), endpos)
+					if mo is None:
+						return
+
+					end_pos = mo.start()
+
+				candidate = string.find(literal, candidate + 1, endpos)
+				continue
+
+			yield mo
+			pos = mo.end()
+			candidate = string.find(literal, pos, endpos)
+
+	def sub(self, repl, string, count=0):
+		""" Replace the matches in the text, like :meth:`re.Pattern.sub`.
+
+			:param repl: Function which receives the match object and returns the replacement, or replacement string
+				with the backslash escapes and the group references of :meth:`re.Match.expand`.
+			:param str string: Text.
+			:param int count: Maximum number of matches replaced. All matches with 0.
+			:return str: Text with the matches replaced.
+		"""
+		if not callable(repl):
+			template = repl
+			repl = lambda mo: mo.expand(template)
+
+		pieces = []
+		pos = 0
+		for mo in self.finditer(string):
+			pieces.append(string[pos:mo.start()])
+			pieces.append(repl(mo))
+			pos = mo.end()
+			if len(pieces) == count * 2:
+				break
+
+		if not pieces:
+			return string
+
+		pieces.append(string[pos:])
+		return ''.join(pieces)
+
+
 class Lexer(object):
 	"""
 		Converts the markdown text in tokens.
@@ -68,11 +170,14 @@ class Lexer(object):
 			- new_line
 			- image
 			- link
+			- apply_references
 			- code_inline
 			- bold
 			- italic
 			- underline
 			- strike
+			- footnotes
+			- references
 
 		:param int tab_size: Tabulators size.
 		:param str escape_chars:
@@ -108,7 +213,8 @@ class Lexer(object):
 			Order of the inline elements.
 
 			:Initial value:
-				['escape_backslash', 'code_inline', 'image', 'link', 'bold', 'italic', 'bold', 'underline', 'strike']
+				['escape_backslash', 'code_inline', 'image', 'link', 'apply_references', 'bold', 'italic', 'bold',
+				'underline', 'strike']
 
 		:ivar [str] order_block:
 			Order of the block elements.
@@ -133,10 +239,18 @@ class Lexer(object):
 	regex_underline = re.compile(r'_(?P<text>[^_]+)_')
 	regex_strike = re.compile(r'\~(?P<text>[^\~]+)\~')
 	regex_code_inline = re.compile(r'`(?P<code>[^`]+)`')
-	regex_link = re.compile(r'\[(?P<text>.+?)\]\((?P<href>.+?)(?:[ ](?P<quote>["\'])(?P<title>.*?)(?P=quote))?\)')
-	regex_image = re.compile(r'\!\[(?P<alt>.+?)\]\((?P<src>.+?)(?:[ ](?P<quote>["\'])(?P<title>.*?)(?P=quote))?\)')
+	# The text can have one level of balanced brackets, and the href can't have ``](``: the matches tried from each
+	# start position stop at the next unbalanced bracket, so the lines with many ``[a](`` stay linear.
+	regex_link = re.compile(
+		r'\[(?P<text>(?:[^\[\]\n]|\[[^\[\]\n]*\])+)\]\((?P<href>(?:(?!\]\()[^)\n])+?)'
+		r'(?:[ ](?P<quote>["\'])(?P<title>(?:(?!(?P=quote))[^\n])*)(?P=quote))?\)'
+	)
+	regex_image = re.compile(
+		r'\!\[(?P<alt>(?:[^\[\]\n]|\[[^\[\]\n]*\])+)\]\((?P<src>(?:(?!\]\()[^)\n])+?)'
+		r'(?:[ ](?P<quote>["\'])(?P<title>(?:(?!(?P=quote))[^\n])*)(?P=quote))?\)'
+	)
 	regex_new_line = re.compile(
-		r'^(?P<text>(?:(?!////TOKENMDA|\s+\n)[^\n]+\n)*(?!////TOKENMDA|\s+\n)[^\n]+)(?=\n|////TOKENMDA|$)',
+		r'^(?P<text>(?:(?!////TOKENMDA|[^\S\n]+\n)[^\n]+\n)*(?!////TOKENMDA|[^\S\n]+\n)[^\n]+)(?=\n|////TOKENMDA|$)',
 		re.M
 	)
 	regex_simple_new_line = re.compile(r'^(?![ ]*////TOKENMDA)(?P<text>[^\n]+)$', re.M)
@@ -160,16 +274,23 @@ class Lexer(object):
 	regex_blockquote = re.compile(r'(?P<blockquote>^(?:[ ]*\>[^\n]*\n?)+)', re.M)
 	regex_header = re.compile(r'^[ ]*(?P<level>#+) (?P<text>.*?)(?:[ ](?P=level))?$', re.M)
 	regex_header2 = re.compile(r'^(?P<text>[^\n]+)\n(?P<sym>=+|-+|~+)$', re.M)
-	regex_fenced_code = re.compile(
-		r'[ ]*`{3}[ ]*(?P<lang>[^\n"]+?)?(?: ?(?!\\)"(?P<title>[^\n]+)(?!\\)")?\n(?P<code>.*?)\n[ ]*`{3}',
-		re.S
-	)
+	regex_fenced_code = LiteralRegex(re.compile(
+		r'(?<![ ])[ ]*`{3}[ ]*(?P<lang>[^\n"`]+?)?(?: ?(?!\\)"(?P<title>[^\n`]+)(?!\\)")?\n'
+		r'(?P<code>[^\n]*(?:\n(?![ ]*`{3})[^\n]*)*)\n[ ]*`{3}'
+	), '```', ' ', re.compile(r'\n[ ]*`{3}'))
 	regex_break_line = re.compile(r'^(?:-{3,}|\*{3,}|_{3,})$', re.M)
-	regex_footnotes = re.compile(
-		r'^\[\^(?P<name>.+)\]:[ ]*(?P<value>[^\n]*(?=\n)(?:\n(?P<ind>[ ]+)[^\n]*(?=\n))?(?:\n(?P=ind)[^\n]*(?=\n))*)',
+	regex_footnotes = LiteralRegex(re.compile(
+		r'^\[\^(?P<name>[^\[\]\n]+)\]:[ ]*'
+		r'(?P<value>[^\n]*(?=\n)(?:\n(?P<ind>[ ]+)[^\n]*(?=\n))?(?:\n(?P=ind)[^\n]*(?=\n))*)',
 		re.M
-	)
-	regex_apply_footnotes = re.compile(r'\[\^(?P<name>.+)\]')
+	), '[^')
+	regex_apply_footnotes = re.compile(r'\[\^(?P<name>[^\[\]\n]+)\]')
+	regex_references = LiteralRegex(re.compile(
+		r'^[ ]{0,3}\[(?P<name>(?!\^)[^\[\]\n]+)\]:[ ]*(?:<(?P<bracket_href>[^<>\n]*)>|(?P<href>[^\s<>]+))'
+		r'(?:[ ]+(?:"(?P<dq_title>[^"\n]*)"|\'(?P<sq_title>[^\'\n]*)\'|\((?P<pq_title>[^()\n]*)\)))?[ ]*$',
+		re.M
+	), '[', ' ')
+	regex_apply_references = re.compile(r'(?P<image>!?)\[(?P<text>[^\[\]\n]+)\]\[(?P<name>(?!\^)[^\[\]\n]*)\]')
 	regex_table = re.compile(
 		r'^[ ]*(?P<table>\|[^\n]*\n[ ]*\|[ \|\-:]+\n[ ]*(?:\|[^\n]+\n?)*)(?=\n|$)',
 		re.S | re.M
@@ -179,13 +300,68 @@ class Lexer(object):
 	regex_table_body = re.compile(r'^(?P<align>[| \-:]+?)\|?\n(?P<body>.*)', re.S | re.M)
 	regex_table_body_row = re.compile(r'^[ ]*(?P<row>\|[^\n]+)', re.M)
 	regex_table_body_cell = re.compile(r'^(?P<cells>\|[^\n]+?)\|?$')
+	# Texts which can have block grammar, footnotes or references: some lines, the start of a block element, a fenced
+	# code block...
+	regex_block_mark = re.compile(
+		r'[\n\r]|```|\[\^|^[ \t]*(?:[|>#]|[*-][ \t]|[0-9]+\.[ \t]|-{3}|\*{3}|_{3}|\[[^\]\n]*\]:)'
+	)
+
+	#: Strings which the text needs to have, at least one of them, to match the regular expression of the grammar
+	#: element. :class:`mpiece.compiler.CompiledMPiece` skips the regular expressions of the texts without them.
+	#: The subclasses which change a regular expression of this list should change its strings too.
+	required_literals = {
+		'escape_backslash': ('\\',),
+		'code_inline': ('`',),
+		'image': ('![',),
+		'link': ('](',),
+		'apply_references': ('][',),
+		'bold': ('**',),
+		'italic': ('*',),
+		'underline': ('_',),
+		'strike': ('~',),
+		'fenced_code': ('```',),
+		'table': ('|',),
+		'ulist': ('* ', '- '),
+		'usublist': ('* ', '- '),
+		'olist': ('. ',),
+		'osublist': ('. ',),
+		'blockquote': ('>',),
+		'header': ('# ',),
+		'header2': ('\n=', '\n-', '\n~'),
+		'break_line': ('---', '***', '___'),
+	}
+
+	#: Grammar elements whose parse functions get the reference definitions of the text after the match object.
+	#: See :meth:`Lexer.get_references`.
+	reference_elements = frozenset(['apply_references'])
+
+	#: Block grammar elements found by :attr:`Lexer.regex_block_mark`, with their regular expressions.
+	#: See :meth:`Lexer.is_inline_text`.
+	block_mark_regex = {
+		'fenced_code': regex_fenced_code, 'table': regex_table, 'ulist': regex_ulist, 'olist': regex_olist,
+		'blockquote': regex_blockquote, 'header': regex_header, 'header2': regex_header2,
+		'break_line': regex_break_line, 'new_line': regex_new_line,
+	}
 
 	def __init__(self, exclude=set(), tab_size=4, escape_chars=''):
 		self.tab_size = tab_size
 		self.escape_chars = '*~`_[]()\\>.' + escape_chars
 		self.exclude = getattr(self, 'exclude', set()) | exclude
+		self.load_grammar()
+
+		self.order_inline = [
+			'escape_backslash', 'code_inline', 'image', 'link', 'apply_references', 'bold', 'italic', 'bold',
+			'underline', 'strike'
+		]
+		self.order_block = [
+			'fenced_code', 'table', 'ulist', 'olist', 'blockquote', 'header', 'header2', 'break_line', 'new_line'
+		]
+		self.define_order()
 
-		# Get al regex expressions and parse functions.
+	def load_grammar(self):
+		""" Get all regular expressions and parse functions of the lexer, in the :attr:`Lexer.all_regex` and
+			:attr:`Lexer.all_parse_func` dictionaries.
+		"""
 		self.all_regex = {}
 		self.all_parse_func = {}
 		for item in dir(self):
@@ -195,13 +371,18 @@ class Lexer(object):
 			if item.startswith('parse_'):
 				self.all_parse_func[item[6:]] = getattr(self, item)
 
-		self.order_inline = [
-			'escape_backslash', 'code_inline', 'image', 'link', 'bold', 'italic', 'bold', 'underline', 'strike'
-		]
-		self.order_block = [
-			'fenced_code', 'table', 'ulist', 'olist', 'blockquote', 'header', 'header2', 'break_line', 'new_line'
-		]
-		self.define_order()
+	def __getstate__(self):
+		""" Only the configuration of the lexer is pickled. The dictionaries of regular expressions and parse
+			functions are made again when the lexer is unpickled.
+		"""
+		state = self.__dict__.copy()
+		del state['all_regex']
+		del state['all_parse_func']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.load_grammar()
 
 	def define_order(self):
 		""" Make the order of the grammar inside of the markdown elements.
@@ -260,6 +441,10 @@ class Lexer(object):
 			self.order_link = list(self.order_inline)
 			self.order_link.remove('link')
 			self.order_link.remove('image')
+			# The subclasses which define their own order_inline may not have the references.
+			if 'apply_references' in self.order_link:
+				self.order_link.remove('apply_references')
+
 			self.order_link.remove('code_inline')
 			self.order_link.remove('escape_backslash')
 			self.order_bold = list(self.order_link)
@@ -278,6 +463,9 @@ class Lexer(object):
 		# Define order initial.
 		self.order_initial = self.order_block + self.order_inline
 
+		# Texts of one paragraph. See Lexer.is_inline_text
+		self.order_paragraph = ['new_line']
+
 	# Parse functions
 	def parse_fenced_code(self, mo):
 		lang = mo.group('lang')
@@ -352,7 +540,9 @@ class Lexer(object):
 
 	def parse_blockquote(self, mo):
 		blockquote = mo.group('blockquote')
-		blockquote = '\n'.join([l.strip()[2:] for l in blockquote.split('\n')])
+		lines = [l.strip() for l in blockquote.split('\n')]
+		# Remove the ">" character and the space after it.
+		blockquote = '\n'.join([l[2:] if l[1:2] == ' ' else l[1:] for l in lines])
 		return [Token('blockquote', blockquote, order=self.order_blockquote), '\n']
 
 	def parse_bold(self, mo):
@@ -466,15 +656,352 @@ class Lexer(object):
 		text = self.regex_apply_footnotes.sub(replace_footnotes, text)
 		return text
 
+	def parse_apply_references(self, mo, references):
+		""" Parse a reference-style link or image: ``[text][name]``, ``[text][]`` or ``![alt][name]``. The href and
+			the title come from the definition of the name, found with one lookup, so the tokens are the same as the
+			tokens of the inline links and images. The references without definition aren't changed.
+
+			:param mo: Match object of :attr:`Lexer.regex_apply_references`.
+			:param dict references: Definitions of the text. See :meth:`Lexer.get_references`.
+			:return: Token or the text of the match.
+		"""
+		text = mo.group('text')
+		target = references.get(self.get_reference_key(mo.group('name') or text))
+		if target is None:
+			return mo.group(0)
+
+		href, title = target
+		if mo.group('image'):
+			return Token('image', extras={'alt': text, 'src': href, 'title': title})
+
+		return Token('link', text, {'title': title, 'href': href}, order=self.order_link)
+
+	def get_references(self, text):
+		""" Collect the definitions of the reference links: ``[name]: href "title"``. The definitions are removed of
+			the text and stored in a dictionary by their normalized name (see :meth:`Lexer.get_reference_key`), so
+			each reference is resolved with one lookup while the text is parsed (see
+			:meth:`Lexer.parse_apply_references`). The lines inside of the code aren't definitions (see
+			:meth:`Lexer.find_definitions`). The first definition of a name is used.
+
+			:param str text: Text preprocessed.
+			:return: Tuple with the text without the definitions and the dictionary with the href and the title of
+				each definition.
+		"""
+		references = {}
+		pieces = []
+		pos = 0
+
+		for mo in self.find_definitions(text):
+			key = self.get_reference_key(mo.group('name'))
+			if key not in references:
+				href = mo.group('href')
+				if href is None:
+					href = mo.group('bracket_href')
+
+				title = mo.group('dq_title')
+				if title is None:
+					title = mo.group('sq_title')
+					if title is None:
+						title = mo.group('pq_title')
+
+				references[key] = (href or '#', title)
+
+			pieces.append(text[pos:mo.start()])
+			pos = mo.end()
+
+		if not pieces:
+			return text, references
+
+		pieces.append(text[pos:])
+		return ''.join(pieces), references
+
+	def find_definitions(self, text):
+		""" Find the definitions of the reference links which aren't inside of a fenced code block or of a code span.
+			The code spans are only searched in the paragraphs which have definitions.
+
+			:param str text: Text preprocessed.
+			:return: List of match objects of :attr:`Lexer.regex_references`.
+		"""
+		definitions = []
+		fences = None
+		# Code spans of the paragraph of the last definition, and the end of the paragraph.
+		spans = []
+		paragraph_end = -1
+
+		for mo in self.regex_references.finditer(text):
+			start = mo.start()
+			if fences is None:
+				# The fences are only searched when the text has definitions.
+				fences = ([], [])
+				if 'fenced_code' not in self.exclude:
+					for fence in self.regex_fenced_code.finditer(text):
+						fences[0].append(fence.start())
+						fences[1].append(fence.end())
+
+			i = bisect_right(fences[0], start) - 1
+			if i >= 0 and start < fences[1][i]:
+				continue
+
+			if 'code_inline' not in self.exclude:
+				if start > paragraph_end:
+					paragraph_start = text.rfind('\n\n', 0, start) + 1
+					paragraph_end = text.find('\n\n', start)
+					if paragraph_end == -1:
+						paragraph_end = len(text)
+
+					matches = self.regex_code_inline.finditer(text, paragraph_start, paragraph_end)
+					spans = [(span.start(), span.end()) for span in matches]
+
+				if any(span_start < start < span_end for span_start, span_end in spans):
+					continue
+
+			definitions.append(mo)
+
+		return definitions
+
+	def get_reference_key(self, name):
+		""" Normalize the name of a reference: the letter case and the spaces aren't significant.
+
+			:param str name: Name of the reference or of the definition.
+			:return str: Key of the definition.
+		"""
+		return ' '.join(name.lower().split())
+
 	# Other functions
+	def split_blocks(self, text, size):
+		""" Split the text in groups of top level blocks which can be parsed separately.
+			The groups are split in the blank lines outside of the fenced code blocks, so joining the rendered groups
+			gives the same text as rendering all text.
+
+			The text isn't split when the paragraphs aren't parsed, and the text after a fenced code block followed
+			by more text in the same line isn't split, because then the inline grammar is searched in all the text.
+			Subclasses with new block grammar which has blank lines inside should override this method.
+
+			:param str text: Text preprocessed and with the footnotes applied.
+			:param int size: Minimum number of characters of each group.
+			:return [str]: Groups of blocks.
+		"""
+		order = [element for element in self.order_initial if element not in self.exclude]
+		if 'new_line' not in order:
+			return [text]
+
+		fences = []
+		if 'fenced_code' in order:
+			if order[0] != 'fenced_code':
+				return [text]
+
+			for mo in self.regex_fenced_code.finditer(text):
+				end = text.find('\n', mo.end())
+				if text[mo.end():end if end != -1 else len(text)].strip():
+					# Text after the fenced code block. The rest of the text is a group.
+					fences.append((mo.start(), len(text)))
+					break
+
+				fences.append((mo.start(), mo.end()))
+
+		groups = []
+		start = 0
+		pos = text.find('\n\n', size)
+		i = 0
+
+		while pos != -1:
+			while i < len(fences) and fences[i][1] <= pos:
+				i += 1
+
+			if i < len(fences) and fences[i][0] <= pos:
+				# Blank line inside of a fenced code block.
+				pos = text.find('\n\n', fences[i][1])
+				continue
+
+			line_start = text.rfind('\n', 0, pos) + 1
+			if i > 0 and fences[i - 1][1] > line_start:
+				# The line ends with a fenced code block. It starts in the line of the fenced code block.
+				line_start = text.rfind('\n', 0, fences[i - 1][0]) + 1
+
+			if text[line_start:pos].lstrip(' ').startswith('|'):
+				# The tables take the blank line after them.
+				pos = text.find('\n\n', pos + 2)
+				continue
+
+			end = text.find('\n', pos + 2)
+			line = text[pos + 2:end if end != -1 else len(text)]
+			if line and not line.strip('=-~'):
+				# The lists take the blank line, so this line can be the underline of a header.
+				pos = text.find('\n\n', pos + 2)
+				continue
+
+			groups.append(text[start:pos + 2])
+			start = pos + 2
+			pos = text.find('\n\n', start + size)
+
+		if start < len(text) or not groups:
+			groups.append(text[start:])
+
+		return groups
+
+	def cut_blocks(self, text, max_blocks=None, max_chars=None, complete=True):
+		""" Get the first top level blocks of the text, the blocks of a preview.
+			The blocks are the groups of :meth:`Lexer.split_blocks` with one block each. When the first block is
+			longer than ``max_chars``, it is cut after the last space or line before the limit, and an open fenced code
+			block is closed.
+
+			:param str text: Text preprocessed, or the first lines of the text preprocessed.
+			:param int max_blocks: Maximum number of blocks.
+			:param int max_chars: Maximum number of characters of the blocks, without the blank lines around them.
+			:param bool complete: ``False`` if the text is only the first lines of the text. The last block can be
+				incomplete, and the blocks after an open fenced code block aren't used.
+			:return: Tuple with the blocks and ``True`` if the text was truncated. The blocks are ``None`` when they
+				need more lines of the text.
+		"""
+		groups = self.split_blocks(text, 0)
+		limit = len(text)
+
+		if not complete:
+			# A block is complete when there is text after it. The blocks after a fenced code block which isn't closed
+			# in these lines aren't known.
+			limit = len(text.rstrip('\n'))
+			pos = self.find_open_fence(text)
+			if pos != -1:
+				limit = min(limit, pos)
+
+		blocks = []
+		blank = []
+		number = 0
+		chars = 0
+		end = 0
+
+		for group in groups:
+			end += len(group)
+			last = not complete and end >= limit
+			size = len(group.strip())
+			if not size:
+				if last:
+					return None, False
+
+				# The blank lines are added with the next block.
+				blank.append(group)
+				continue
+
+			if max_blocks is not None and number >= max_blocks:
+				return ''.join(blocks), True
+
+			if max_chars is not None and chars + size > max_chars:
+				if number:
+					return ''.join(blocks), True
+
+				if not last or len(group) > max_chars:
+					return ''.join(blank) + self.cut_block(group, max_chars), True
+
+			if last:
+				# Maybe the block continues in the next lines.
+				return None, False
+
+			blocks.extend(blank)
+			blocks.append(group)
+			blank = []
+			number += 1
+			chars += size
+
+		if not complete:
+			return None, False
+
+		return ''.join(blocks + blank), False
+
+	def cut_block(self, text, size):
+		""" Cut a block after the last space or line before the limit. An open fenced code block is closed.
+
+			:param str text: Block.
+			:param int size: Maximum number of characters, without the blank lines before the block.
+			:return str: Block cut, ended with a blank line.
+		"""
+		start = len(text) - len(text.lstrip())
+		cut = text[:start + size]
+		fence = self.find_open_fence(cut)
+
+		if fence != -1:
+			# The whole lines of the code, and the fenced code block is closed.
+			pos = cut.rfind('\n', fence)
+			if pos == -1 or pos == cut.find('\n', fence):
+				cut = cut[:fence]
+			else:
+				cut = cut[:pos] + '\n```'
+		else:
+			pos = max(cut.rfind(' ', start), cut.rfind('\n', start))
+			if pos > start and cut[start:pos].strip(' #>*-+.|0123456789'):
+				# The text before the space isn't only the marks of the block.
+				cut = cut[:pos]
+
+		return cut.rstrip(' ') + '\n\n'
+
+	def find_open_fence(self, text):
+		""" Find the first three backticks which aren't inside of a fenced code block.
+
+			:param str text: Text preprocessed.
+			:return int: Position of the string or -1.
+		"""
+		pos = text.find('```')
+		for mo in self.regex_fenced_code.finditer(text):
+			if pos == -1 or pos < mo.start():
+				break
+
+			pos = text.find('```', mo.end())
+
+		return pos
+
 	def get_main_token(self, text):
 		return Token('_only_text', text, order=self.order_initial)
 
+	def get_paragraph_token(self, text):
+		""" Get the main token of a text checked with :meth:`Lexer.is_inline_text`. Only the paragraph is searched.
+
+			:param str text: Text preprocessed.
+			:return mpiece.lexer.Token:
+		"""
+		return Token('_only_text', text, order=self.order_paragraph)
+
+	def get_inline_token(self, text):
+		""" Get the token of a text with only inline grammar. See :meth:`mpiece.core.MPiece.parse_inline`.
+
+			:param str text: Text preprocessed.
+			:return mpiece.lexer.Token:
+		"""
+		return Token('inline', text, order=self.order_inline)
+
+	def is_inline_text(self, text):
+		""" Check if the markdown text is one paragraph with only inline grammar: one line which doesn't start like a
+			block element and hasn't fenced code blocks or footnotes. The block grammar isn't searched in these texts.
+			See :meth:`mpiece.core.MPiece.parse_paragraph`.
+
+			It is always ``False`` when :attr:`Lexer.order_initial` has block grammar which isn't the default, so the
+			subclasses with new block grammar don't need to override this method.
+
+			:param str text: Markdown text, before it is preprocessed.
+			:return bool:
+		"""
+		if self.regex_block_mark.search(text) or not text.strip():
+			return False
+
+		exclude = self.exclude
+		if 'new_line' in exclude or 'new_line' not in self.order_initial:
+			return False
+
+		all_regex = self.all_regex
+		block_mark_regex = self.block_mark_regex
+		for element in set(self.order_initial).difference(self.order_inline, exclude):
+			if element not in block_mark_regex or all_regex.get(element) is not block_mark_regex[element]:
+				return False
+
+		return True
+
 	def pre_process_text(self, text):
 		""" Process the text before be rendered.
+			The ``\x00`` characters are replaced with the ``\ufffd`` character. The renderers can use ``\x00``
+			in their sentinels. The byte strings of python 2 get the character encoded in UTF-8, so the text keeps
+			its type.
 
 			:param str text: Markdown text.
 			:return str: text post processed.
 		"""
-		text = text.replace('\r\n', '\n').replace('\r', '\n').expandtabs(self.tab_size)
+		replacement = u'\ufffd' if isinstance(text, text_type) else b'\xef\xbf\xbd'
+		text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\x00', replacement).expandtabs(self.tab_size)
 		return '\n' + text + '\n\n'
@@ -0,0 +1,190 @@
+"""
+	mpiece.metadata
+	~~~~~~~~~~~~~~~
+
+	Collect the metadata of the markdown text while it is rendered: headers, links, images, footnotes and the number
+	of words and characters.
+
+	Example:
+		.. code:: python
+
+			from mpiece import markdown
+			from mpiece.metadata import MetadataCollector
+
+			collector = MetadataCollector()
+			result = markdown(markdown_text, collector=collector)
+			print(collector.headers)
+			print(collector.words)
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import re
+
+from mpiece.lexer import Lexer
+from mpiece.utils import string_types
+
+
+class MetadataCollector(object):
+	"""
+		Store the metadata of the tokens while the markdown text is parsed.
+		The collector is reset in each parse.
+
+		:ivar list headers: List of dictionaries with the ``level``, ``text`` and ``slug`` keys.
+		:ivar list links: List of dictionaries with the ``href``, ``title`` and ``text`` keys.
+		:ivar list images: List of dictionaries with the ``src``, ``alt`` and ``title`` keys.
+		:ivar list footnotes: Names of the footnotes.
+		:ivar int words: Number of words of the text, counted when all tokens are parsed. The code of the fenced code
+			blocks isn't counted.
+		:ivar int characters: Number of characters, without whitespaces, of the text.
+	"""
+
+	#: Tokens inside of the words. The text of the other tokens is separated with spaces.
+	inline_tokens = frozenset((
+		'escape_backslash', 'bold', 'italic', 'underline', 'strike', 'link', 'image', 'code_inline'
+	))
+
+	#: Tokens whose text isn't counted.
+	skip_tokens = frozenset(('fenced_code',))
+
+	regex_slug = re.compile(r'[^\w\- ]+', re.U)
+	regex_slug_space = re.compile(r'[\s\-]+', re.U)
+
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		""" Remove the metadata of the previous text.
+		"""
+		self.headers = []
+		self.links = []
+		self.images = []
+		self.footnotes = []
+		self.words = 0
+		self.characters = 0
+		self.slugs = {}
+		self.regex_token = Lexer.regex_token
+
+	def start(self, text, lexer):
+		""" Called before parse the footnotes of the text.
+
+			:param str text: Markdown text preprocessed.
+			:param mpiece.lexer.Lexer lexer: Lexer object.
+		"""
+		self.reset()
+		self.regex_token = lexer.regex_token
+
+		if 'footnotes' not in lexer.exclude:
+			self.footnotes = [mo.group('name') for mo in lexer.regex_footnotes.finditer(text)]
+
+	def finish(self, token, token_list):
+		""" Called when all tokens are parsed, before they are joined.
+			The tokens are visited in the same order that they are in the text.
+
+			:param mpiece.lexer.Token token: Main token.
+			:param [mpiece.lexer.Token] token_list: All tokens parsed.
+		"""
+		words = self.get_text(token, token_list, self.add_token).split()
+		self.words = len(words)
+		self.characters = sum(map(len, words))
+
+	def add_token(self, token, token_list):
+		""" Store the metadata of a token.
+
+			:param mpiece.lexer.Token token: Token.
+			:param [mpiece.lexer.Token] token_list: All tokens parsed. The children of the token are inside.
+		"""
+		name = token.render_func
+		extras = token.extras
+
+		if name == 'header':
+			text = self.get_text(token, token_list)
+			self.headers.append({'level': extras['level'], 'text': text, 'slug': self.make_slug(text)})
+
+		elif name == 'link':
+			self.links.append({
+				'href': extras.get('href'), 'title': extras.get('title'), 'text': self.get_text(token, token_list)
+			})
+
+		elif name == 'image':
+			self.images.append({'src': extras.get('src'), 'alt': extras.get('alt'), 'title': extras.get('title')})
+
+	def get_text(self, token, token_list, visit=None):
+		""" Get the text of the token and its children without markdown grammar.
+			The text of the tokens which aren't in :attr:`MetadataCollector.inline_tokens` is surrounded by spaces.
+
+			:param mpiece.lexer.Token token: Token.
+			:param [mpiece.lexer.Token] token_list: All tokens parsed.
+			:param visit: Function called with each child token and the token list, in the order of the text.
+			:return str: Text.
+		"""
+		regex_token = self.regex_token
+		pieces = []
+		stack = [token]
+
+		while stack:
+			item = stack.pop()
+
+			if isinstance(item, string_types):
+				pieces.append(item)
+				continue
+
+			if item.render_func in self.skip_tokens:
+				continue
+
+			if visit is not None and item is not token:
+				visit(item, token_list)
+
+			if not item.has_text:
+				pieces.append(item.extras.get('code') or item.extras.get('alt') or '')
+
+			else:
+				# The text is split in: text, token number, text, token number...
+				parts = regex_token.split(item.text)
+				for i in range(len(parts) - 1, -1, -1):
+					if i % 2 == 0:
+						stack.append(parts[i])
+						continue
+
+					child = token_list[int(parts[i])]
+					if child.render_func in self.inline_tokens:
+						stack.append(child)
+					else:
+						stack.extend((' ', child, ' '))
+
+		return ''.join(pieces).strip()
+
+	def make_slug(self, text):
+		""" Make a unique slug using the header text.
+
+			:param str text: Header text.
+			:return str: Slug.
+		"""
+		slug = self.regex_slug.sub('', text.lower())
+		slug = self.regex_slug_space.sub('-', slug).strip('-') or 'section'
+		unique_slug = slug
+		i = self.slugs.get(slug, 0)
+
+		while unique_slug in self.slugs:
+			i += 1
+			unique_slug = '%s-%d' % (slug, i)
+
+		self.slugs[slug] = i
+		self.slugs[unique_slug] = 0
+		return unique_slug
+
+	def as_dict(self):
+		""" Get all metadata.
+
+			:return dict: Dictionary with the ``headers``, ``links``, ``images``, ``footnotes``, ``words`` and
+				``characters`` keys.
+		"""
+		return {
+			'headers': self.headers,
+			'links': self.links,
+			'images': self.images,
+			'footnotes': self.footnotes,
+			'words': self.words,
+			'characters': self.characters,
+		}
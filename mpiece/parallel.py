@@ -0,0 +1,148 @@
+"""
+	mpiece.parallel
+	~~~~~~~~~~~~~~~
+
+	Render the top level blocks of a big markdown text in parallel worker processes.
+
+	Example:
+		.. code:: python
+
+			from mpiece.parallel import ParallelMarkdown
+
+			with ParallelMarkdown(processes=4) as markdown:
+				result = markdown(markdown_text)
+
+	The pre-fork servers can call :func:`prepare_fork` before start the workers, so the workers share the lexer
+	and the renderer with the main process.
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import gc
+import multiprocessing
+
+from mpiece.core import MPiece
+from mpiece.lexer import Lexer
+from mpiece.renderer import HtmlRenderer
+
+#: Markdown text rendered by :func:`prepare_fork`. It has all grammar elements of the default lexer.
+WARM_UP_TEXT = (
+	'# Header\n\nHeader 2\n--------\n\n**bold** *italic* _underline_ ~strike~ `code` [link](http://a.com "title") '
+	'![image](a.png) [reference][ref] \\*[^note]\n\n[^note]: Footnote.\n[ref]: http://a.com\n\n'
+	'* item\n  * subitem\n\n1. item\n\n> quote\n\n'
+	'| a | b |\n|---|:-:|\n| c | d |\n\n```python\nreturn None\n```\n\n---\n'
+)
+
+
+def prepare_fork(lexer=None, renderer=None, freeze=True):
+	""" Prepare the lexer and the renderer to be shared with forked worker processes.
+
+		A text with all grammar elements is rendered, so the dictionaries of functions, the compiled regular
+		expressions and the caches are made before the fork. Then :func:`gc.freeze` moves all objects to the permanent
+		generation: the garbage collector of the workers doesn't write in their memory pages, and the pages are
+		shared with the main process (copy-on-write) instead of copied.
+
+		:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+		:param mpiece.renderer.Renderer renderer: Renderer object. By default :class:`mpiece.renderer.HtmlRenderer`.
+		:param bool freeze: Call :func:`gc.freeze`. It only exists in python 3.7+.
+		:return: Tuple with the lexer and the renderer.
+	"""
+	lexer = lexer or Lexer()
+	renderer = renderer or HtmlRenderer()
+	MPiece().parse(WARM_UP_TEXT, lexer, renderer)
+
+	if freeze and hasattr(gc, 'freeze'):
+		gc.collect()
+		gc.freeze()
+
+	return lexer, renderer
+
+
+# Lexer, renderer and low memory mode of the worker process.
+_worker = None
+
+
+def _init_worker(lexer, renderer, low_memory):
+	global _worker
+	_worker = (lexer, renderer, low_memory)
+
+
+def _render_group(group):
+	lexer, renderer, low_memory = _worker
+	mpiece = MPiece(low_memory)
+	mpiece.init_parse(lexer, renderer)
+	# The reference definitions of the whole text, collected in the main process.
+	text, mpiece.references = group
+	return mpiece.parse_text(text)
+
+
+class ParallelMarkdown(object):
+	"""
+		Transform markdown texts rendering their top level blocks in a pool of worker processes.
+
+		The footnotes are applied and the reference definitions are collected in the main process, then the text is
+		split in groups of blocks with :meth:`mpiece.lexer.Lexer.split_blocks` and each group is parsed and rendered
+		in a worker with the definitions. The rendered groups are joined in the same order, so the result is the same
+		as :func:`mpiece.markdown`.
+
+		The lexer and the renderer are sent to the workers when the pool is started. Their changes after that
+		aren't seen by the workers.
+
+		:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+		:param mpiece.renderer.Renderer renderer: Renderer object. By default :class:`mpiece.renderer.HtmlRenderer`.
+		:param int processes: Number of worker processes. By default the number of CPUs.
+		:param int group_size: Minimum number of characters of each group of blocks. By default the text is split
+			in 4 groups for each process.
+		:param bool low_memory: Use the low memory mode in the workers. See :class:`mpiece.core.MPiece`.
+	"""
+
+	#: Texts smaller than this number of characters are rendered in the main process.
+	min_size = 16384
+
+	def __init__(self, lexer=None, renderer=None, processes=None, group_size=None, low_memory=False):
+		self.lexer = lexer or Lexer()
+		self.renderer = renderer or HtmlRenderer()
+		self.processes = processes or multiprocessing.cpu_count()
+		self.group_size = group_size
+		self.low_memory = low_memory
+		self.pool = multiprocessing.Pool(self.processes, _init_worker, (self.lexer, self.renderer, low_memory))
+
+	def __call__(self, text):
+		""" Transform markdown text.
+
+			:param str text: Markdown text.
+			:return: It depends of the renderer class.
+			:exception: :class:`mpiece.core.RenderFunctionNotFoundException`
+			:exception: :class:`mpiece.core.ParseFunctionNotFoundException`
+			:exception: :class:`mpiece.core.RegexNotFoundException`
+			:exception: :class:`mpiece.core.InvalidDataException`
+		"""
+		mpiece = MPiece(self.low_memory)
+		mpiece.init_parse(self.lexer, self.renderer)
+		text = mpiece.pre_process_text(text)
+		groups = [text]
+
+		if len(text) >= self.min_size or self.group_size is not None:
+			group_size = self.group_size or len(text) // (4 * self.processes)
+			groups = self.lexer.split_blocks(text, group_size)
+
+		del text
+		if len(groups) == 1:
+			text = mpiece.parse_text(groups[0])
+		else:
+			text = ''.join(self.pool.map(_render_group, [(group, mpiece.references) for group in groups]))
+
+		return self.renderer.post_process_text(mpiece.unescape_token_str(text))
+
+	def close(self):
+		""" Stop the worker processes.
+		"""
+		self.pool.close()
+		self.pool.join()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
@@ -8,6 +8,17 @@
 	:author: David Casado Martinez <dcasadomartinez@gmail.com>
 """
 
+import re
+
+try:
+	from html import unescape
+except ImportError:
+	from HTMLParser import HTMLParser
+	unescape = HTMLParser().unescape
+
+from mpiece.cache import LRUCache
+from mpiece.utils import escape_html
+
 
 class Renderer(object):
 	"""
@@ -19,16 +30,40 @@ class Renderer(object):
 
 	"""
 
+	#: Render functions which return the text of the token without changes.
+	#: :class:`mpiece.core.MPiece` uses the token text directly and it doesn't call these functions.
+	text_render_funcs = frozenset()
+
 	def __init__(self):
+		self.load_render_funcs()
+
+	def load_render_funcs(self):
+		""" Get all render functions of the renderer, in the :attr:`Renderer.all_render_funcs` dictionary.
+		"""
 		self.all_render_funcs = {}
 
 		for item in dir(self):
 			if item.startswith('render_'):
 				self.all_render_funcs[item[7:]] = getattr(self, item)
 
+	def __getstate__(self):
+		""" Only the configuration of the renderer is pickled. The dictionary of render functions is made again
+			when the renderer is unpickled.
+		"""
+		state = self.__dict__.copy()
+		del state['all_render_funcs']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.load_render_funcs()
+
 	def render__only_text(self, text):
 		return text
 
+	def render_inline(self, text):
+		return text
+
 	def post_process_text(self, text):
 		""" Process the rendered text.
 
@@ -37,6 +72,16 @@ class Renderer(object):
 		"""
 		return text
 
+	def post_process_by_blocks(self):
+		""" Check if :meth:`Renderer.post_process_text` can process each group of top level blocks separately.
+			It is ``True`` when the subclass doesn't override :meth:`Renderer.post_process_text`.
+
+			:return bool:
+		"""
+		func = self.__class__.post_process_text
+		base_func = Renderer.post_process_text
+		return getattr(func, '__func__', func) is getattr(base_func, '__func__', base_func)
+
 
 class HtmlRenderer(Renderer):
 	"""
@@ -53,16 +98,51 @@ class HtmlRenderer(Renderer):
 		:param bool escape_html:
 			- ``True``: Escape the html tag in the markdown text.
 			- ``False``: No escape the html tag in the markdown text.
+
+		:param highlighter:
+			Function to highlight the code of the fenced code blocks with language. It receives the code and the
+			language, and it returns the html code escaped or ``None`` to render the code block without highlight.
+			See :class:`mpiece.highlight.Highlighter`.
+
+		:param sanitizer:
+			Function to clean the raw html when ``escape_html`` is ``False``. It receives the text of a token and the
+			:meth:`HtmlRenderer.escape_link` function, and it returns the text sanitized. The urls of the links and the
+			images are checked with its ``clean_url`` method. See :class:`mpiece.sanitizer.HtmlSanitizer`.
+
+		:param url_rewriter:
+			Function to change the urls of the links and the images, like adding the domain of a CDN or the tracking
+			params. It receives the url of the markdown text and ``'link'`` or ``'image'``, and it returns the new
+			url. The new url is checked and escaped like the urls of the markdown text. The urls of the raw html
+			aren't changed.
+
+		:param int url_cache_size:
+			Maximum number of urls rewritten stored in the :attr:`HtmlRenderer.url_cache` cache. The repeated urls
+			are rewritten once. Use ``url_cache.info()`` to get the statistics of the cache.
 	"""
 
 	#: Blacklist of link schemes
 	scheme_blacklist = ('javascript', 'data', 'vbscript')
 
-	def __init__(self, use_underline=True, use_paragraph=True, escape_html=True):
+	def __init__(
+		self, use_underline=True, use_paragraph=True, escape_html=True, highlighter=None, sanitizer=None,
+		url_rewriter=None, url_cache_size=1024
+	):
 		super(HtmlRenderer, self).__init__()
 		self.use_underline = use_underline
 		self.use_paragraph = use_paragraph
 		self.escape_html = escape_html
+		self.highlighter = highlighter
+		self.sanitizer = sanitizer
+		self.url_rewriter = url_rewriter
+		#: Urls rewritten by ``url_rewriter``, by the url and the kind of url.
+		self.url_cache = LRUCache(url_cache_size)
+
+	def __getstate__(self):
+		""" The urls rewritten aren't pickled.
+		"""
+		state = super(HtmlRenderer, self).__getstate__()
+		state['url_cache'] = LRUCache(self.url_cache.maxsize)
+		return state
 
 	def escape(self, text):
 		""" Escape dangerous html characters.
@@ -71,13 +151,28 @@ class HtmlRenderer(Renderer):
 			:return: Html text escaped.
 
 		"""
-		if not self.escape_html or text is None:
+		if text is None:
 			return text
 
-		return (
-			text.replace('&', '&amp;').replace('<', '&lt;')
-			.replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
-		)
+		if self.escape_html:
+			return escape_html(text)
+
+		if self.sanitizer is not None:
+			return self.sanitizer(text, self.escape_link)
+
+		return text
+
+	def escape_attr(self, text):
+		""" Escape the value of an html attribute. It is always escaped, also when ``escape_html`` is ``False``: the
+			sanitizer cleans the html of the elements, but its tags and quotes would close the attribute.
+
+			:param str text: Value without escape.
+			:return: Value escaped.
+		"""
+		if text is None:
+			return text
+
+		return escape_html(text)
 
 	def escape_args(self, *args):
 		""" Escape html characters of all arguments
@@ -105,9 +200,47 @@ class HtmlRenderer(Renderer):
 
 		return link
 
+	def rewrite_url(self, url, kind):
+		""" Change an url with the ``url_rewriter`` function. The results are stored in
+			:attr:`HtmlRenderer.url_cache`.
+
+			:param str url: Url of the markdown text.
+			:param str kind: ``'link'`` or ``'image'``.
+			:return str: New url. The same url without ``url_rewriter``.
+		"""
+		if self.url_rewriter is None:
+			return url
+
+		key = (url, kind)
+		new_url = self.url_cache.get(key)
+		if new_url is None:
+			new_url = self.url_rewriter(url, kind) or ''
+			self.url_cache.set(key, new_url)
+
+		return new_url
+
+	def escape_url(self, url, kind='link'):
+		""" Rewrite the url of a link or an image with :meth:`HtmlRenderer.rewrite_url`, and check it with
+			:meth:`HtmlRenderer.escape_link`. The sanitizer also checks the url when the html isn't escaped.
+
+			:param str url: Url checked.
+			:param str kind: ``'link'`` or ``'image'``.
+			:return: The url escaped, or an empty string if the scheme isn't valid.
+		"""
+		if self.url_rewriter is not None:
+			url = self.rewrite_url(url, kind)
+
+		if self.sanitizer is None or self.escape_html:
+			return escape_html(self.escape_link(url, False))
+
+		return escape_html(self.sanitizer.clean_url(unescape(url), self.escape_link))
+
 	#
 	# Render functions
 	#
+	def render_inline(self, text):
+		return self.escape(text)
+
 	def render_escape_backslash(self, text):
 		return self.escape(text)
 
@@ -131,18 +264,18 @@ class HtmlRenderer(Renderer):
 
 	def render_link(self, text, href, title=''):
 		text = self.escape(text)
-		href = self.escape_link(href)
+		href = self.escape_url(href)
 
 		if title:
-			return '<a href="%s" title="%s">%s</a>' % (href, self.escape(title), text)
+			return '<a href="%s" title="%s">%s</a>' % (href, self.escape_attr(title), text)
 
 		return '<a href="%s">%s</a>' % (href, text)
 
 	def render_image(self, src, alt, title=''):
-		alt = self.escape(alt)
-		src = self.escape_link(src)
+		alt = self.escape_attr(alt)
+		src = self.escape_url(src, 'image')
 		if title:
-			title = self.escape(title)
+			title = self.escape_attr(title)
 			return '<img src="%s" alt="%s" title="%s">' % (src, alt, title)
 
 		return '<img src="%s" alt="%s">' % (src, alt)
@@ -171,9 +304,14 @@ class HtmlRenderer(Renderer):
 		return '<blockquote>%s</blockquote>' % self.escape(text)
 
 	def render_header(self, text, level):
-		return '<h{level}>{text}</h{level}>'.format(level=level, text=self.escape(text))
+		return '<h%d>%s</h%d>' % (level, self.escape(text), level)
 
 	def render_fenced_code(self, code, lang='', title=''):
+		if self.highlighter and lang:
+			html = self.highlighter(code, lang)
+			if html is not None:
+				return '<pre class="lang-%s">%s</pre>' % (escape_html(lang.strip()), html)
+
 		return '<pre>%s</pre>' % self.escape(code)
 
 	def render_break_line(self, symbol):
@@ -186,7 +324,7 @@ class HtmlRenderer(Renderer):
 		return '<thead><tr>%s</tr></thead>' % text
 
 	def render_table_header_cell(self, text):
-		return '<th>%s</th>' % text
+		return '<th>%s</th>' % self.escape(text)
 
 	def render_table_body(self, text):
 		return '<tbody>%s</tbody>' % text
@@ -196,6 +334,137 @@ class HtmlRenderer(Renderer):
 
 	def render_table_body_cell(self, text, align=''):
 		if align and align != 'left':
-			return '<td style="text-align:%s;">%s</td>' % (align, text)
+			return '<td style="text-align:%s;">%s</td>' % (align, self.escape(text))
 		else:
-			return '<td>%s</td>' % text
+			return '<td>%s</td>' % self.escape(text)
+
+
+class PlainTextRenderer(Renderer):
+	"""
+		Transform the lexer results in plain text, without markup and without escape. It is useful to index the text
+		in a search engine.
+
+		:param bool include_code: Include the code of the inline code and the fenced code blocks.
+		:param str block_separator: String between the blocks: paragraphs, headers, list items, table rows...
+		:param str cell_separator: String between the cells of the tables.
+
+		The raw html tags are removed and the html entities are unescaped, except inside of the code.
+	"""
+
+	#: Sentinels used in the rendered text. They start with the ``\x00`` character, which is removed of the markdown
+	#: text in :meth:`mpiece.lexer.Lexer.pre_process_text`, so they never are in the user text.
+	BLOCK_END = '\x00B'
+	CELL_END = '\x00C'
+	CODE_START = '\x00['
+	CODE_END = '\x00]'
+
+	regex_code = re.compile(r'\x00\[(.*?)\x00\]', re.S)
+	regex_html_tag = re.compile(r'<!--.*?-->|</?[a-zA-Z][^<>]*>', re.S)
+	regex_spaces = re.compile(r'[^\S\n]+')
+	regex_last_cell = re.compile(r'\x00C(?=\s*\x00B)')
+	regex_cell_end = re.compile(r'[^\S\n]*\x00C[^\S\n]*')
+	regex_block_end = re.compile(r'\s*\x00B(?:\s*\x00B)*\s*')
+
+	def __init__(self, include_code=True, block_separator='\n\n', cell_separator=' '):
+		super(PlainTextRenderer, self).__init__()
+		self.include_code = include_code
+		self.block_separator = block_separator
+		self.cell_separator = cell_separator
+
+		# The render functions overwritten in a subclass are always called.
+		self.text_render_funcs = frozenset(
+			name for name in (
+				'inline', 'escape_backslash', 'bold', 'italic', 'underline', 'strike', 'link', 'olist', 'ulist',
+				'blockquote', 'table_body'
+			)
+			if getattr(self.__class__, 'render_' + name) is getattr(PlainTextRenderer, 'render_' + name)
+		)
+
+	def post_process_text(self, text):
+		""" Remove the raw html tags, unescape the html entities and replace the sentinels with the separators.
+			The code isn't changed.
+
+			:param str text: Rendered text
+			:return str:
+		"""
+		# The text is split in: text, code, text, code...
+		parts = self.regex_code.split(text)
+		for i in range(0, len(parts), 2):
+			parts[i] = self.regex_spaces.sub(' ', unescape(self.regex_html_tag.sub('', parts[i])))
+
+		text = ''.join(parts)
+		text = self.regex_last_cell.sub('', text)
+		text = self.regex_cell_end.sub(self.cell_separator, text)
+		return self.regex_block_end.sub(self.block_separator, text).strip()
+
+	#
+	# Render functions
+	#
+	def render_escape_backslash(self, text):
+		return text
+
+	def render_bold(self, text):
+		return text
+
+	def render_italic(self, text):
+		return text
+
+	def render_underline(self, text):
+		return text
+
+	def render_strike(self, text):
+		return text
+
+	def render_code_inline(self, code):
+		return self.CODE_START + code + self.CODE_END if self.include_code else ''
+
+	def render_link(self, text, href, title=''):
+		return text
+
+	def render_image(self, src, alt, title=''):
+		return ''
+
+	def render_new_line(self, text):
+		return text + self.BLOCK_END
+
+	def render_olist(self, text, start):
+		return text
+
+	def render_olist_item(self, text):
+		return text + self.BLOCK_END
+
+	def render_ulist(self, text, start):
+		return text
+
+	def render_ulist_item(self, text):
+		return text + self.BLOCK_END
+
+	def render_blockquote(self, text):
+		return text
+
+	def render_header(self, text, level):
+		return text + self.BLOCK_END
+
+	def render_fenced_code(self, code, lang='', title=''):
+		return self.CODE_START + code + self.CODE_END + self.BLOCK_END if self.include_code else ''
+
+	def render_break_line(self, symbol):
+		return self.BLOCK_END
+
+	def render_table(self, text):
+		return text
+
+	def render_table_header(self, text):
+		return text + self.BLOCK_END
+
+	def render_table_header_cell(self, text):
+		return text + self.CELL_END
+
+	def render_table_body(self, text):
+		return text
+
+	def render_table_body_row(self, text):
+		return text + self.BLOCK_END
+
+	def render_table_body_cell(self, text, align=''):
+		return text + self.CELL_END
@@ -0,0 +1,201 @@
+"""
+	mpiece.sanitizer
+	~~~~~~~~~~~~~~~~
+
+	Allowlist sanitizer of the raw html written in the markdown text.
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import re
+
+try:
+	from html import unescape
+except ImportError:
+	from HTMLParser import HTMLParser
+	unescape = HTMLParser().unescape
+
+from mpiece.core import MPiece
+from mpiece.utils import escape_html
+
+
+class HtmlSanitizer(object):
+	"""
+		Clean the raw html of the markdown text while it is rendered. The tags and the attributes which aren't in the
+		allowlists are removed, and the urls of the attributes need a scheme of the allowlist.
+
+		This class is used in the ``sanitizer`` param of the :class:`mpiece.renderer.HtmlRenderer` class, with
+		``escape_html=False``. The renderer calls it with the text of each token, before the rendered children are
+		joined, so the html is read once. Each text is read in one pass: the ``<`` characters which don't start a
+		complete tag in the same text are escaped, so the texts of different tokens can't be joined in a new tag.
+		The tags aren't balanced.
+
+		:param tags: Allowed tag names. By default :attr:`HtmlSanitizer.tags`.
+		:param dict attributes: Allowed attributes of each tag. The ``'*'`` key has the attributes allowed in all
+			tags. By default :attr:`HtmlSanitizer.attributes`.
+		:param schemes: Allowed url schemes, or ``None`` to allow all schemes except the
+			:attr:`mpiece.renderer.HtmlRenderer.scheme_blacklist` schemes. By default :attr:`HtmlSanitizer.schemes`.
+
+		:Example:
+			.. code:: python
+
+				from mpiece import markdown
+				from mpiece.renderer import HtmlRenderer
+				from mpiece.sanitizer import HtmlSanitizer
+
+				renderer = HtmlRenderer(escape_html=False, sanitizer=HtmlSanitizer())
+				result = markdown('<b onclick="x()">a</b><script>', renderer=renderer)
+				print(result)
+				# output: <p><b>a</b>&lt;script&gt;</p>
+	"""
+
+	#: Allowed tag names.
+	tags = frozenset((
+		'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'del', 'div', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr',
+		'i', 'img', 'ins', 'kbd', 'li', 'ol', 'p', 'pre', 'q', 's', 'small', 'span', 'strong', 'sub', 'sup', 'table',
+		'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul'
+	))
+
+	#: Allowed attributes of each tag.
+	attributes = {
+		'*': ('title',),
+		'a': ('href',),
+		'abbr': ('title',),
+		'blockquote': ('cite',),
+		'img': ('src', 'alt', 'width', 'height'),
+		'ol': ('start',),
+		'q': ('cite',),
+		'td': ('align', 'colspan', 'rowspan'),
+		'th': ('align', 'colspan', 'rowspan'),
+	}
+
+	#: Attributes with an url.
+	url_attributes = frozenset(('href', 'src', 'cite'))
+
+	#: Allowed url schemes. The urls without scheme are always allowed.
+	schemes = frozenset(('http', 'https', 'mailto', 'ftp'))
+
+	# The tags can't have the ``<`` character, so a tag which isn't closed is only read until the next ``<``.
+	regex_tag = re.compile(
+		r'<(?P<close>/?)(?P<name>[a-zA-Z][a-zA-Z0-9]*)'
+		r'(?P<attrs>(?:\s+[^\s"\'<>/=]+(?:\s*=\s*(?:"[^"<]*"|\'[^\'<]*\'|[^\s"\'<>`]+))?)*)\s*(?P<end>/?)>'
+	)
+	regex_attr = re.compile(r'(?P<name>[^\s"\'<>/=]+)(?:\s*=\s*(?:"(?P<dq>[^"]*)"|\'(?P<sq>[^\']*)\'|(?P<uq>\S+)))?')
+	regex_special = re.compile(r'[<>"\']')
+	regex_url_spaces = re.compile(r'[\x00-\x20\x7f]+')
+	regex_scheme = re.compile(r'(?P<scheme>[a-zA-Z][a-zA-Z0-9+.\-]*):')
+
+	def __init__(self, tags=None, attributes=None, schemes=()):
+		if tags is not None:
+			self.tags = frozenset(tag.lower() for tag in tags)
+
+		if attributes is not None:
+			self.attributes = attributes
+
+		if schemes != ():
+			self.schemes = None if schemes is None else frozenset(scheme.lower() for scheme in schemes)
+
+		#: Allowed attributes by tag, with the attributes allowed in all tags.
+		common = tuple(self.attributes.get('*', ()))
+		self.tag_attributes = dict(
+			(tag, frozenset(attr.lower() for attr in common + tuple(self.attributes.get(tag, ()))))
+			for tag in self.tags
+		)
+
+	def __call__(self, text, escape_link):
+		""" Sanitize the raw html of a text.
+
+			:param str text: Text of a token. It can have token strings.
+			:param escape_link: Function which checks the blacklist of url schemes, like
+				:meth:`mpiece.renderer.HtmlRenderer.escape_link`.
+			:return str: Text sanitized.
+		"""
+		if not self.regex_special.search(text):
+			return text
+
+		pieces = []
+		pos = 0
+		find = text.find
+		match = self.regex_tag.match
+
+		while True:
+			start = find('<', pos)
+			if start < 0:
+				break
+
+			pieces.append(self.escape_text(text[pos:start]))
+			mo = match(text, start)
+			if mo is None:
+				pieces.append('&lt;')
+				pos = start + 1
+				continue
+
+			pieces.append(self.clean_tag(mo, escape_link))
+			pos = mo.end()
+
+		pieces.append(self.escape_text(text[pos:]))
+		return ''.join(pieces)
+
+	def escape_text(self, text):
+		""" Escape the text outside of the tags. The html entities aren't changed.
+
+			:param str text: Text.
+			:return str:
+		"""
+		return text.replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
+
+	def clean_tag(self, mo, escape_link):
+		""" Remove the attributes which aren't allowed of a tag. The tags which aren't allowed and the tags with
+			token strings (a token inside a tag) are escaped.
+
+			:param mo: Match of :attr:`HtmlSanitizer.regex_tag`.
+			:param escape_link: See :meth:`HtmlSanitizer.__call__`.
+			:return str: Html code of the tag.
+		"""
+		name = mo.group('name').lower()
+		allowed = self.tag_attributes.get(name)
+		if allowed is None or MPiece.TOKEN_STR_PREFIX in mo.group(0):
+			return self.escape_text(mo.group(0))
+
+		if mo.group('close'):
+			return '</%s>' % name
+
+		attrs = []
+		for amo in self.regex_attr.finditer(mo.group('attrs')):
+			attr = amo.group('name').lower()
+			if attr not in allowed:
+				continue
+
+			value = amo.group('dq')
+			if value is None:
+				value = amo.group('sq')
+				if value is None:
+					value = amo.group('uq') or ''
+
+			value = unescape(value)
+			if attr in self.url_attributes:
+				value = self.clean_url(value, escape_link)
+				if not value:
+					continue
+
+			attrs.append(' %s="%s"' % (attr, escape_html(value)))
+
+		return '<%s%s%s>' % (name, ''.join(attrs), ' /' if mo.group('end') else '')
+
+	def clean_url(self, url, escape_link):
+		""" Check the scheme of an url. The spaces and the control characters are ignored when it is checked.
+
+			:param str url: Url without html entities.
+			:param escape_link: See :meth:`HtmlSanitizer.__call__`.
+			:return str: The url, or an empty string if its scheme isn't allowed.
+		"""
+		checked = self.regex_url_spaces.sub('', url).lower()
+		mo = self.regex_scheme.match(checked)
+		if mo is not None and self.schemes is not None and mo.group('scheme') not in self.schemes:
+			return ''
+
+		if not escape_link(checked, False):
+			return ''
+
+		return url.strip()
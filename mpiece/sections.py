@@ -0,0 +1,280 @@
+"""
+	mpiece.sections
+	~~~~~~~~~~~~~~~
+
+	Render the sections of a long markdown text by their header, without render the rest of the text.
+
+	Example:
+		.. code:: python
+
+			from mpiece.sections import SectionIndex
+
+			index = SectionIndex(markdown_text)
+			print([(section['level'], section['slug']) for section in index.sections])
+
+			result = index.render('install')
+			result = index.render_range(2, 5)
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+from mpiece.core import MPiece
+from mpiece.lexer import Lexer
+from mpiece.metadata import MetadataCollector
+from mpiece.renderer import HtmlRenderer, PlainTextRenderer
+from mpiece.utils import string_types
+
+
+class SectionIndex(object):
+	"""
+		Index of the headers of a markdown text, made once with the regular expressions of the top level blocks of
+		:attr:`mpiece.lexer.Lexer.order_initial`, applied in the same order as the parser. The index stores the
+		position of each header and of the footnote and reference definitions, so each section is rendered alone: the
+		cost depends on the length of the section, not of the text.
+
+		Only the top level headers are sections: the text taken by the fenced code blocks, the tables, the lists and
+		the blockquotes before the headers are searched isn't a section, like in the full render.
+		The definitions of the footnotes and the reference links used in a section are added to its text, so they
+		are applied like in the full text. The slugs are made like the slugs of the
+		:class:`mpiece.metadata.MetadataCollector`. The index can be pickled and stored in a cache.
+
+		:param str text: Markdown text.
+		:param mpiece.lexer.Lexer lexer: Lexer object. By default :class:`mpiece.lexer.Lexer`.
+
+		:ivar list sections: List of dictionaries with the ``index``, ``level``, ``title``, ``slug``, ``start`` and
+			``end`` keys, in the order of the text. The section goes from ``start`` to ``end`` and it has the
+			sections of lower level after its header.
+	"""
+
+	def __init__(self, text, lexer=None):
+		self.lexer = lexer = lexer or Lexer()
+		#: Text preprocessed by the lexer. The positions of the sections are in this text.
+		self.text = text = lexer.pre_process_text(text)
+		self.sections = []
+		#: Index of each section by slug.
+		self.slugs = {}
+		#: Position and source of the footnote definitions, by name. The last definition of a name is used.
+		self.footnotes = {}
+		#: Position and source of the reference definitions, by key. The first definition of a name is used.
+		self.references = {}
+
+		# Start and end positions of all definitions.
+		definitions = []
+		exclude = lexer.exclude
+		if 'footnotes' not in exclude:
+			for mo in lexer.regex_footnotes.finditer(text):
+				self.footnotes[mo.group('name')] = (mo.start(), mo.group(0))
+				definitions.append(mo.span())
+
+		if 'references' not in exclude:
+			for mo in lexer.find_definitions(text):
+				self.references.setdefault(lexer.get_reference_key(mo.group('name')), (mo.start(), mo.group(0)))
+				definitions.append(mo.span())
+
+		self.make_sections(text, definitions)
+
+	def find_headers(self, text, definitions):
+		""" Find the top level headers like the parser. The definitions are removed, and the grammar elements of
+			:attr:`mpiece.lexer.Lexer.order_initial` are replaced in order until the headers are found. The tokens of
+			the parse functions are replaced with ``\\x00`` characters instead of token strings, so the text keeps
+			its length and the positions are the positions of :attr:`SectionIndex.text`.
+
+			:param str text: Text preprocessed.
+			:param list definitions: Start and end positions of the footnote and reference definitions.
+			:return dict: Match object and token of each header, by position.
+		"""
+		lexer = self.lexer
+		if definitions:
+			# The definitions are removed, so their lines are empty.
+			pieces = []
+			pos = 0
+			for start, end in sorted(definitions):
+				if start >= pos:
+					pieces.append(text[pos:start])
+					pieces.append('\n' * (end - start))
+					pos = end
+
+			pieces.append(text[pos:])
+			text = ''.join(pieces)
+
+		mpiece = MPiece()
+		mpiece.init_parse(lexer, None)
+		headers = {}
+		pending = set(['header', 'header2']).difference(lexer.exclude)
+
+		def replace(mo):
+			result = mpiece.parse_match(element, {}, mo)
+			tokens = [r for r in result if not isinstance(r, string_types)]
+			if element in pending and tokens:
+				headers[mo.start()] = (mo, tokens[0])
+
+			# The first token takes the characters which the strings of the result don't take.
+			size = mo.end() - mo.start() - sum(len(r) for r in result if isinstance(r, string_types)) - len(tokens) + 1
+			if tokens and size < 1:
+				return '\x00' * (mo.end() - mo.start())
+
+			pieces = []
+			for r in result:
+				if isinstance(r, string_types):
+					pieces.append(r)
+				else:
+					pieces.append('\x00' * size)
+					size = 1
+
+			return ''.join(pieces)
+
+		for element in lexer.order_initial:
+			if not pending:
+				break
+
+			if element not in lexer.exclude:
+				text = lexer.all_regex[element].sub(replace, text)
+				pending.discard(element)
+
+		return headers
+
+	def make_sections(self, text, definitions):
+		""" Find the headers of the text, and the end of each section.
+
+			:param str text: Text preprocessed.
+			:param list definitions: Start and end positions of the footnote and reference definitions.
+		"""
+		lexer = self.lexer
+		headers = self.find_headers(text, definitions)
+		starts = sorted(headers)
+		# The headers are parsed together, so their texts and slugs are the same as in the collector.
+		collector = MetadataCollector()
+		source = '\n\n'.join(text[start:headers[start][0].end()] for start in starts)
+		MPiece().parse(source, lexer, PlainTextRenderer(), collector)
+		parsed = collector.headers
+		if len(parsed) != len(starts):
+			# Some headers weren't parsed alone. The slugs are made with the text of the headers.
+			collector.reset()
+			parsed = [None] * len(starts)
+
+		stack = []
+		for start, header in zip(starts, parsed):
+			token = headers[start][1]
+			if header is None:
+				header = {'text': token.text, 'slug': collector.make_slug(token.text)}
+
+			level = token.extras['level']
+			section = {
+				'index': len(self.sections), 'level': level, 'title': header['text'], 'slug': header['slug'],
+				'start': start, 'end': len(text),
+			}
+
+			while stack and stack[-1]['level'] >= level:
+				stack.pop()['end'] = start
+
+			stack.append(section)
+			self.sections.append(section)
+			self.slugs[section['slug']] = section['index']
+
+	def find(self, key):
+		""" Find a section.
+
+			:param key: Slug or index of the section. The negative indexes start from the end.
+			:return dict: Section.
+			:exception: :class:`KeyError` if the section doesn't exist.
+		"""
+		if isinstance(key, int):
+			try:
+				return self.sections[key]
+			except IndexError:
+				raise KeyError(key)
+
+		return self.sections[self.slugs[key]]
+
+	def get_text(self, start, end):
+		""" Get the markdown text between two positions, with the definitions of the footnotes and the reference
+			links which are used in it. The definitions of the footnotes which are used in other footnotes are added
+			too.
+
+			:param int start: Start position in :attr:`SectionIndex.text`.
+			:param int end: End position in :attr:`SectionIndex.text`.
+			:return str: Markdown text.
+		"""
+		lexer = self.lexer
+		text = self.text[start:end]
+		before = []
+		after = []
+
+		if self.references:
+			keys = set()
+			for mo in lexer.regex_apply_references.finditer(text):
+				key = lexer.get_reference_key(mo.group('name') or mo.group('text'))
+				if key in self.references and key not in keys:
+					keys.add(key)
+					position, source = self.references[key]
+					if not start <= position < end:
+						# The first definition is used, so it is added before the text.
+						before.append(source)
+
+		if self.footnotes:
+			names = set()
+			pending = [text]
+			while pending:
+				for mo in lexer.regex_apply_footnotes.finditer(pending.pop()):
+					name = mo.group('name')
+					if name in self.footnotes and name not in names:
+						names.add(name)
+						position, source = self.footnotes[name]
+						pending.append(source)
+						if not start <= position < end:
+							# The last definition is used, so it is added after the text.
+							after.append(source)
+
+		if not before and not after:
+			return text
+
+		return '\n'.join(before + [text] + after)
+
+	def get_range(self, start=None, stop=None):
+		""" Get the positions of a range of sections.
+
+			:param start: Slug or index of the first section, or ``None`` to start at the start of the text.
+			:param stop: Slug or index of the section after the last section, or ``None`` to end at the end of the
+				text.
+			:return: Tuple with the start and the end positions.
+			:exception: :class:`KeyError` if a section doesn't exist.
+		"""
+		start = 0 if start is None else self.find(start)['start']
+		end = len(self.text) if stop is None else self.find(stop)['start']
+		return start, max(start, end)
+
+	def render(self, key, renderer=None, collector=None):
+		""" Render a section with its subsections.
+
+			:param key: Slug or index of the section.
+			:param mpiece.renderer.Renderer renderer: Renderer object. By default :class:`mpiece.renderer.HtmlRenderer`.
+			:param mpiece.metadata.MetadataCollector collector: Object which stores the metadata of the section.
+			:return: It depends of the renderer class.
+			:exception: :class:`KeyError` if the section doesn't exist.
+		"""
+		section = self.find(key)
+		return self.render_text(self.get_text(section['start'], section['end']), renderer, collector)
+
+	def render_range(self, start=None, stop=None, renderer=None, collector=None):
+		""" Render the text from the header of a section to the header of other section. The range of all
+			sections is ``render_range()``, and the text before the first header is ``render_range(None, 0)``.
+
+			:param start: Slug or index of the first section, or ``None``.
+			:param stop: Slug or index of the section after the last section, or ``None``.
+			:param mpiece.renderer.Renderer renderer: Renderer object. By default :class:`mpiece.renderer.HtmlRenderer`.
+			:param mpiece.metadata.MetadataCollector collector: Object which stores the metadata of the sections.
+			:return: It depends of the renderer class.
+			:exception: :class:`KeyError` if a section doesn't exist.
+		"""
+		return self.render_text(self.get_text(*self.get_range(start, stop)), renderer, collector)
+
+	def render_text(self, text, renderer=None, collector=None):
+		""" Render the text of a section.
+
+			:param str text: Markdown text made by :meth:`SectionIndex.get_text`.
+			:param mpiece.renderer.Renderer renderer: Renderer object. By default :class:`mpiece.renderer.HtmlRenderer`.
+			:param mpiece.metadata.MetadataCollector collector: Object which stores the metadata of the text.
+			:return: It depends of the renderer class.
+		"""
+		return MPiece().parse(text, self.lexer, renderer or HtmlRenderer(), collector)
@@ -0,0 +1,369 @@
+"""
+	mpiece.service
+	~~~~~~~~~~~~~~
+
+	Render service for the web servers: a bounded queue of texts with priorities, rendered by a pool of worker
+	threads. The identical texts which are waiting or being rendered at once are rendered once, and all callers get
+	the same result.
+
+	Example:
+		.. code:: python
+
+			from mpiece.service import RenderService, PRIORITY_HIGH
+
+			with RenderService(workers=4, maxsize=128, backpressure='timeout', timeout=2) as service:
+				result = service.render(markdown_text, priority=PRIORITY_HIGH)
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+import heapq
+import threading
+from collections import deque
+from itertools import count
+from timeit import default_timer
+
+from mpiece import Markdown
+from mpiece.core import MPiece, ServiceClosedException, ServiceFullException
+from mpiece.lexer import Lexer
+from mpiece.parallel import WARM_UP_TEXT
+from mpiece.renderer import HtmlRenderer
+
+#: Priority levels. The texts with the lower number are rendered first.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+#: Backpressure modes, used when the queue is full.
+BLOCK = 'block'
+REJECT = 'reject'
+TIMEOUT = 'timeout'
+
+
+class RenderJob(object):
+	"""
+		Text sent to a :class:`RenderService`. The callers which send the same text while it is waiting or being
+		rendered get the same job.
+
+		:ivar str text: Markdown text.
+		:ivar int priority: Best priority of the callers.
+		:ivar int callers: Number of callers which share the job.
+		:ivar float submitted: Time when the job was queued. See :func:`timeit.default_timer`.
+		:ivar float started: Time when a worker started to render the text, or ``None``.
+		:ivar float finished: Time when the text was rendered, or ``None``.
+	"""
+
+	def __init__(self, key, text, lexer, renderer, priority):
+		self.key = key
+		self.text = text
+		self.lexer = lexer
+		self.renderer = renderer
+		self.priority = priority
+		self.callers = 1
+		self.submitted = default_timer()
+		self.started = None
+		self.finished = None
+		self.value = None
+		self.exception = None
+		self.event = threading.Event()
+
+	def __repr__(self):
+		return '<RenderJob priority=%d callers=%d done=%s>' % (self.priority, self.callers, self.done())
+
+	def done(self):
+		""" Check if the text was rendered.
+
+			:return bool:
+		"""
+		return self.event.is_set()
+
+	def result(self, timeout=None):
+		""" Wait for the rendered text.
+
+			:param float timeout: Maximum seconds to wait, or ``None`` to wait until the text is rendered.
+			:return: Rendered text. It depends of the renderer class.
+			:exception: The exception raised while the text was rendered.
+			:exception: :class:`RuntimeError` if the timeout expires.
+		"""
+		self.event.wait(timeout)
+		if not self.event.is_set():
+			raise RuntimeError('The text wasn\'t rendered in %s seconds.' % timeout)
+
+		if self.exception is not None:
+			raise self.exception
+
+		return self.value
+
+
+class RenderService(object):
+	"""
+		Render markdown texts in a pool of worker threads, with a bounded queue and priorities.
+
+		The jobs are identified by the text, the lexer and the renderer. When a caller sends a text which is already
+		waiting or being rendered, it gets the same :class:`RenderJob` and the text is rendered once. If the new
+		caller has a better priority, the job is moved forward in the queue. The jobs are forgotten when they finish:
+		use a cache to keep the results.
+
+		When the queue has ``maxsize`` jobs, the new texts wait for a free place (``'block'``), raise
+		:class:`mpiece.core.ServiceFullException` at once (``'reject'``) or after ``timeout`` seconds (``'timeout'``).
+		The texts shared with a job already queued never wait.
+
+		The lexer and the renderer are shared by the threads, so they shouldn't be changed while the service
+		runs. Each text is parsed by a new :class:`mpiece.core.MPiece`, and the lexer doesn't store the state of the
+		texts. The caches of the renderer (:attr:`mpiece.renderer.HtmlRenderer.url_cache` and the cache of the
+		:class:`mpiece.highlight.Highlighter`) are :class:`mpiece.cache.LRUCache` objects, which hold a lock, so they
+		are shared safely. The renderers with other state should be thread safe too. A text with all grammar
+		elements is rendered before the threads start, so the dictionaries of functions of the lexer and the renderer
+		are made once. The ``memo`` of the :class:`mpiece.Markdown` object isn't used, because it stores the state of
+		one text.
+
+		:param mpiece.Markdown markdown: Object with the default lexer, renderer and low memory mode.
+		:param int workers: Number of worker threads.
+		:param int maxsize: Maximum number of jobs waiting in the queue.
+		:param str backpressure: ``'block'``, ``'reject'`` or ``'timeout'``.
+		:param float timeout: Seconds to wait for a free place with the ``'timeout'`` mode.
+		:param int window: Number of the last jobs used by the latency metrics.
+	"""
+
+	def __init__(self, markdown=None, workers=4, maxsize=64, backpressure=BLOCK, timeout=None, window=1024):
+		if backpressure not in (BLOCK, REJECT, TIMEOUT):
+			raise ValueError('Invalid backpressure mode: %r' % (backpressure, ))
+
+		self.markdown = markdown or Markdown()
+		self.lexer = self.markdown.lexer or Lexer()
+		self.renderer = self.markdown.renderer or HtmlRenderer()
+		self.low_memory = self.markdown.low_memory
+		self.maxsize = maxsize
+		self.backpressure = backpressure
+		self.timeout = timeout
+
+		#: Queue of tuples with the priority, the order and the job. A job moved forward has several tuples.
+		self.queue = []
+		#: Jobs waiting or being rendered, by key.
+		self.jobs = {}
+		self.queued = 0
+		self.running = 0
+		self.closed = False
+		self.order = count()
+		self.condition = threading.Condition()
+
+		self.submitted = 0
+		self.coalesced = 0
+		self.rejected = 0
+		self.completed = 0
+		self.failed = 0
+		self.waits = deque(maxlen=window)
+		self.latencies = deque(maxlen=window)
+
+		MPiece(self.low_memory).parse(WARM_UP_TEXT, self.lexer, self.renderer)
+		self.threads = []
+		for i in range(workers):
+			thread = threading.Thread(target=self.work, name='mpiece-render-%d' % i)
+			thread.daemon = True
+			thread.start()
+			self.threads.append(thread)
+
+	def get_key(self, text, lexer, renderer):
+		""" Identify the identical jobs. The objects are compared by identity: the job keeps them alive, so their
+			ids aren't reused while it is in the service.
+
+			:param str text: Markdown text.
+			:param mpiece.lexer.Lexer lexer: Lexer object.
+			:param mpiece.renderer.Renderer renderer: Renderer object.
+			:return: Hashable key.
+		"""
+		return (text, id(lexer), id(renderer))
+
+	def submit(self, text, lexer=None, renderer=None, priority=PRIORITY_NORMAL):
+		""" Queue a text, without wait for the result.
+
+			:param str text: Markdown text.
+			:param mpiece.lexer.Lexer lexer: Lexer object. By default the lexer of the service.
+			:param mpiece.renderer.Renderer renderer: Renderer object. By default the renderer of the service.
+			:param int priority: :data:`PRIORITY_HIGH`, :data:`PRIORITY_NORMAL`, :data:`PRIORITY_LOW` or other
+				number. The lower numbers are rendered first.
+			:return: :class:`RenderJob` object.
+			:exception: :class:`mpiece.core.ServiceFullException`
+			:exception: :class:`mpiece.core.ServiceClosedException`
+		"""
+		lexer = lexer or self.lexer
+		renderer = renderer or self.renderer
+		key = self.get_key(text, lexer, renderer)
+
+		with self.condition:
+			if self.closed:
+				raise ServiceClosedException()
+
+			self.submitted += 1
+			job = self.jobs.get(key)
+			if job is not None:
+				self.coalesced += 1
+				job.callers += 1
+				if job.started is None and priority < job.priority:
+					job.priority = priority
+					heapq.heappush(self.queue, (priority, next(self.order), job))
+
+				return job
+
+			self.wait_place()
+			job = RenderJob(key, text, lexer, renderer, priority)
+			self.jobs[key] = job
+			self.queued += 1
+			heapq.heappush(self.queue, (priority, next(self.order), job))
+			self.condition.notify_all()
+
+		return job
+
+	def wait_place(self):
+		""" Wait for a free place in the queue, following the backpressure mode. The condition must be acquired.
+
+			:exception: :class:`mpiece.core.ServiceFullException`
+			:exception: :class:`mpiece.core.ServiceClosedException`
+		"""
+		if self.queued < self.maxsize:
+			return
+
+		if self.backpressure == REJECT:
+			self.rejected += 1
+			raise ServiceFullException(self.maxsize)
+
+		deadline = None
+		if self.backpressure == TIMEOUT and self.timeout is not None:
+			deadline = default_timer() + self.timeout
+
+		while self.queued >= self.maxsize and not self.closed:
+			remaining = None
+			if deadline is not None:
+				remaining = deadline - default_timer()
+				if remaining <= 0:
+					self.rejected += 1
+					raise ServiceFullException(self.maxsize)
+
+			self.condition.wait(remaining)
+
+		if self.closed:
+			raise ServiceClosedException()
+
+	def render(self, text, lexer=None, renderer=None, priority=PRIORITY_NORMAL, timeout=None):
+		""" Queue a text and wait for the result. See :meth:`RenderService.submit`.
+
+			:param str text: Markdown text.
+			:param mpiece.lexer.Lexer lexer: Lexer object. By default the lexer of the service.
+			:param mpiece.renderer.Renderer renderer: Renderer object. By default the renderer of the service.
+			:param int priority: Priority of the text.
+			:param float timeout: Maximum seconds to wait for the rendered text.
+			:return: It depends of the renderer class.
+		"""
+		return self.submit(text, lexer, renderer, priority).result(timeout)
+
+	def __call__(self, text, lexer=None, renderer=None, priority=PRIORITY_NORMAL):
+		return self.render(text, lexer, renderer, priority)
+
+	def next_job(self):
+		""" Take the next job of the queue, waiting until there is one.
+
+			:return: :class:`RenderJob` object, or ``None`` when the service is closed and the queue is empty.
+		"""
+		with self.condition:
+			while True:
+				while self.queue:
+					job = heapq.heappop(self.queue)[2]
+					# The jobs moved forward have old tuples in the queue.
+					if job.started is None:
+						job.started = default_timer()
+						self.queued -= 1
+						self.running += 1
+						self.condition.notify_all()
+						return job
+
+				if self.closed:
+					return None
+
+				self.condition.wait()
+
+	def work(self):
+		""" Loop of the worker threads.
+		"""
+		while True:
+			job = self.next_job()
+			if job is None:
+				return
+
+			try:
+				job.value = MPiece(self.low_memory).parse(job.text, job.lexer, job.renderer)
+			except Exception as e:
+				job.exception = e
+
+			job.finished = default_timer()
+			with self.condition:
+				del self.jobs[job.key]
+				self.running -= 1
+				if job.exception is None:
+					self.completed += 1
+				else:
+					self.failed += 1
+
+				self.waits.append(job.started - job.submitted)
+				self.latencies.append(job.finished - job.submitted)
+
+			job.event.set()
+
+	def metrics(self):
+		""" Metrics of the service. The latencies are in seconds, from the time the job was queued, of the last
+			``window`` jobs.
+
+			:return dict: ``queue_depth``, ``running``, ``submitted``, ``coalesced``, ``rejected``, ``completed``,
+				``failed``, and the ``wait`` and ``latency`` dictionaries with the ``mean``, ``p50``, ``p95`` and
+				``max`` times.
+		"""
+		with self.condition:
+			return {
+				'queue_depth': self.queued,
+				'running': self.running,
+				'submitted': self.submitted,
+				'coalesced': self.coalesced,
+				'rejected': self.rejected,
+				'completed': self.completed,
+				'failed': self.failed,
+				'wait': summarize(self.waits),
+				'latency': summarize(self.latencies),
+			}
+
+	def close(self, wait=True):
+		""" Stop the service. The new texts are rejected, and the worker threads stop when the queue is empty.
+
+			:param bool wait: Wait for the worker threads.
+		"""
+		with self.condition:
+			self.closed = True
+			self.condition.notify_all()
+
+		if wait:
+			for thread in self.threads:
+				thread.join()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+def summarize(times):
+	""" Summary of a list of times.
+
+		:param times: Times in seconds.
+		:return dict: ``mean``, ``p50``, ``p95`` and ``max`` times. All are 0 without times.
+	"""
+	if not times:
+		return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+
+	times = sorted(times)
+	size = len(times)
+	return {
+		'mean': sum(times) / size,
+		'p50': times[(size - 1) // 2],
+		'p95': times[min(size - 1, int(size * 0.95))],
+		'max': times[-1],
+	}
@@ -0,0 +1,30 @@
+"""
+	mpiece.utils
+	~~~~~~~~~~~~
+
+	Helper functions used in the renderers, and the text types of python 2 and 3.
+
+	:license: BSD, see LICENSE for details.
+	:author: David Casado Martinez <dcasadomartinez@gmail.com>
+"""
+
+try:
+	#: Type of the unicode text: ``unicode`` in python 2 and ``str`` in python 3.
+	text_type = unicode
+except NameError:
+	text_type = str
+
+#: Types of the text: ``str`` and ``unicode`` in python 2, and ``str`` in python 3.
+string_types = (str, text_type)
+
+
+def escape_html(text):
+	""" Escape dangerous html characters.
+
+		:param str text: Text without escape.
+		:return str: Text escaped.
+	"""
+	return (
+		text.replace('&', '&amp;').replace('<', '&lt;')
+		.replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
+	)
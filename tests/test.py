@@ -6,13 +6,68 @@
 """
 
 
+import io
 import os
+import pickle
+import sys
+import threading
+import time
+import zlib
 import unittest
-from mpiece import markdown, Lexer, HtmlRenderer
+from timeit import default_timer
+from mpiece import (
+	Markdown, markdown, markdown_inline, markdown_many, markdown_bytes, iter_markdown_bytes, markdown_preview, Lexer,
+	HtmlRenderer
+)
+from mpiece.cache import FragmentMemo
+from mpiece.compiler import CompiledMarkdown
+from mpiece.cost import CostModel, estimate_cost, fit
+from mpiece.core import (
+	InvalidDocumentException, MPiece, RenderFunctionNotFoundException, ServiceClosedException, ServiceFullException
+)
+from mpiece.document import lex, loads
+from mpiece.events import Handler, walk
+from mpiece.highlight import Highlighter
+from mpiece.metadata import MetadataCollector
+from mpiece.parallel import ParallelMarkdown, prepare_fork
+from mpiece.renderer import PlainTextRenderer, Renderer
+from mpiece.sanitizer import HtmlSanitizer
+from mpiece.sections import SectionIndex
+from mpiece.service import RenderService, PRIORITY_HIGH, PRIORITY_LOW
 import re
 
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
 no_space = re.compile('\s+')
 
+test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def get_corpus_texts():
+	""" Text of each markdown file of the data directory, in the order of their names.
+	"""
+	texts = []
+	for filename in sorted(os.listdir(test_dir)):
+		if filename.endswith('.md'):
+			with io.open(os.path.join(test_dir, filename), 'r', encoding='utf-8') as f:
+				texts.append(f.read())
+
+	return texts
+
+
+def transform_text(text):
+	""" Remove the spaces which don't change the html, so the results can be compared.
+	"""
+	return (
+		re.sub('\s+', ' ', text)
+		.replace('> ', '>')
+		.replace(' <', '<')
+		.strip()
+	)
+
 
 class TestRenderer(HtmlRenderer):
 
@@ -42,14 +97,6 @@ class MPieceTests(unittest.TestCase):
 
 		return content
 
-	def transform_text(self, text):
-		return (
-			re.sub('\s+', ' ', text)
-			.replace('> ', '>')
-			.replace(' <', '<')
-			.strip()
-		)
-
 	def compare(self, html_filename, md_filename, lexer=None, renderer=None):
 		html = self.get_file_text(html_filename)
 
@@ -59,8 +106,8 @@ class MPieceTests(unittest.TestCase):
 		renderer = renderer or TestRenderer()
 		text = markdown(text, lexer=lexer, renderer=renderer)
 
-		html = self.transform_text(html)
-		text = self.transform_text(text)
+		html = transform_text(html)
+		text = transform_text(text)
 		self.assertEqual(text, html)
 
 	def test_styles(self):
@@ -101,5 +148,1113 @@ class MPieceTests(unittest.TestCase):
 	def test_utf_characters(self):
 		self.compare('test_utf_characters.html', 'test_utf_characters.md')
 
+	def test_null_character(self):
+		text = u'\u00e1 x\x00y'
+		self.assertEqual(transform_text(markdown(text)), u'<p>\u00e1 x\ufffdy</p>')
+		if sys.version_info[0] == 2:
+			# The byte strings keep their type.
+			self.assertEqual(
+				transform_text(markdown(text.encode('utf-8'))), u'<p>\u00e1 x\ufffdy</p>'.encode('utf-8')
+			)
+
 	def test_escape_metachars(self):
 		self.compare('test_escape_metachars.html', 'test_escape_metachars.md')
+
+	def test_footnotes_in_same_line(self):
+		text = transform_text(markdown('a[^x] b[^y]\n\n[^x]: X\n[^y]: Y\n'))
+		self.assertEqual(text, '<p>aX bY</p>')
+
+	def test_link_text_with_bracket(self):
+		# The brackets of the link text must be balanced.
+		text = transform_text(markdown('[a [b](c) [d](e "t (x)")'))
+		self.assertEqual(text, '<p>[a<a href="c">b</a><a href="e" title="t (x)">d</a></p>')
+
+	def test_link_balanced_brackets(self):
+		text = transform_text(markdown('[x](http://e.com/q?a[]=1)'))
+		self.assertEqual(text, '<p><a href="http://e.com/q?a[]=1">x</a></p>')
+
+		text = transform_text(markdown('see [the [draft] spec](http://x.com/a)'))
+		self.assertEqual(text, '<p>see<a href="http://x.com/a">the [draft] spec</a></p>')
+
+		text = transform_text(markdown('![img [1]](a.png)'))
+		self.assertEqual(text, '<p><img src="a.png" alt="img [1]"></p>')
+
+	def test_deep_nesting(self):
+		level = sys.getrecursionlimit() + 100
+		text = transform_text(markdown('> ' * level + 'text'))
+		self.assertEqual(text, '<blockquote>' * level + '<p>text</p>' + '</blockquote>' * level)
+
+	def test_literal_regex(self):
+		regex = re.compile(
+			r'(?<![ ])[ ]*`{3}[ ]*(?P<lang>[^\n"`]+?)?(?: ?(?!\\)"(?P<title>[^\n`]+)(?!\\)")?\n(?P<code>.*?)\n[ ]*`{3}',
+			re.S
+		)
+		texts = [
+			'```\n```', '```\n\n```', ' ```py\na\n  ```', 'a ```\nb\n```', '````\na\n```', '```"t"\n```\n```',
+			'a```b\nc\n```', '```\na\n```b\n```\nc```', '  \n ```"a\\"\nb\n```'
+		]
+		for text in texts:
+			self.assertEqual(
+				[mo.groupdict() for mo in Lexer.regex_fenced_code.finditer(text)],
+				[mo.groupdict() for mo in regex.finditer(text)]
+			)
+
+		# The arguments of the compiled regular expressions.
+		text = 'a\n```\nb\n```\n ```py\nc\n```\n```\nd\n```'
+		for pos, endpos in ((0, None), (3, None), (1, 20), (5, 100), (0, 13)):
+			self.assertEqual(
+				[mo.span() for mo in Lexer.regex_fenced_code.finditer(text, pos, endpos)],
+				[mo.span() for mo in regex.finditer(text, pos, len(text) if endpos is None else endpos)]
+			)
+
+		for repl in ('<\\g<code>>', lambda mo: mo.group('code').upper()):
+			for count in (0, 1, 2):
+				self.assertEqual(Lexer.regex_fenced_code.sub(repl, text, count), regex.sub(repl, text, count))
+
+
+class HighlightTests(unittest.TestCase):
+	def test_highlight(self):
+		renderer = HtmlRenderer(highlighter=Highlighter())
+		text = markdown('```py\nreturn "<a>" # end\n```', renderer=renderer)
+		self.assertEqual(text.strip(), (
+			'<pre class="lang-py"><span class="hl-keyword">return</span> <span class="hl-string">&quot;&lt;a&gt;&quot;'
+			'</span> <span class="hl-comment"># end</span></pre>'
+		))
+
+	def test_unknown_language(self):
+		renderer = HtmlRenderer(highlighter=Highlighter())
+		self.assertEqual(markdown('```cobol\na < b\n```', renderer=renderer).strip(), '<pre>a &lt; b</pre>')
+		self.assertEqual(markdown('```\na < b\n```', renderer=renderer).strip(), '<pre>a &lt; b</pre>')
+
+	def test_cache(self):
+		highlighter = Highlighter(cache_size=1)
+		renderer = HtmlRenderer(highlighter=highlighter)
+		for lang in ('python', 'python', 'js', 'python'):
+			markdown('```%s\nx = 1\n```' % lang, renderer=renderer)
+
+		self.assertEqual(highlighter.cache.info(), {'hits': 1, 'misses': 3, 'size': 1, 'maxsize': 1})
+
+	def test_case_insensitive(self):
+		self.assertEqual(Highlighter()('Select 1 FROM t', 'sql'), (
+			'<span class="hl-keyword">Select</span> <span class="hl-number">1</span> '
+			'<span class="hl-keyword">FROM</span> t'
+		))
+
+	def test_non_ascii(self):
+		highlighter = Highlighter()
+		self.assertEqual(highlighter(u'x = "\xe9\ud800"', 'py'), (
+			u'x = <span class="hl-string">&quot;\xe9\ud800&quot;</span>'
+		))
+
+	@unittest.skipIf(sys.version_info[0] > 2, 'the code is unicode text in python 3')
+	def test_encoded_code(self):
+		# The str code of python 2 is hashed without encode it.
+		highlighter = Highlighter()
+		self.assertEqual(highlighter('x = "\xc3\xa9"', 'py'), 'x = <span class="hl-string">&quot;\xc3\xa9&quot;</span>')
+		self.assertEqual(highlighter.cache.info()['misses'], 1)
+
+
+class DocumentTests(unittest.TestCase):
+	def test_serialize(self):
+		for text in get_corpus_texts():
+			document = loads(lex(text).dumps(), lexer=Lexer())
+			self.assertEqual(document.render(TestRenderer()), markdown(text, renderer=TestRenderer()))
+			self.assertEqual(document.render(HtmlRenderer()), markdown(text))
+
+	def test_round_trip(self):
+		# The json module returns unicode texts in python 2.
+		text = u'# T\u00edtulo\n\n*a* [b](c "d") ![e](f)\n\n* \u00fc\n\n```py\nx\n```\n'
+		document = loads(lex(text).dumps())
+		self.assertEqual(document.render(HtmlRenderer()), markdown(text))
+		renderer = PlainTextRenderer()
+		self.assertEqual(loads(document.dumps()).render(renderer), markdown(text, renderer=renderer))
+
+	def test_invalid_document(self):
+		data = lex('*text*').dumps()
+		self.assertRaises(InvalidDocumentException, loads, b'text')
+		self.assertRaises(InvalidDocumentException, loads, data[:3] + b'\x00' + data[4:])
+		self.assertRaises(InvalidDocumentException, loads, data[:-2])
+		self.assertRaises(InvalidDocumentException, loads, data, Lexer(exclude={'bold'}))
+
+	def test_invalid_tokens(self):
+		for token in ('["bold", "a", [1, 2]]', '[1, "a", {}]', '["bold", 1, {}]', '["bold", "a"]'):
+			payload = '["x", "////TOKENMDA//0////", [%s]]' % token
+			data = b'MPD\x01' + zlib.compress(payload.encode('utf-8'))
+			self.assertRaises(InvalidDocumentException, loads, data)
+
+
+class MetadataTests(unittest.TestCase):
+	def test_unicode(self):
+		collector = MetadataCollector()
+		markdown(u'# T\u00edtulo **\u00fcber**\n\ncaf\u00e9 [a](b)', collector=collector)
+		self.assertEqual(collector.headers, [
+			{'level': 1, 'text': u'T\u00edtulo \u00fcber', 'slug': u't\u00edtulo-\u00fcber'}
+		])
+		self.assertEqual(collector.links, [{'href': 'b', 'title': None, 'text': 'a'}])
+		self.assertEqual(collector.words, 4)
+
+	def test_metadata(self):
+		collector = MetadataCollector()
+		text = (
+			'# Title **one**\n\nText [link *a*](http://a.com "T") and ![alt](img.png) `code a`[^n]\n\n'
+			'Title one\n---------\n\n[^n]: Note text.\n'
+		)
+		result = markdown(text, collector=collector)
+
+		self.assertEqual(result, markdown(text))
+		self.assertEqual(collector.as_dict(), {
+			'headers': [
+				{'level': 1, 'text': 'Title one', 'slug': 'title-one'},
+				{'level': 2, 'text': 'Title one', 'slug': 'title-one-1'},
+			],
+			'links': [{'href': 'http://a.com', 'title': 'T', 'text': 'link a'}],
+			'images': [{'src': 'img.png', 'alt': 'alt', 'title': None}],
+			'footnotes': ['n'],
+			'words': 12,
+			'characters': 45,
+		})
+
+	def test_count(self):
+		collector = MetadataCollector()
+		markdown(
+			'a**b** c\n\n| x | y |\n|---|---|\n| z | w |\n\n* i1\n* i2\n\n```\nnot counted\n```',
+			collector=collector
+		)
+		self.assertEqual((collector.words, collector.characters), (8, 11))
+
+	def test_document_order(self):
+		collector = MetadataCollector()
+		markdown('B\n---\n\n# A\n\n[2](b) [1](a)\n\n# C', collector=collector)
+		self.assertEqual([header['text'] for header in collector.headers], ['B', 'A', 'C'])
+		self.assertEqual([link['href'] for link in collector.links], ['b', 'a'])
+
+	def test_lex_after_parse(self):
+		collector = MetadataCollector()
+		mpiece = MPiece()
+		mpiece.parse('# a', Lexer(), HtmlRenderer(), collector)
+		mpiece.lex('# b', Lexer())
+		self.assertEqual(collector.headers, [{'level': 1, 'text': 'a', 'slug': 'a'}])
+
+	def test_reset(self):
+		collector = MetadataCollector()
+		markdown('# a\n\nb c', collector=collector)
+		markdown('# a', collector=collector)
+		self.assertEqual(collector.words, 1)
+		self.assertEqual(collector.headers, [{'level': 1, 'text': 'a', 'slug': 'a'}])
+
+
+class PlainTextTests(unittest.TestCase):
+	text = (
+		u'# Title\n\n**Bold** <b>and</b> [link *a*](http://a.com) ![img](a.png) `code <i>` &amp; x\x00y\n\n'
+		u'* item 1\n* item 2\n\n| a | b |\n|---|---|\n| c | d |\n\n```python\nx = <div>  1\n```\n'
+	)
+
+	def test_plain_text(self):
+		self.assertEqual(
+			markdown(self.text, renderer=PlainTextRenderer()),
+			u'Title\n\nBold and link a code <i> & x\ufffdy\n\nitem 1\n\nitem 2\n\na b\n\nc d\n\nx = <div>  1'
+		)
+
+	def test_options(self):
+		renderer = PlainTextRenderer(include_code=False, block_separator='\n', cell_separator='|')
+		self.assertEqual(
+			markdown(self.text, renderer=renderer),
+			u'Title\nBold and link a & x\ufffdy\nitem 1\nitem 2\na|b\nc|d'
+		)
+
+	def test_subclass(self):
+		class CustomRenderer(PlainTextRenderer):
+			def render_bold(self, text):
+				return text.upper()
+
+		self.assertEqual(markdown('**bold** *italic*', renderer=CustomRenderer()), 'BOLD italic')
+
+
+class LowMemoryTests(unittest.TestCase):
+	def setUp(self):
+		self.text = '\n\n'.join(get_corpus_texts()) * 10
+
+	def get_peak(self, **kwargs):
+		tracemalloc.start()
+		try:
+			output = markdown(self.text, **kwargs)
+			peak = tracemalloc.get_traced_memory()[1]
+		finally:
+			tracemalloc.stop()
+
+		return output, peak
+
+	def test_same_output(self):
+		output = markdown(self.text)
+		self.assertEqual(markdown(self.text, low_memory=True), output)
+
+		collector = MetadataCollector()
+		low_memory_collector = MetadataCollector()
+		text = '# Title **bold *it* x**\n\n[link **a *b***](http://x)\n\n' + self.text
+		self.assertEqual(markdown(text, collector=collector), markdown(
+			text, low_memory=True, collector=low_memory_collector
+		))
+		self.assertEqual(low_memory_collector.as_dict(), collector.as_dict())
+		self.assertEqual(collector.headers[0]['text'], 'Title bold it x')
+		self.assertEqual(collector.links[0]['text'], 'link a b')
+		self.assertEqual(markdown(self.text, renderer=TestRenderer(), low_memory=True), markdown(
+			self.text, renderer=TestRenderer()
+		))
+
+	def test_token_str_in_text(self):
+		text = 'a ////TOKENMDA//0//// b **c**\n\n> ////TOKENMDA//1////'
+		output = markdown(text)
+		self.assertEqual(markdown(text, low_memory=True), output)
+		self.assertEqual(transform_text(output), (
+			'<p>a ////TOKENMDA//0//// b<strong>c</strong></p><blockquote><p>////TOKENMDA//1////</p></blockquote>'
+		))
+
+	@unittest.skipIf(tracemalloc is None, 'tracemalloc is not available')
+	def test_peak_memory(self):
+		output, peak = self.get_peak(low_memory=True)
+		self.assertLess(peak, 8 * len(output))
+
+		output, normal_peak = self.get_peak()
+		self.assertLess(peak * 3, normal_peak)
+
+
+class ParallelTests(unittest.TestCase):
+	def setUp(self):
+		self.text = '\n\n'.join(get_corpus_texts())
+
+	def test_same_output(self):
+		text = '\n\n'.join([self.text] * 3) + '\n\n[a][b]\n\n[b]: http://b.com'
+		with ParallelMarkdown(processes=2, group_size=100) as parallel_markdown:
+			self.assertEqual(parallel_markdown(text), markdown(text))
+
+		renderer = PlainTextRenderer()
+		with ParallelMarkdown(renderer=renderer, processes=2, group_size=100) as parallel_markdown:
+			self.assertEqual(parallel_markdown(text), markdown(text, renderer=renderer))
+
+	def test_split_blocks(self):
+		lexer = Lexer()
+		text = 'a\n\n```\nb\n\nc\n```\n\n| d |\n|---|\n| e |\n\n2. f\n\n---\n\ng\n'
+		self.assertEqual(lexer.split_blocks(text, 1), [
+			'a\n\n', '```\nb\n\nc\n```\n\n', '| d |\n|---|\n| e |\n\n2. f\n\n---\n\n', 'g\n'
+		])
+
+		text = '```\nb\n``` **c\n\nd**\n\ne'
+		self.assertEqual(lexer.split_blocks(text, 1), [text])
+		self.assertEqual(Lexer(exclude={'new_line'}).split_blocks('a\n\nb', 1), ['a\n\nb'])
+
+
+class PickleTests(unittest.TestCase):
+	text = '# Title\n\n**bold** *italic* [link](http://a.com)\n\n```python\nreturn None\n```'
+
+	def test_lexer(self):
+		lexer = Lexer(exclude={'bold'}, tab_size=2)
+		data = pickle.dumps(lexer)
+		self.assertNotIn(b'parse_bold', data)
+
+		loaded = pickle.loads(data)
+		self.assertEqual(loaded.exclude, {'bold'})
+		self.assertEqual(sorted(loaded.all_parse_func), sorted(lexer.all_parse_func))
+		self.assertIs(loaded.all_parse_func['header'].__self__, loaded)
+		self.assertEqual(markdown(self.text, lexer=loaded), markdown(self.text, lexer=lexer))
+
+	def test_renderer(self):
+		renderer = HtmlRenderer(use_paragraph=False, highlighter=Highlighter())
+		markdown(self.text, renderer=renderer)
+		loaded = pickle.loads(pickle.dumps(renderer))
+
+		self.assertIs(loaded.all_render_funcs['bold'].__self__, loaded)
+		self.assertEqual(len(loaded.highlighter.cache), 0)
+		self.assertEqual(markdown(self.text, renderer=loaded), markdown(self.text, renderer=renderer))
+
+		renderer = PlainTextRenderer(include_code=False)
+		loaded = pickle.loads(pickle.dumps(renderer))
+		self.assertEqual(markdown(self.text, renderer=loaded), markdown(self.text, renderer=renderer))
+
+	def test_exceptions(self):
+		for exception in [RenderFunctionNotFoundException('bold', 'HtmlRenderer'), InvalidDocumentException('x')]:
+			loaded = pickle.loads(pickle.dumps(exception))
+			self.assertIs(type(loaded), type(exception))
+			self.assertEqual(str(loaded), str(exception))
+
+	def test_prepare_fork(self):
+		lexer, renderer = prepare_fork(freeze=False)
+		self.assertEqual(markdown(self.text, lexer, renderer), markdown(self.text))
+
+
+class EventHandler(Handler):
+	def __init__(self):
+		self.events = []
+
+	def start(self, element, extras):
+		self.events.append(('start', element, extras))
+
+	def text(self, chunk):
+		self.events.append(chunk)
+
+	def end(self, element):
+		self.events.append(('end', element))
+
+
+class EventTests(unittest.TestCase):
+	def test_events(self):
+		handler = EventHandler()
+		walk('# a **b**\n\ntext `c` [l](h) ////TOKENMDA//0////', handler)
+		self.assertEqual(handler.events, [
+			'\n', ('start', 'header', {'level': 1}), 'a ', ('start', 'bold', {}), 'b', ('end', 'bold'),
+			('end', 'header'), '\n\n', ('start', 'new_line', {}), 'text ', ('start', 'code_inline', {'code': 'c'}),
+			('end', 'code_inline'), ' ', ('start', 'link', {'title': None, 'href': 'h'}), 'l', ('end', 'link'),
+			' ////TOKENMDA//0////', ('end', 'new_line'), '\n\n',
+		])
+
+	def test_document(self):
+		text = '> a\n>\n> * b\n\n| c |\n|---|\n| d |'
+		handler = EventHandler()
+		walk(text, handler)
+		document_handler = EventHandler()
+		lex(text).walk(document_handler)
+		self.assertEqual(document_handler.events, handler.events)
+
+	def test_deep_nesting(self):
+		handler = EventHandler()
+		level = sys.getrecursionlimit() + 100
+		walk('> ' * level + 'text', handler)
+		self.assertEqual([e[1] for e in handler.events if isinstance(e, tuple)].count('blockquote'), level * 2)
+		self.assertIn('text', handler.events)
+
+
+class BytesTests(unittest.TestCase):
+	def setUp(self):
+		self.text = '\n\n'.join(get_corpus_texts()) + u'\n\n\u00e1 **\u00fc**'
+
+	def test_same_output(self):
+		data = self.text.encode('utf-8')
+		self.assertEqual(markdown_bytes(data), markdown(self.text).encode('utf-8'))
+		self.assertEqual(markdown_bytes(b'\xef\xbb\xbf' + data), markdown(self.text).encode('utf-8'))
+
+		renderer = PlainTextRenderer()
+		self.assertEqual(
+			markdown_bytes(data, renderer=renderer), markdown(self.text, renderer=renderer).encode('utf-8')
+		)
+
+	def test_chunks(self):
+		data = self.text.encode('utf-16')
+		chunks = list(iter_markdown_bytes(data, encoding='utf-16', chunk_size=100))
+		self.assertGreater(len(chunks), 1)
+		self.assertEqual(u''.join(chunk.decode('utf-16') for chunk in chunks), markdown(self.text))
+
+		chunks = list(iter_markdown_bytes(data, renderer=PlainTextRenderer(), encoding='utf-16', chunk_size=100))
+		self.assertEqual(len(chunks), 1)
+
+	def test_errors(self):
+		self.assertRaises(UnicodeDecodeError, markdown_bytes, b'a\xff')
+		self.assertEqual(markdown_bytes(b'a\xff', errors='replace').strip(), u'<p>a\ufffd</p>'.encode('utf-8'))
+
+
+class MemoTests(unittest.TestCase):
+	def setUp(self):
+		self.text = '\n\n'.join(get_corpus_texts())
+		self.table = '| a | b |\n|---|---|\n' + '| **x** | [y](http://y) |\n| z | [y](http://y) |\n' * 10
+
+	def test_same_output(self):
+		for text in [self.text, self.table, '> ' * 60 + '**a** **a**\n']:
+			output = markdown(text)
+			self.assertEqual(markdown(text, memo=FragmentMemo()), output)
+			self.assertEqual(markdown(text, low_memory=True, memo=FragmentMemo()), output)
+			self.assertEqual(markdown(text, renderer=PlainTextRenderer(), memo=FragmentMemo()), markdown(
+				text, renderer=PlainTextRenderer()
+			))
+
+	def test_hits(self):
+		memo = FragmentMemo()
+		markdown(self.table, memo=memo)
+		info = memo.info()
+		# Header cells, 3 different body cells and the bold and the link inside of them.
+		self.assertEqual(info['misses'], 7)
+		self.assertEqual(info['hits'], 37)
+		self.assertEqual(info['elements'], {'table_body_cell': 37})
+
+		markdown(self.table, memo=memo)
+		self.assertEqual(memo.info()['hits'], 74)
+		memo.reset()
+		self.assertEqual(memo.info(), {'hits': 0, 'misses': 0, 'size': 0, 'elements': {}})
+
+	def test_elements(self):
+		memo = FragmentMemo(['link'])
+		output = markdown(self.table, memo=memo)
+		self.assertEqual(output, markdown(self.table))
+		self.assertEqual(memo.info()['elements'], {'link': 19})
+
+
+class CompiledTests(unittest.TestCase):
+	def setUp(self):
+		self.texts = get_corpus_texts()
+		self.texts.append('> ' * 60 + '**a** [b](c)\n\n' + '* ' * 50 + 'd')
+
+	def test_same_output(self):
+		configurations = [
+			{}, {'renderer': TestRenderer()}, {'renderer': PlainTextRenderer()},
+			{'lexer': Lexer(exclude={'ulist', 'link'})}, {'low_memory': True}, {'memo': FragmentMemo()}
+		]
+		for kwargs in configurations:
+			compiled_markdown = CompiledMarkdown(**kwargs)
+			for text in self.texts:
+				self.assertEqual(compiled_markdown(text), markdown(text, **kwargs))
+
+	def test_threads(self):
+		compiled_markdown = CompiledMarkdown()
+		copy = compiled_markdown.mpiece.copy()
+		self.assertIs(copy.parse_funcs, compiled_markdown.mpiece.parse_funcs)
+		self.assertIsNot(copy, compiled_markdown.mpiece)
+
+		texts = self.texts * 4
+		results = [None] * len(texts)
+
+		def render(i):
+			results[i] = compiled_markdown(texts[i])
+
+		threads = [threading.Thread(target=render, args=(i,)) for i in range(len(texts))]
+		for thread in threads:
+			thread.start()
+
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(results, [markdown(text) for text in texts])
+
+	def test_exclude(self):
+		compiled_markdown = CompiledMarkdown(Lexer(exclude={'bold'}))
+		self.assertNotIn('regex_bold', compiled_markdown.mpiece.source)
+		self.assertEqual(compiled_markdown('**a** *b*').strip(), '<p>**a** <em>b</em></p>')
+
+	def test_changed_regex(self):
+		class StarLexer(Lexer):
+			regex_bold = re.compile(r'\+\+(?P<text>[^+]+)\+\+')
+
+		compiled_markdown = CompiledMarkdown(StarLexer())
+		self.assertEqual(compiled_markdown('++a++').strip(), '<p><strong>a</strong></p>')
+		self.assertEqual(compiled_markdown('++a++', collector=MetadataCollector()), markdown('++a++', StarLexer()))
+
+
+class PreviewTests(unittest.TestCase):
+	def setUp(self):
+		self.text = '# Title\n\nFirst **para** here.\n\n* a\n* b\n\n```py\nx\n\ny\n```\n\nLast.\n'
+		self.preview_size = MPiece.PREVIEW_SIZE
+
+	def tearDown(self):
+		MPiece.PREVIEW_SIZE = self.preview_size
+
+	def test_max_blocks(self):
+		text, truncated = markdown_preview(self.text, max_blocks=2)
+		self.assertTrue(truncated)
+		self.assertEqual(transform_text(text), '<h1>Title</h1><p>First<strong>para</strong>here.</p>')
+
+		text, truncated = markdown_preview(self.text, max_blocks=4)
+		self.assertEqual(transform_text(text).count('<pre>'), 1)
+		self.assertEqual(markdown_preview(self.text, max_blocks=5), (markdown(self.text), False))
+
+	def test_max_chars(self):
+		text, truncated = markdown_preview(self.text, max_chars=30)
+		self.assertEqual(transform_text(text), '<h1>Title</h1><p>First<strong>para</strong>here.</p>')
+
+		text, truncated = markdown_preview('word ' * 100 + '**a b**', max_chars=12)
+		self.assertEqual((text.strip(), truncated), ('<p>word word</p>', True))
+
+		text, truncated = markdown_preview('```py\n' + 'line one\n' * 100 + '```\n', max_chars=30)
+		self.assertEqual(text.strip(), '<pre>line one\nline one</pre>')
+
+	def test_first_lines(self):
+		# The text is read by 7 characters.
+		texts = [self.text, '> a\n> b\n\nc', '| a |\n|---|\n| b |\n\nc', '```\na\n\nb\n```\n\nc\n\nd', 'a\n\n\n\n\n']
+		for text in texts:
+			for max_blocks in range(4):
+				MPiece.PREVIEW_SIZE = self.preview_size
+				result = markdown_preview(text, max_blocks=max_blocks)
+				MPiece.PREVIEW_SIZE = 7
+				self.assertEqual(markdown_preview(text, max_blocks=max_blocks), result)
+
+	def test_long_text(self):
+		text = 'Paragraph **bold** text.\n\n' * 100000
+		start = default_timer()
+		markdown_preview(text, max_blocks=2)
+		long_time = default_timer() - start
+		start = default_timer()
+		markdown(text[:10000])
+		self.assertLess(long_time, default_timer() - start)
+
+
+class SanitizerTests(unittest.TestCase):
+	def setUp(self):
+		self.renderer = HtmlRenderer(escape_html=False, sanitizer=HtmlSanitizer())
+
+	def transform_text(self, text, renderer=None):
+		return transform_text(markdown(text, renderer=renderer or self.renderer))
+
+	def test_tags(self):
+		self.assertEqual(self.transform_text('<b onclick="x()">a</b><script>b</script>'), (
+			'<p><b>a</b>&lt;script&gt;b&lt;/script&gt;</p>'
+		))
+		self.assertEqual(self.transform_text('<IMG SRC=a.png alt=\'"x"\' width=2 /> a > b <!-- c -->'), (
+			'<p><img src="a.png" alt="&quot;x&quot;" width="2" />a &gt; b &lt;!-- c --&gt;</p>'
+		))
+		self.assertEqual(self.transform_text('| <i>a</i> | <x> |\n|---|---|\n| "b | c |'), (
+			'<table><thead><tr><th><i>a</i></th><th>&lt;x&gt;</th></tr></thead>'
+			'<tbody><tr><td>&quot;b</td><td>c</td></tr></tbody></table>'
+		))
+
+	def test_urls(self):
+		text = '<a href="http://a.com?a=1&amp;b=2">a</a><a href=" java&#09;script:x">b</a><a href=/c>c</a>'
+		self.assertEqual(self.transform_text(text), (
+			'<p><a href="http://a.com?a=1&amp;b=2">a</a><a>b</a><a href="/c">c</a></p>'
+		))
+		self.assertEqual(self.transform_text('[a](ftp://b) [c](JavaScript:d) ![e](data:f)'), (
+			'<p><a href="ftp://b">a</a><a href="">c</a><img src="" alt="e"></p>'
+		))
+
+		renderer = HtmlRenderer(escape_html=False, sanitizer=HtmlSanitizer(schemes=None))
+		self.assertEqual(self.transform_text('<a href="irc://a">a</a><a href="data:b">b</a>', renderer), (
+			'<p><a href="irc://a">a</a><a>b</a></p>'
+		))
+
+	def test_attributes(self):
+		# The values of the attributes are always escaped, because the html of the sanitizer would close them.
+		text = '![<a title=" onerror=alert(1) x=">](a.png "<b>t</b>") [<b>c</b>](d "<i>\'e\'</i>")'
+		expected = (
+			'<p><img src="a.png" alt="&lt;a title=&quot; onerror=alert(1) x=&quot;&gt;" '
+			'title="&lt;b&gt;t&lt;/b&gt;"><a href="d" title="&lt;i&gt;&#39;e&#39;&lt;/i&gt;"><b>c</b></a></p>'
+		)
+		self.assertEqual(self.transform_text(text), expected)
+		self.assertEqual(self.transform_text(text, HtmlRenderer(escape_html=False)), expected)
+
+	def test_allowlists(self):
+		sanitizer = HtmlSanitizer(tags=['A', 'x'], attributes={'*': ['id'], 'x': ['y']}, schemes=['irc'])
+		renderer = HtmlRenderer(escape_html=False, sanitizer=sanitizer)
+		self.assertEqual(self.transform_text('<x y=1 id=2 z=3><a href="irc://a" id=b>c</a><b>', renderer), (
+			'<p><x y="1" id="2"><a id="b">c</a>&lt;b&gt;</p>'
+		))
+
+	def test_tokens_in_tags(self):
+		# The rendered children can't be joined inside of a tag.
+		self.assertEqual(self.transform_text('<a title="**x" onerror="y**">z</a>'), (
+			'<p>&lt;a title=&quot;<strong>x&quot; onerror=&quot;y</strong>&quot;&gt;z</a></p>'
+		))
+		self.assertEqual(self.transform_text('*<a* href="x">b*'), '<p><em>&lt;a</em>href=&quot;x&quot;&gt;b*</p>')
+
+	def test_linear_time(self):
+		sanitizer = HtmlSanitizer()
+		for make_text in [lambda n: '<a title="' * n, lambda n: '<a' + ' b=c' * n, lambda n: '<' * n]:
+			times = []
+			for size in (5000, 20000):
+				text = make_text(size)
+				start = default_timer()
+				sanitizer(text, self.renderer.escape_link)
+				times.append(default_timer() - start)
+
+			self.assertLess(times[1], times[0] * 16)
+
+
+class ReferenceTests(unittest.TestCase):
+	def transform_text(self, text, lexer=None):
+		return transform_text(markdown(text, lexer))
+
+	def test_references(self):
+		text = (
+			'[a][Docs] [b][] ![c][img] [d][none] [e](f)\n\n'
+			'[docs]: http://a.com/x_(y) "Title"\n'
+			'  [B]: <http://b.com/c d> (It\'s "b")\n'
+			'[img]: /i.png \'Image\'\n'
+			'[docs]: http://other.com\n'
+		)
+		result = (
+			'<p><a href="http://a.com/x_(y)" title="Title">a</a><a href="http://b.com/c d" '
+			'title="It&#39;s &quot;b&quot;">b</a><img src="/i.png" alt="c" title="Image">[d][none]'
+			'<a href="f">e</a></p>'
+		)
+		self.assertEqual(self.transform_text(text), result)
+		self.assertEqual(transform_text(CompiledMarkdown()(text)), result)
+
+	def test_code(self):
+		text = (
+			'`[a][b]` [a][b]\n\n```\n[b]: http://code.com\n```\n\n`x\n[c]: http://span.com` [c][]\n\n'
+			'[b]: http://b.com\n'
+		)
+		self.assertEqual(self.transform_text(text), (
+			'<p><code>[a][b]</code><a href="http://b.com">a</a></p><pre>[b]: http://code.com</pre>'
+			'<p><code>x [c]: http://span.com</code>[c][]</p>'
+		))
+
+	def test_not_definitions(self):
+		self.assertEqual(self.transform_text('[a]: http://a.com'), '')
+		self.assertEqual(self.transform_text('a [a]: http://a.com'), '<p>a [a]: http://a.com</p>')
+		self.assertEqual(self.transform_text('[a][^1] [a]\n\n[a]: b\n[^1]: c'), '<p>[a]c [a]</p>')
+		self.assertEqual(self.transform_text('[a][a]\n\n[a]: b', Lexer(exclude={'references'})), (
+			'<p>[a][a]</p><p>[a]: b</p>'
+		))
+
+	def test_custom_order(self):
+		class OldLexer(Lexer):
+			def define_order(self):
+				# The default inline order before the references.
+				self.order_inline = [
+					'escape_backslash', 'code_inline', 'image', 'link', 'bold', 'italic', 'bold', 'underline', 'strike'
+				]
+				super(OldLexer, self).define_order()
+
+		lexer = OldLexer()
+		self.assertEqual(lexer.order_bold, ['italic', 'underline', 'strike'])
+		self.assertEqual(self.transform_text('**[a](b)** [c][d]\n\n[d]: e', lexer), (
+			'<p><strong><a href="b">a</a></strong>[c][d]</p>'
+		))
+
+	def test_metadata(self):
+		collector = MetadataCollector()
+		markdown('[a][b]\n\n[b]: http://c "d"', collector=collector)
+		self.assertEqual(collector.links, [{'href': 'http://c', 'title': 'd', 'text': 'a'}])
+
+
+def cdn_rewriter(url, kind):
+	if kind == 'image' and not url.startswith('http'):
+		return 'https://cdn.example.com/' + url
+
+	return url
+
+
+class UrlRewriteTests(unittest.TestCase):
+	def test_rewrite(self):
+		calls = []
+
+		def rewriter(url, kind):
+			calls.append((url, kind))
+			return cdn_rewriter(url, kind)
+
+		renderer = HtmlRenderer(url_rewriter=rewriter)
+		text = '[a](a.png) ![b](a.png) [c](a.png) ![d](a.png "t") ![e](http://a.com/e.png)'
+		self.assertEqual(
+			transform_text(markdown(text, renderer=renderer)),
+			transform_text(markdown(
+				'[a](a.png) ![b](https://cdn.example.com/a.png) [c](a.png) ![d](https://cdn.example.com/a.png "t") '
+				'![e](http://a.com/e.png)'
+			))
+		)
+		self.assertEqual(sorted(calls), [('a.png', 'image'), ('a.png', 'link'), ('http://a.com/e.png', 'image')])
+		self.assertEqual(renderer.url_cache.info(), {'hits': 2, 'misses': 3, 'size': 3, 'maxsize': 1024})
+
+		markdown(text, renderer=renderer)
+		self.assertEqual(len(calls), 3)
+		self.assertEqual(renderer.url_cache.info()['hits'], 7)
+
+	def test_checked(self):
+		renderer = HtmlRenderer(url_rewriter=lambda url, kind: 'javascript:alert(1)' if url == 'x' else url + '?a&b')
+		self.assertEqual(
+			transform_text(markdown('[a](x) [b](y)', renderer=renderer)),
+			transform_text('<p><a href="">a</a> <a href="y?a&amp;b">b</a></p>')
+		)
+
+		renderer = HtmlRenderer(url_rewriter=lambda url, kind: None, url_cache_size=1)
+		self.assertEqual(
+			transform_text(markdown('[a](x) [b](y) [c](x)', renderer=renderer)),
+			transform_text('<p><a href="">a</a> <a href="">b</a> <a href="">c</a></p>')
+		)
+		self.assertEqual(renderer.url_cache.info(), {'hits': 0, 'misses': 3, 'size': 1, 'maxsize': 1})
+
+	def test_pickle(self):
+		renderer = HtmlRenderer(url_rewriter=cdn_rewriter, url_cache_size=10)
+		markdown('![a](a.png)', renderer=renderer)
+		copy = pickle.loads(pickle.dumps(renderer))
+		self.assertEqual(copy.url_cache.info(), {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 10})
+		self.assertEqual(markdown('![a](a.png)', renderer=copy), markdown('![a](a.png)', renderer=renderer))
+
+
+class SectionTests(unittest.TestCase):
+	text = (
+		'Intro[^a]\n\n# Title *one*\n\ntext [ref][] b[^b]\n\n```\n# code\n```\n\nSub\n---\n\nsub\n\n'
+		'## Sub *two*\n\nx\n\n# Title one\n\ny[^a]\n\n* # list\n\n[ref]: http://r.com\n[^a]: note A [^b]\n'
+		'[^b]: note B\n'
+	)
+
+	def test_index(self):
+		index = SectionIndex(self.text)
+		self.assertEqual([(s['index'], s['level'], s['title'], s['slug']) for s in index.sections], [
+			(0, 1, 'Title one', 'title-one'), (1, 2, 'Sub', 'sub'), (2, 2, 'Sub two', 'sub-two'),
+			(3, 1, 'Title one', 'title-one-1'),
+		])
+		self.assertEqual(index.sections[0]['end'], index.sections[3]['start'])
+		self.assertEqual(index.sections[1]['end'], index.sections[2]['start'])
+		self.assertEqual(index.find('sub-two'), index.find(2))
+		self.assertEqual(index.find(-1), index.sections[3])
+		self.assertRaises(KeyError, index.find, 'none')
+		self.assertRaises(KeyError, index.find, 4)
+
+		slugs = [s['slug'] for s in SectionIndex('a\n===\n\n# a\n\n## [b](c) ![d](e)\n').sections]
+		self.assertEqual(slugs, ['a', 'a-1', 'b-d'])
+		self.assertEqual(SectionIndex('# a\n', Lexer(exclude={'header'})).sections, [])
+
+	def test_render(self):
+		index = SectionIndex(self.text)
+		self.assertEqual(
+			transform_text(index.render('title-one')),
+			transform_text(markdown(
+				'# Title *one*\n\ntext [ref](http://r.com) bnote B\n\n```\n# code\n```\n\n'
+				'Sub\n---\n\nsub\n\n## Sub *two*\n\nx'
+			))
+		)
+		self.assertEqual(
+			transform_text(index.render(3)),
+			transform_text(markdown('# Title one\n\nynote A note B\n\n* # list'))
+		)
+		self.assertEqual(
+			transform_text(index.render_range('sub', 'title-one-1')),
+			transform_text(markdown('Sub\n---\n\nsub\n\n## Sub *two*\n\nx'))
+		)
+		self.assertEqual(
+			transform_text(index.render_range(None, 0)),
+			transform_text(markdown('Intronote A note B'))
+		)
+		self.assertEqual(index.render_range().split(), markdown(self.text).split())
+
+		renderer = PlainTextRenderer()
+		self.assertEqual(index.render('sub', renderer), markdown('Sub\n---\n\nsub', renderer=renderer))
+
+		collector = MetadataCollector()
+		index.render(0, collector=collector)
+		self.assertEqual([header['slug'] for header in collector.headers], ['title-one', 'sub', 'sub-two'])
+		self.assertEqual(pickle.loads(pickle.dumps(index)).render(1), index.render(1))
+
+	def test_blocks(self):
+		# The underlines taken by a list or after a blockquote are like in the full render.
+		text = 'a\n\n* list item\n---\n\nb\n\n> quote\n> more\n---\n\n# c\n'
+		index = SectionIndex(text)
+		collector = MetadataCollector()
+		markdown(text, collector=collector)
+		self.assertEqual([s['slug'] for s in index.sections], [header['slug'] for header in collector.headers])
+		self.assertEqual([s['slug'] for s in index.sections], ['quote-more', 'c'])
+		self.assertEqual(index.render_range(None, 0).split(), markdown('a\n\n* list item\n---\n\nb').split())
+		self.assertEqual(index.render(0).split(), markdown('> quote\n> more\n---').split())
+
+
+class GateRenderer(HtmlRenderer):
+	""" Renderer which waits for an event before it renders the ``gate`` paragraph. """
+
+	def __init__(self):
+		super(GateRenderer, self).__init__()
+		self.gate = threading.Event()
+		self.order = []
+
+	def render_new_line(self, text):
+		if text == 'gate':
+			self.gate.wait(5)
+
+		self.order.append(text)
+		return super(GateRenderer, self).render_new_line(text)
+
+
+class ServiceTests(unittest.TestCase):
+	def make_service(self, **kwargs):
+		renderer = GateRenderer()
+		markdown_object = Markdown()
+		markdown_object.renderer = renderer
+		service = RenderService(markdown_object, workers=1, **kwargs)
+		self.addCleanup(service.close)
+		self.addCleanup(renderer.gate.set)
+		del renderer.order[:]
+		return service, renderer
+
+	def submit_gate(self, service):
+		job = service.submit('gate')
+		while service.metrics()['running'] == 0:
+			time.sleep(0.001)
+
+		return job
+
+	def test_render(self):
+		with RenderService(workers=2) as service:
+			self.assertEqual(service.render('**a**'), markdown('**a**'))
+			renderer = PlainTextRenderer()
+			self.assertEqual(service('**a**', renderer=renderer), markdown('**a**', renderer=renderer))
+			metrics = service.metrics()
+
+		self.assertEqual((metrics['submitted'], metrics['completed'], metrics['queue_depth']), (2, 2, 0))
+		self.assertGreater(metrics['latency']['max'], 0)
+		self.assertRaises(ServiceClosedException, service.submit, 'a')
+
+	def test_coalesce_and_priority(self):
+		service, renderer = self.make_service()
+		gate = self.submit_gate(service)
+		jobs = [service.submit(text, priority=priority) for text, priority in (
+			('low', PRIORITY_LOW), ('normal', 1), ('high', PRIORITY_HIGH), ('low', PRIORITY_LOW), ('normal', 1),
+		)]
+		self.assertIs(jobs[0], jobs[3])
+		self.assertIs(jobs[1], jobs[4])
+		self.assertEqual(service.metrics()['queue_depth'], 3)
+
+		# A better priority moves the job forward.
+		self.assertIs(service.submit('low', priority=PRIORITY_HIGH), jobs[0])
+		renderer.gate.set()
+		self.assertEqual([job.result(5) for job in jobs], [
+			markdown(text) for text in ('low', 'normal', 'high', 'low', 'normal')
+		])
+		self.assertEqual(gate.result(5), markdown('gate'))
+		self.assertEqual(renderer.order, ['gate', 'high', 'low', 'normal'])
+		self.assertEqual(jobs[0].callers, 3)
+
+		metrics = service.metrics()
+		self.assertEqual((metrics['submitted'], metrics['coalesced'], metrics['completed']), (7, 3, 4))
+
+	def test_backpressure(self):
+		service, renderer = self.make_service(maxsize=1, backpressure='reject')
+		self.submit_gate(service)
+		service.submit('a')
+		# The identical texts don't need a place in the queue.
+		service.submit('a')
+		self.assertRaises(ServiceFullException, service.submit, 'b')
+
+		service, renderer = self.make_service(maxsize=1, backpressure='timeout', timeout=0.05)
+		self.submit_gate(service)
+		service.submit('a')
+		self.assertRaises(ServiceFullException, service.submit, 'b')
+		self.assertEqual(service.metrics()['rejected'], 1)
+
+		# The blocked callers continue when there is a free place.
+		service, renderer = self.make_service(maxsize=1)
+		self.submit_gate(service)
+		service.submit('a')
+		threading.Timer(0.05, renderer.gate.set).start()
+		self.assertEqual(service.render('b', timeout=5), markdown('b'))
+		self.assertRaises(ValueError, RenderService, backpressure='drop')
+
+	def test_shared_cache(self):
+		renderer = HtmlRenderer(url_rewriter=cdn_rewriter, url_cache_size=8)
+		markdown_object = Markdown()
+		markdown_object.renderer = renderer
+		texts = ['![a](%d.png) [b](%d.html)' % (i % 20, i) for i in range(200)]
+		with RenderService(markdown_object, workers=4, maxsize=200) as service:
+			jobs = [service.submit(text) for text in texts]
+			results = [job.result(5) for job in jobs]
+
+		self.assertEqual(results, [markdown(text, renderer=HtmlRenderer(url_rewriter=cdn_rewriter)) for text in texts])
+		info = renderer.url_cache.info()
+		self.assertEqual(info['size'], 8)
+		# The warm up text of the service is counted too.
+		self.assertGreaterEqual(info['hits'] + info['misses'], 400)
+
+	def test_exceptions(self):
+		with RenderService(workers=1) as service:
+			job = service.submit('a', renderer=Renderer())
+			self.assertRaises(RenderFunctionNotFoundException, job.result, 5)
+			self.assertEqual(service.metrics()['failed'], 1)
+			self.assertEqual(service.render('a'), markdown('a'))
+
+
+class CostTests(unittest.TestCase):
+	def test_features(self):
+		text = '* a **b**\n  * c\n\n> d\n> > e\n\n| f | g |\n\n[h](i) j[^1]'
+		features = CostModel().get_features(text)
+		self.assertEqual(features, {
+			'constant': 1, 'chars': len(text), 'lines': 9, 'list_markers': 2, 'blockquote_markers': 3, 'nesting': 6,
+			'nested_chars': 9 + 2 * 5 + 3 + 2 * 5, 'table_pipes': 3, 'emphasis': 6, 'links': 1, 'footnotes': 1,
+		})
+
+		features = CostModel().get_features(text, Lexer(exclude={'table', 'footnotes', 'blockquote'}))
+		self.assertEqual((features['table_pipes'], features['footnotes'], features['blockquote_markers']), (0, 0, 0))
+
+	def test_estimate(self):
+		small = estimate_cost('**a**')
+		big = estimate_cost('* **a** [b](c)\n' * 1000)
+		self.assertLess(small.seconds, big.seconds)
+		self.assertLess(small.memory, big.memory)
+		self.assertTrue(big.exceeds(max_seconds=small.seconds))
+		self.assertTrue(big.exceeds(max_memory=small.memory))
+		self.assertFalse(big.exceeds(max_seconds=big.seconds, max_memory=big.memory))
+		self.assertFalse(big.exceeds())
+
+	def test_nested(self):
+		# The nested texts are parsed again in each level, so their cost grows faster than their length. The growth
+		# between two depths is compared, because the time depends on the machine.
+		model = CostModel()
+		make_texts = [
+			lambda depth: '> ' * depth + 'a', lambda depth: ''.join('  ' * i + '* item\n' for i in range(depth))
+		]
+		for make_text, depth in zip(make_texts, (200, 75)):
+			small, big = make_text(depth), make_text(depth * 2)
+			growth = model.measure(big)[0] / model.measure(small)[0]
+			predicted = model.estimate(big).seconds / model.estimate(small).seconds
+			self.assertTrue(growth / 2 < predicted < growth * 2, (depth, growth, predicted))
+
+	def test_fit(self):
+		rows = [[1, x, x % 3, 0] for x in range(10)]
+		weights = fit(rows, [2 + 3 * row[1] + 0.5 * row[2] for row in rows])
+		self.assertEqual([round(weight, 6) for weight in weights], [2, 3, 0.5, 0])
+		# The negative weights are removed.
+		self.assertEqual(fit([[1, 1], [1, 2], [1, 3]], [3, 2, 1])[1], 0)
+
+	def test_calibrate(self):
+		model = CostModel()
+		texts = [block * size for size in (1, 10, 40) for block in ('a **b**\n\n', '* a\n  * b\n\n', '| a |\n|---|\n')]
+		samples = model.calibrate(texts, repeat=1)
+		self.assertEqual(len(samples), len(texts))
+		self.assertTrue(all(weight >= 0 for weight in model.time_weights.values()))
+		self.assertGreater(model.estimate('* a **b**\n' * 100).seconds, 0)
+
+
+class ManyTests(unittest.TestCase):
+	def test_same_output(self):
+		texts = [
+			'Nice **post**', '', ' ', '* a\n* b', 'a [^1]\n\n[^1]: b', '```', '**a', 'b**', '# a', 'a\x00b',
+			'a ////TOKENMDA//0////', '[a](b) `c`', 'a\tb', 'Nice **post**', 'a\r\nb', '> a', '_a_ ~b~',
+		]
+		for renderer in [HtmlRenderer(), PlainTextRenderer()]:
+			expected = [markdown(text, renderer=renderer) for text in texts]
+			self.assertEqual(markdown_many(texts, renderer=renderer), expected)
+			self.assertEqual(markdown_many(texts, renderer=renderer, batch=False), expected)
+			self.assertEqual(markdown_many(texts, renderer=renderer, memo=FragmentMemo()), expected)
+
+		self.assertEqual(markdown_many([]), [])
+		self.assertEqual(markdown_many(['a']), [markdown('a')])
+
+
+class MultiRenderTests(unittest.TestCase):
+	def test_same_output(self):
+		renderers = {'html': HtmlRenderer(), 'test': TestRenderer(), 'text': PlainTextRenderer()}
+		for text in get_corpus_texts():
+			collector, multi_collector = MetadataCollector(), MetadataCollector()
+			results = markdown(text, renderer=renderers, collector=multi_collector)
+			markdown(text, collector=collector)
+			self.assertEqual(sorted(results), ['html', 'test', 'text'])
+			self.assertEqual(multi_collector.as_dict(), collector.as_dict())
+
+			for key, renderer in renderers.items():
+				self.assertEqual(results[key], markdown(text, renderer=renderer))
+
+			self.assertEqual(lex(text).render(list(renderers.values())), [
+				markdown(text, renderer=renderer) for renderer in renderers.values()
+			])
+
+	def test_list(self):
+		results = markdown('**a** [b](c)', renderer=[HtmlRenderer(), PlainTextRenderer()], memo=FragmentMemo())
+		self.assertEqual([result.strip() for result in results], ['<p><strong>a</strong> <a href="c">b</a></p>', 'a b'])
+		self.assertRaises(RenderFunctionNotFoundException, markdown, '*a*', renderer=[HtmlRenderer(), Renderer()])
+
+
+class InlineTests(unittest.TestCase):
+	def setUp(self):
+		class BlockLexer(Lexer):
+			def is_inline_text(self, text):
+				return False
+
+		self.block_lexer = BlockLexer()
+
+	def test_markdown_inline(self):
+		self.assertEqual(markdown_inline('Fix **the** `<b>` [link](http://a.com)'), (
+			'Fix <strong>the</strong> <code>&lt;b&gt;</code> <a href="http://a.com">link</a>'
+		))
+		self.assertEqual(markdown_inline('  # Not a header  '), '# Not a header')
+		self.assertEqual(markdown_inline('a [^1]'), 'a [^1]')
+		self.assertEqual(markdown_inline('**a**', renderer=PlainTextRenderer()), 'a')
+
+	def test_is_inline_text(self):
+		lexer = Lexer()
+		for text in ['a **b**', 'a # b', '1 ', 'a---b', '*a*']:
+			self.assertTrue(lexer.is_inline_text(text), text)
+
+		for text in ['a\nb', '# a', '> a', '* a', '1. a', '---', '| a |', 'a ```', 'a [^1]', ' ', '']:
+			self.assertFalse(lexer.is_inline_text(text), text)
+
+		self.assertFalse(Lexer(exclude={'new_line'}).is_inline_text('a'))
+
+		class StarLexer(Lexer):
+			regex_header = re.compile(r'^\+(?P<text>[^\n]+)', re.M)
+
+		self.assertFalse(StarLexer().is_inline_text('+a'))
+
+	def test_same_output(self):
+		texts = [
+			'Fix **the** parser', '*a* _b_ ~~c~~ `d` ![i](j.png "t")', 'a <b> & ////TOKENMDA//0////', 'a\x00b',
+			'\\*a\\* [a](b) [c]', '  spaces  ', 'a __b__ ++c++ --- ***',
+		]
+		for text in texts:
+			self.assertEqual(markdown(text), markdown(text, self.block_lexer), text)
+			self.assertEqual(markdown(text, low_memory=True), markdown(text, self.block_lexer), text)
+			collector, block_collector = MetadataCollector(), MetadataCollector()
+			markdown(text, collector=collector)
+			markdown(text, self.block_lexer, collector=block_collector)
+			self.assertEqual(collector.as_dict(), block_collector.as_dict(), text)
+			self.assertEqual(markdown(text, self.block_lexer).strip(), '<p>%s</p>' % markdown_inline(text), text)
+
+
+class ComplexityTests(unittest.TestCase):
+	""" Adversarial inputs for the regular expressions of the lexer. Each text is rendered with the sizes n, 2n and
+		4n, and the time can't grow faster than ``size ** exponent`` multiplied by the tolerance.
+	"""
+
+	#: Name, function which makes the text with the size ``n`` and growth exponent.
+	#: The nested grammar (blockquotes, sublists) is quadratic, because each level scans its text again.
+	corpus = [
+		('stars', lambda n: '*' * n, 1),
+		('stars_words', lambda n: 'a* ' * n, 1),
+		('bold_open', lambda n: '**a ' * n, 1),
+		('underline_open', lambda n: '_a ' * n, 1),
+		('strike_open', lambda n: '~a ' * n, 1),
+		('backticks_open', lambda n: '`a ' * n, 1),
+		('backticks_run', lambda n: '`' * n, 1),
+		('fence_open', lambda n: '```\n' + 'a\n' * n, 1),
+		('fence_title', lambda n: '```"' * n, 1),
+		('fence_spaces', lambda n: ' ' * n + 'a', 1),
+		('fence_unclosed', lambda n: 'a```b\n' * n, 1),
+		('fence_unclosed_end', lambda n: 'a```b\n' * n + '\n```', 1),
+		('brackets_open', lambda n: '[a ' * n, 1),
+		('brackets_closed', lambda n: '[a] ' * n, 1),
+		('link_open', lambda n: '[a](' * n, 1),
+		('link_title_open', lambda n: '[a](b "' * n, 1),
+		('image_open', lambda n: '![a](' * n, 1),
+		('link_brackets', lambda n: '[[a] b](' * n, 1),
+		('link_href_brackets', lambda n: '[a]([' * n, 1),
+		('footnote_open', lambda n: '[^a ' * n, 1),
+		('footnote_definitions', lambda n: '[^a]: b\n' * n, 1),
+		('reference_definitions', lambda n: '[a]: b\n' * n, 1),
+		('references_open', lambda n: '[a][' * n + '\n\n[a]: b', 1),
+		('reference_spaces', lambda n: '[a]:' + ' ' * n + '\n\n[a]: b', 1),
+		('blank_lines', lambda n: ' \n' * n, 1),
+		('backslashes', lambda n: '\\' * n, 1),
+		('ulist_markers', lambda n: '* a\n' * n, 1),
+		('olist_markers', lambda n: '1. a\n' * n, 1),
+		('sublist_markers', lambda n: ''.join(' ' * (i % 8) + '* a\n' for i in range(n)), 1),
+		('empty_list_markers', lambda n: '* \n' * n, 1),
+		('blockquote_lines', lambda n: '> a\n' * n, 1),
+		('table', lambda n: '| a | b |\n|---|---|\n' + '| c | d |\n' * n, 1),
+		('table_no_blank_line', lambda n: '| a | b |\n|---|---|\n' + '| c | d |\n' * n + 'text', 1),
+		('table_pipes', lambda n: '| a |\n' * n, 1),
+		('header_marks', lambda n: '#' * n + ' a', 1),
+		('header2_lines', lambda n: 'a\n-\n' * n, 1),
+		('long_line', lambda n: 'a ' * n, 1),
+		('blockquote_nesting', lambda n: '> ' * n + 'a', 2),
+		('sublist_nesting', lambda n: '*  ' * n, 2),
+	]
+
+	#: Minimum time, in seconds, of the text with the size n. The size is doubled until the time is reached.
+	min_time = 0.005
+
+	tolerance = 2.0
+
+	def get_time(self, text):
+		best = None
+		for i in range(3):
+			start = default_timer()
+			markdown(text)
+			elapsed = default_timer() - start
+			best = elapsed if best is None else min(best, elapsed)
+
+		return best
+
+	def test_corpus(self):
+		for name, make_text, exponent in self.corpus:
+			size = 64
+			time = self.get_time(make_text(size))
+			while time < self.min_time:
+				size *= 2
+				time = self.get_time(make_text(size))
+
+			for factor in (2, 4):
+				ratio = self.get_time(make_text(size * factor)) / time
+				limit = factor ** exponent * self.tolerance
+				self.assertLessEqual(ratio, limit, '%s: the time grows %.1f times with %d times the size' % (
+					name, ratio, factor
+				))